@@ -1,24 +1,169 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, current_app
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import Select
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.common.keys import Keys
+from flask import Flask, Blueprint, render_template, request, redirect, url_for, session, jsonify, current_app, send_file, make_response, Response
 from datetime import datetime
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 import platform
 import webbrowser
 import json
 import threading
-import pandas as pd
 import shutil
 import os
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 import math
+import random
+import itertools
 import re
+import stat
+import argparse
+import getpass
+import hashlib
+import hmac
+import importlib
+import csv
+import io
+import tempfile
+import mmap
+import struct
+import zlib
+import atexit
+import weakref
+import sqlite3
+from collections import OrderedDict
+from contextlib import closing
+from contextlib import contextmanager
+
+
+class LazyImport:
+    """
+    처음 사용할 때 모듈(또는 모듈의 속성)을 불러오는 대리 객체.
+
+    selenium, webdriver_manager, pandas는 불러오는 데만 수백 ms가 걸리므로, 서버 시작이나
+    캐시만 쓰는 조회에서는 불러오지 않도록 첫 속성 접근/호출까지 import를 미룹니다.
+    """
+
+    def __init__(self, module, attr=None):
+        self._module = module
+        self._attr = attr
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            target = importlib.import_module(self._module)
+            self._target = getattr(target, self._attr) if self._attr else target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+
+webdriver = LazyImport("selenium.webdriver")
+By = LazyImport("selenium.webdriver.common.by", "By")
+WebDriverWait = LazyImport("selenium.webdriver.support.ui", "WebDriverWait")
+EC = LazyImport("selenium.webdriver.support.expected_conditions")
+Service = LazyImport("selenium.webdriver.chrome.service", "Service")
+Select = LazyImport("selenium.webdriver.support.ui", "Select")
+ChromeDriverManager = LazyImport("webdriver_manager.chrome", "ChromeDriverManager")
+Keys = LazyImport("selenium.webdriver.common.keys", "Keys")
+selenium_exceptions = LazyImport("selenium.common.exceptions")  # except 절에는 실제 클래스가 필요하므로 모듈로 접근
+pd = LazyImport("pandas")
+np = LazyImport("numpy")
+
+
+class CretopError(Exception):
+    """크레탑 조회 과정(로그인, 검색, kedcd 확인 등)에서 발생한 오류."""
+
+
+class LoginFailedError(CretopError):
+    """크레탑 로그인에 실패한 경우 (잘못된 아이디/비밀번호, 기기 인증 필요 등)."""
+
+
+class LoginLockedError(LoginFailedError):
+    """같은 아이디가 다른 기기에서 로그인 중이라 로그인할 수 없는 경우 (PLIL140P5)."""
+
+
+# 단계별 소요 시간 히스토그램 구간 (초)
+SPAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class SpanMetrics:
+    """
+    단계(span)별 소요 시간을 히스토그램으로 모아 Prometheus 텍스트 형식으로 내보냅니다.
+
+    대기(sleep, WebDriverWait)는 idle="true" 레이블로 따로 기록해 순수 대기 시간을 구분합니다.
+    """
+
+    def __init__(self, buckets=SPAN_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # (stage, idle) -> [구간별 개수, 합계, 개수]
+
+    def observe(self, stage, seconds, idle=False):
+        key = (stage, idle)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][i] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def summary(self):
+        """{(stage, idle): (개수, 합계 초)} 형태의 현재 집계를 반환합니다."""
+        with self._lock:
+            return {key: (series[2], series[1]) for key, series in self._series.items()}
+
+    def render(self):
+        """Prometheus 텍스트 노출 형식 문자열을 반환합니다."""
+        name = "sokham_span_duration_seconds"
+        lines = [
+            f"# HELP {name} Time spent in each lookup stage; idle=\"true\" marks sleeps and waits.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            snapshot = sorted((key, (list(series[0]), series[1], series[2])) for key, series in self._series.items())
+        for (stage, idle), (counts, total, count) in snapshot:
+            labels = f'stage="{stage}",idle="{"true" if idle else "false"}"'
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+span_metrics = SpanMetrics()
+
+
+@contextmanager
+def span(stage, idle=False):
+    """with 블록(또는 데코레이터로 감싼 함수)의 소요 시간을 stage 이름으로 기록합니다."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        span_metrics.observe(stage, time.perf_counter() - started, idle=idle)
+
+
+def traced_sleep(seconds, stage="sleep"):
+    """time.sleep과 같지만 대기 시간을 idle span으로 기록합니다."""
+    with span(stage, idle=True):
+        time.sleep(seconds)
+
+
+def wait_until(driver, timeout, condition, stage="wait"):
+    """WebDriverWait(driver, timeout).until(condition)을 idle span으로 기록합니다."""
+    with span(stage, idle=True):
+        return WebDriverWait(driver, timeout).until(condition)
 
 
 def handle_popup(driver, popup_class="pop-alert", button_text="확인", wait_time=5):
@@ -37,9 +182,7 @@ def handle_popup(driver, popup_class="pop-alert", button_text="확인", wait_tim
     try:
         
         # 팝업 요소 찾기
-        popup = WebDriverWait(driver, wait_time).until(
-            EC.element_to_be_clickable((By.CLASS_NAME, popup_class))
-        )
+        popup = wait_until(driver, wait_time, EC.element_to_be_clickable((By.CLASS_NAME, popup_class)), "wait_popup")
         
         # 팝업 내부의 버튼 찾기
         confirm_button = popup.find_element(By.XPATH, f".//button[span[text()='{button_text}']]")
@@ -51,6 +194,7 @@ def handle_popup(driver, popup_class="pop-alert", button_text="확인", wait_tim
         print(f"❌ 팝업 처리 실패: {e}")
         return False
 
+@span("login")
 def login_to_site(driver, username, password, login_button_class="header-login-idcr", username_field_id="idModel", password_field_id="pwModel", submit_button_class="btn-login", user_confirm_class="user-nm", wait_time=10):
     """
     사이트 로그인 함수.
@@ -72,15 +216,11 @@ def login_to_site(driver, username, password, login_button_class="header-login-i
     try:
         print("🔍 로그인 버튼 클릭 시도")
         # 로그인 버튼 클릭
-        login_button = WebDriverWait(driver, wait_time).until(
-            EC.element_to_be_clickable((By.CLASS_NAME, login_button_class))
-        )
+        login_button = wait_until(driver, wait_time, EC.element_to_be_clickable((By.CLASS_NAME, login_button_class)), "wait_login_form")
         #login_button.click()
 
         # 사용자 아이디 및 비밀번호 필드 대기
-        username_field = WebDriverWait(driver, wait_time).until(
-            EC.element_to_be_clickable((By.ID, username_field_id))
-        )
+        username_field = wait_until(driver, wait_time, EC.element_to_be_clickable((By.ID, username_field_id)), "wait_login_form")
         password_field = driver.find_element(By.ID, password_field_id)
 
         # 사용자 아이디 및 비밀번호 입력
@@ -98,36 +238,31 @@ def login_to_site(driver, username, password, login_button_class="header-login-i
         submit_button.click()
         print("🔍 로그인 버튼 클릭 중...")
 
+        error_text = ""
         try:
-            error_element = WebDriverWait(driver, 5).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, ".pop-area"))
-            )
-            error_text = error_element.get_attribute("class")
-            
-            with open(UPDATE_TRACKER_FILE, "w") as file:
-                file.write("")
-
-            if "PLIL140P5" in error_text:
-                print("🚫 동일한 아이디로 다른 디바이스에서 로그인 중입니다. 다른 기기에서 로그아웃해주세요.")
-                return False
-            elif "PLIL140P4" in error_text:
-                print("🚫 접속기기가 변경되었습니다. 크롬을 열어 크레탑 본인인증 후 앱을 재사용해주세요.")
-                return False
+            error_element = wait_until(driver, 5, EC.presence_of_element_located((By.CSS_SELECTOR, ".pop-area")), "wait_login_error")
+            error_text = error_element.get_attribute("class") or ""
         except:
             print("로그인 오류 팝업 없음")
+
+        if "PLIL140P5" in error_text:
+            print("🚫 동일한 아이디로 다른 디바이스에서 로그인 중입니다. 다른 기기에서 로그아웃해주세요.")
+            raise LoginLockedError(f"'{username}' 계정이 다른 기기에서 로그인 중입니다.")
+        elif "PLIL140P4" in error_text:
+            print("🚫 접속기기가 변경되었습니다. 크롬을 열어 크레탑 본인인증 후 앱을 재사용해주세요.")
+            return False
             
         # 로그인 성공 확인
-        WebDriverWait(driver, wait_time).until(
-            EC.presence_of_element_located((By.CLASS_NAME, user_confirm_class))
-        )
+        wait_until(driver, wait_time, EC.presence_of_element_located((By.CLASS_NAME, user_confirm_class)), "wait_login_confirm")
         print("✅ 로그인 성공!")
-        time.sleep(1)
+        traced_sleep(1, "sleep_after_login")
         return True
 
+    except LoginLockedError:
+        raise
     except Exception as e:
         print(f"❌ 로그인 실패: {e}")
-        driver.quit()
-        os._exit(0)
+        raise LoginFailedError(f"로그인 실패: {e}") from e
 
 def click_button_by_text(driver, button_text):
     """
@@ -142,137 +277,241 @@ def click_button_by_text(driver, button_text):
     """
     try:
         # 텍스트를 기반으로 버튼 찾기
-        button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.XPATH, f"//a[span[text()='{button_text}']]"))
-        )
+        button = wait_until(driver, 10, EC.element_to_be_clickable((By.XPATH, f"//a[span[text()='{button_text}']]")), "wait_button")
         # 클릭
         button.click()
         print(f"'{button_text}' 버튼 클릭 완료")
     except Exception as e:
         print(f"'{button_text}' 버튼 클릭 실패: {e}")
-        driver.quit()
-        os._exit(0)
+        raise CretopError(f"'{button_text}' 버튼 클릭 실패: {e}") from e
   
+# 검색 결과 목록을 한 번에 읽는 스크립트 (행 번호, 사업자번호, 기업명, 재무페이지 링크).
+# 결과 목록 영역이 아직 없으면 null, 결과가 0건이면 빈 배열을 반환합니다.
+SEARCH_RESULTS_SCRIPT = """
+const first = (xpath, context) => document.evaluate(xpath, context, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const text = (xpath, context) => { const node = first(xpath, context); return node ? node.textContent.trim() : ""; };
+const list = first("//*[@id='et-area']/div/div[2]/ul", document);
+if (!list) return null;
+const rows = document.evaluate("./li", list, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+const results = [];
+for (let i = 0; i < rows.snapshotLength; i++) {
+    const row = rows.snapshotItem(i);
+    results.push({
+        index: i + 1,
+        bzno: text("./div/ul[1]/li[4]/span[2]", row),
+        name: text("(.//strong)[1]", row),
+        link: first("./div/ul[@class='btn__list']/li[4]/a", row)
+    });
+}
+return results;
+"""
+
+
+def search_results_loaded(driver):
+    """
+    WebDriverWait 조건: 검색 결과 목록을 한 번의 WebDriver 호출로 읽어 (행 리스트,)를 반환합니다.
+
+    0건이어도 조건이 참이 되도록 튜플로 감쌉니다. 목록 영역이 아직 없으면 False.
+    """
+    rows = driver.execute_script(SEARCH_RESULTS_SCRIPT)
+    return (rows,) if rows is not None else False
+
+
+@span("search")
 def navigate_to_financial_page(driver, search_key, wait_time=10):
     """
     특정 검색어로 기업을 검색하고, 해당 기업의 재무 페이지로 이동하는 함수.
+
+    검색 결과 전체를 한 번에 읽어 사업자번호가 일치하는 행의 재무페이지 링크를 바로 클릭합니다.
+    일치하는 행이 없으면 기다리지 않고 후보 목록과 함께 CretopError를 발생시킵니다.
     """
 
     try:
         # 검색 필드 요소 찾기
-        search_input = WebDriverWait(driver, wait_time).until(
-            EC.element_to_be_clickable((By.XPATH, "//input[@placeholder='검색어를 입력해주세요.']"))
-        )
+        search_input = wait_until(driver, wait_time, EC.element_to_be_clickable((By.XPATH, "//input[@placeholder='검색어를 입력해주세요.']")), "wait_search_form")
         
         # 검색어 입력
         search_input.clear()
         search_input.send_keys(search_key)
 
         # 검색 버튼 클릭
-        search_button = WebDriverWait(driver, wait_time).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[@title='검색하기']"))
-        )
+        search_button = wait_until(driver, wait_time, EC.element_to_be_clickable((By.XPATH, "//button[@title='검색하기']")), "wait_search_form")
         search_button.click()
         print("✅ 검색 버튼 클릭 완료")
-        time.sleep(1)
 
     except Exception as e:
         print(f"❌ 검색 단계 실패: {e}")
-        driver.quit()
-        os._exit(0)
-        return False
+        raise CretopError(f"검색 단계 실패: {e}") from e
 
-            
-    # 요소 탐색 및 클릭
-    li_index = 1
-    found = False
+    # 검색 결과 목록 영역이 나타날 때까지 대기 후 한 번에 읽기. 0건이면 기다리지 않고 바로 실패
+    try:
+        rows, = wait_until(driver, wait_time, search_results_loaded, "wait_search_results")
+    except selenium_exceptions.TimeoutException as e:
+        print("❌ 검색 결과 목록이 나타나지 않았습니다.")
+        raise CretopError(f"'{search_key}' 검색 결과 목록이 {wait_time}초 안에 나타나지 않았습니다.") from e
 
-    while True:
-        try:
-            # 사업자번호로 찾기
-            code_xpath = f"//*[@id='et-area']/div/div[2]/ul/li[{li_index}]/div/ul[1]/li[4]/span[2]"
-            span_element = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, code_xpath))
-            )
-            
-            # 찾은 텍스트와 검색어 비교
-            if search_key in span_element.text.strip():
-                print(f"✅ '{search_key}' 찾음!")
-                found = True
-                break
-            else:
-                li_index += 1
+    report_captured_transactions(driver, "검색")
+    if not rows:
+        print("❌ 찾을 수 있는 항목이 없습니다.")
+        raise CretopError(f"'{search_key}'에 해당하는 검색 결과가 없습니다.")
+    bzno = normalize_bzno(search_key)
+    for row in rows:
+        if search_key in row["bzno"] or (bzno and normalize_bzno(row["bzno"]) == bzno):
+            print(f"✅ '{search_key}' 찾음! ({row['index']}번째 결과)")
+            if row["link"] is None:
+                raise CretopError(f"'{search_key}'의 재무페이지 링크가 없습니다.")
+            # 일치하는 항목의 "재무페이지로 이동하기" 클릭
+            row["link"].click()
+            print("재무페이지로 이동 완료")
+            return 1
 
-        except Exception as e:
-            print(f"❌ 찾을 수 있는 항목이 없습니다. (오류: {e})")
-            driver.quit()
-            os._exit(0)
-            break
-            
-    # 일치하는 항목이 있으면 "재무페이지로 이동하기" 클릭
-    if found:
-        finance_page_xpath = f"//*[@id='et-area']/div/div[@class='inner__area']/ul/li[{li_index}]/div/ul[@class='btn__list']/li[4]/a"
-        finance_page_element = driver.find_element(By.XPATH, finance_page_xpath)
-        finance_page_element.click()
-        print("재무페이지로 이동 완료")
-        return 1
-    else:
-        print("재무페이지 이동 실패")
-        driver.quit()
-        os._exit(0)
+    candidates = ", ".join(f"{row['name']}({row['bzno']})" for row in rows)
+    print(f"❌ 찾을 수 있는 항목이 없습니다. 후보: {candidates}")
+    raise CretopError(f"'{search_key}'에 해당하는 검색 결과가 없습니다. (후보: {candidates})")
+
+NETWORK_CAPTURE_SIZE = 50  # 페이지마다 보관할 request.json 응답 수
+KEDCD_TIMEOUT = 10  # kedcd 응답 대기 시간 (초)
+CAPTURE_DEBUG = os.environ.get("CAPTURE_DEBUG", "0") == "1"  # 브라우저가 보낸 request.json 거래 출력 (검색 거래 확인용)
+
+# request.json 응답의 header(와 요청의 screenId/menuId/본문 필드 이름)만 페이지 안의 고정 크기 버퍼에 기록하는 XHR/fetch 후킹 스크립트
+NETWORK_CAPTURE_SCRIPT = """
+(() => {
+    if (window.__cretopCapture) return;
+    const LIMIT = __LIMIT__;
+    const TARGET = "httpService/request.json";
+    const capture = window.__cretopCapture = {events: [], waiters: []};
+
+    const record = (url, text, requestBody) => {
+        if (!url || url.indexOf(TARGET) === -1) return;
+        let header;
+        try { header = (JSON.parse(text) || {}).header || {}; } catch (e) { return; }
+        let request = {};
+        try { request = JSON.parse(requestBody) || {}; } catch (e) {}
+        const requestHeader = request.header || {};
+        const trxCd = header.trxCd || requestHeader.trxCd || "";
+        const event = {
+            trxCd: trxCd, kedcd: header.kedcd || "", at: Date.now(),
+            screenId: requestHeader.screenId || header.screenId || "", menuId: requestHeader.menuId || header.menuId || "",
+            fields: Object.keys(request[trxCd] || {})
+        };
+        capture.events.push(event);
+        if (capture.events.length > LIMIT) capture.events.shift();
+        capture.waiters = capture.waiters.filter(waiter => !waiter(event));
+    };
+
+    const open = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function (method, url) {
+        this.__cretopUrl = String(url);
+        return open.apply(this, arguments);
+    };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function (body) {
+        this.addEventListener("load", () => {
+            if (this.responseType === "" || this.responseType === "text") record(this.__cretopUrl, this.responseText, body);
+            else if (this.responseType === "json") record(this.__cretopUrl, JSON.stringify(this.response), body);
+        });
+        return send.apply(this, arguments);
+    };
+
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function (resource, init) {
+            const body = init && typeof init.body === "string" ? init.body : null;
+            return originalFetch.apply(this, arguments).then(response => {
+                if (response.url.indexOf(TARGET) !== -1) {
+                    response.clone().text().then(text => record(response.url, text, body)).catch(() => {});
+                }
+                return response;
+            });
+        };
+    }
+})();
+"""
+
+# 버퍼에 kedcd가 있으면 바로, 없으면 다음 응답이 도착할 때 결과를 돌려주는 스크립트
+WAIT_FOR_KEDCD_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const capture = window.__cretopCapture;
+if (!capture) { done(null); return; }
+const hit = capture.events.slice().reverse().find(event => event.kedcd);
+if (hit) { done(hit.kedcd); return; }
+capture.waiters.push(event => { if (event.kedcd) { done(event.kedcd); return true; } return false; });
+"""
+
+
+class NetworkCapture:
+    """
+    드라이버의 request.json 응답을 이벤트 방식으로 수집합니다.
+
+    DevTools 성능 로그 전체를 쌓아 두고 뒤지는 대신, 새 문서가 열릴 때마다 XHR/fetch를 후킹하는
+    스크립트를 주입해 request.json 응답의 header만 고정 크기 버퍼에 기록합니다.
+    """
+
+    def __init__(self, driver, limit=NETWORK_CAPTURE_SIZE):
+        self.driver = driver
+        self.script = NETWORK_CAPTURE_SCRIPT.replace("__LIMIT__", str(limit))
 
-def get_kedcd(driver): 
-    # ✅ DevTools 로그에서 네트워크 요청 가져오기
-    logs = driver.get_log("performance")
+    def install(self):
+        """이후 열리는 모든 문서와 현재 문서에 수집 스크립트를 주입합니다."""
+        self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": self.script})
+        self.driver.execute_script(self.script)
 
-    # `request.json` 요청을 추적하여 `requestId` 저장
-    request_id_map = {}
+    def clear(self):
+        """현재 문서의 버퍼를 비웁니다."""
+        self.driver.execute_script("if (window.__cretopCapture) window.__cretopCapture.events = [];")
 
-    for log in logs:
+    def transactions(self):
+        """현재 문서에서 수집한 거래 목록 [{"trxCd", "screenId", "menuId", "fields", "kedcd"}]."""
+        return self.driver.execute_script("return window.__cretopCapture ? window.__cretopCapture.events : [];") or []
+
+    def wait_for_kedcd(self, timeout=KEDCD_TIMEOUT):
+        """
+        kedcd가 담긴 가장 최근 응답을 기다립니다.
+
+        Returns:
+            str: kedcd. 시간 안에 응답이 없거나 수집 스크립트가 없으면 None.
+        """
+        self.driver.set_script_timeout(timeout)
         try:
-            log_json = json.loads(log["message"])  
-            method = log_json["message"].get("method", "")
-
-            # 네트워크 요청이 비동기 처리되거나 fetch()로 이루어진 경우, responseReceived에서만 확인 가능
-            if method == "Network.responseReceived":
-                request_id = log_json["message"]["params"]["requestId"]
-                request_id_map[request_id] = log_json["message"]["params"]
-        except (json.JSONDecodeError, KeyError):
-            continue
-    # ✅ 가장 최신 requestId만 사용
-    if not request_id_map:
-        print("❌ `requestId`를 찾지 못했습니다.")
-        driver.quit()
-        os._exit(0)
+            with span("wait_kedcd", idle=True):
+                return self.driver.execute_async_script(WAIT_FOR_KEDCD_SCRIPT)
+        except selenium_exceptions.TimeoutException:
+            return None
 
-    request_ids = list(request_id_map.keys())[::-1]  # 최신 requestId부터 선택
 
-    # ✅ `Network.getResponseBody`로 응답 데이터 가져오기 (한 개만 실행)
-    while request_ids:  # ✅ request_ids가 남아있는 동안 반복
-            last_request_id = request_ids.pop(0)  # ✅ 가장 최신 requestId 선택
-            print(f"✅ 시도 중인 `requestId`: {last_request_id}")
+_reported_transactions = set()
 
-            try:
-                time.sleep(1)  # 요청 처리 대기 (빠른 응답 사라짐 방지)
 
-                response_body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": last_request_id})
+def report_captured_transactions(driver, stage):
+    """
+    브라우저가 보낸 request.json 거래(trxCd, screenId, menuId, 본문 필드 이름)를 처음 볼 때 한 번씩 출력합니다.
 
-                # 응답이 비어있는 경우 제외
-                if not response_body or not response_body.get("body"):
-                    print(f"`{last_request_id}` 응답이 비어 있음")
-                    continue 
+    HTTP 빠른 경로의 검색 거래 이름(COMPANY_SEARCH_TRX, COMPANY_SEARCH_KEYWORD)을 실제 사이트의
+    값으로 맞출 때 사용합니다. 진단용이므로 CAPTURE_DEBUG=1일 때만 동작합니다.
+    """
+    if not CAPTURE_DEBUG:
+        return
+    try:
+        events = NetworkCapture(driver).transactions()
+    except Exception as e:
+        print(f"❌ 수집한 거래를 읽지 못했습니다: {e}")
+        return
+    for event in events:
+        key = (event.get("trxCd"), event.get("screenId"), event.get("menuId"), tuple(event.get("fields") or ()))
+        if key[0] and key not in _reported_transactions:
+            _reported_transactions.add(key)
+            print(f"🔍 [{stage}] request.json 거래: trxCd={key[0]} screenId={key[1]} menuId={key[2]} 필드={list(key[3])}")
 
-                payload = json.loads(response_body["body"])  
 
-                kedcd = payload.get("header", {}).get("kedcd")
-                if kedcd:
-                    print(f"✅ `kedcd` 값 찾음: {kedcd}")
-                    return kedcd  
-    
-            except (json.JSONDecodeError, KeyError, Exception) as e:
-                print(f"❌ {last_request_id} 응답 가져오기 실패: {e}")
-    driver.quit()
-    os._exit(0)
+@span("kedcd")
+def get_kedcd(driver, timeout=KEDCD_TIMEOUT):
+    """재무 페이지가 받은 request.json 응답에서 kedcd를 가져옵니다."""
+    kedcd = NetworkCapture(driver).wait_for_kedcd(timeout)
+    if not kedcd:
+        print("❌ `kedcd` 값을 찾지 못했습니다.")
+        raise CretopError("`kedcd` 값을 찾지 못했습니다.")
+    print(f"✅ `kedcd` 값 찾음: {kedcd}")
+    return kedcd
 
 target_tabs = {
     "재무상태표": {"accNmEng": "         Machinery and Equipment", "fsCcd": "1", "fsCls": "2"},
@@ -286,461 +525,3657 @@ target_tabs = {
     
 }
 
-def get_tabs_values(driver, username, kedcd, session, years):
-
-    headers = {
-    'User-Agent' : 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36',
-    'Referer': driver.current_url,
-    'Origin': 'https://www.cretop.com',
-    'Content-Type': 'application/json'
-}
-    url = 'https://www.cretop.com/httpService/request.json'
+CRETOP_URL = os.environ.get("CRETOP_URL", "https://www.cretop.com").rstrip("/")  # 로컬 mock_cretop.py 서버로 바꿀 수 있음
+REQUEST_JSON_URL = f"{CRETOP_URL}/httpService/request.json"
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", "8"))  # 재무제표 동시 요청 수
 
-    values_list = []
-    cookies = driver.get_cookies()
-    for cookie in cookies:
-        session.cookies.set(cookie['name'], cookie['value'])
 
-    # ✅ 탭 리스트 가져오기
-    tabs = driver.find_elements(By.CSS_SELECTOR, "ul.tab-group-ul > li > a")
-    existing_tabs = {tab.text.strip() for tab in tabs}
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))  # request.json 연결 제한 시간 (초)
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "30"))  # request.json 응답 제한 시간 (초)
+HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", "2"))  # 일시적 오류 재시도 횟수
+HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", "0.5"))  # 재시도 대기 기준 (초, 시도마다 두 배)
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", "8"))
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# 다시 보내면 성공할 수 있는 오류 (응답이 도중에 끊기거나 압축이 깨진 경우 포함)
+HTTP_TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.HTTPError,
+                         requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError)
+CIRCUIT_THRESHOLD = int(os.environ.get("CIRCUIT_THRESHOLD", "5"))  # 연속 실패가 이 횟수면 요청 차단
+CIRCUIT_COOLDOWN = float(os.environ.get("CIRCUIT_COOLDOWN", "30"))  # 차단 후 다시 시험하기까지 (초)
 
-    missing_tabs = set(target_tabs.keys()) - existing_tabs
-    all_tabs = set(target_tabs.keys())
-
-    # ✅ '포괄손익계산서'가 없을 경우만 특정 탭 조정 (
-    if "포괄손익계산서" in missing_tabs:
-        all_tabs.discard("포괄손익계산서")
-        values = ["포괄손익계산서"] +  [ None for _ in range(1, 7)]
-        values_list.append(values)
-        all_tabs.discard("포괄_법인세비용차감전순이익")
-        values = ["포괄_법인세비용차감전순이익"] +  [ None for _ in range(1, 7)]
-        values_list.append(values)
-        all_tabs.discard("포괄_법인세비용")
-        values = ["포괄_법인세비용"] +  [ None for _ in range(1, 7)]
-        values_list.append(values)
-    else: 
-        all_tabs.discard("손익계산서")
-        values = ["손익계산서"] +  [ None for _ in range(1, 7)]
-        values_list.append(values)
-        all_tabs.discard("제조원가명세서")
-        values = ["제조원가명세서"] +  [ None for _ in range(1, 7)]
-        values_list.append(values)
-        all_tabs.discard("법인세비용차감순손익")
-        values = ["법인세비용차감순손익"] +  [ None for _ in range(1, 7)]
-        values_list.append(values)
-        all_tabs.discard("법인세비용")
-        values = ["법인세비용"] +  [ None for _ in range(1, 7)]
-        values_list.append(values)
-        
 
-    for tab_name in all_tabs:
-        # ✅ 해당 탭의 fsCcd, fsCls 및 accNmEng 가져오기
-        tab_data = target_tabs[tab_name]
-        accNmEng = tab_data["accNmEng"]
-        fsCcd = tab_data["fsCcd"]
-        fsCls = tab_data["fsCls"]
-        if (years == 2022):
-            acctDt = "20221231"
-        else:
-            acctDt = "20231231"
-
-        # ✅ 요청 데이터 생성 
-        data = {
-            "header": {
-                "trxCd": "ETFI1122R",
-                "sysCd": "",
-                "chlType": "02",
-                "userId": username.upper(),
-                "screenId": "ETFI112S2",
-                "menuId": "01W0000777",
-                "langCd": "ko",
-                "bzno": "",
-                "conoPid": "",
-                "kedcd": kedcd,
-                "indCd": "",
-                "franMngNo": "",
-                "ctrNo": "",
-                "bzcCd": "",
-                "infoOfrStpgeYn": "",
-                "pageNum": 0,
-                "pageCount": 0,
-                "pndNo": ""
-            },
-            "ETFI1122R": {
-                "kedcd": kedcd,
-                "acctCcd": "Y",
-                "acctDt": acctDt,
-                "fsCcd": fsCcd,  
-                "fsCls": fsCls,  
-                "chk": "1",
-                "smryYn": "N",
-                "srchCls": "5"
-            }
-        }
+class CretopUnavailableError(CretopError):
+    """크레탑 응답 실패가 이어져 회로 차단기가 요청을 막은 상태."""
 
-        # ✅ API 요청 보내기
-        response = session.post(url, json=data, headers=headers)
-        response_text = response.text
 
-        accNmEng = re.escape(accNmEng)
-        normalized_accNmEng = " ".join(tab_data["accNmEng"].split())
-        pattern = fr'\{{[^}}]*"accNmEng"\s*:\s*".*?{accNmEng}.*?"[^}}]*\}}'
+class CircuitBreaker:
+    """
+    크레탑 요청의 연속 실패를 세는 회로 차단기.
 
-        matches = re.findall(pattern, response_text)
+    일시적 오류(연결 실패, 시간 초과, 응답 끊김, 429/5xx)가 `threshold`번 이어지면 `cooldown`초 동안 요청을
+    보내지 않고 바로 실패시킵니다(open). cooldown이 지나면 요청 하나만 시험으로 보내(half-open)
+    성공하면 닫고, 실패하면 다시 엽니다.
+    """
 
-        if matches:
-            for match in matches:
-                match_data = json.loads(match) 
-                values = [tab_name] + [years] + [match_data.get(f'val{i}') for i in range(1, 6)]
-                values_list.append(values)
+    def __init__(self, threshold=CIRCUIT_THRESHOLD, cooldown=CIRCUIT_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
 
-            print(f"✅ {tab_name} ({normalized_accNmEng}): {values_list[-1]}")
-            continue
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
 
-        else:
-            values = [tab_name] +  [ None for _ in range(1, 7)]
-            values_list.append(values)
-            print(f"❌ {tab_name} 데이터를 찾을 수 없습니다.")
+    def allow(self):
+        """요청을 보내도 되면 True. half-open에서는 시험 요청 하나만 허용합니다."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self._trial:
+                return False
+            self._trial = True
+            return True
 
-    return values_list if values_list else None  
+    def success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print("✅ 크레탑 응답 회복, 회로 차단 해제")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
 
-app = Flask(__name__)
-app.secret_key = os.urandom(24)
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            trial, self._trial = self._trial, False
+            if trial or (self.opened_at is None and self.failures >= self.threshold):
+                print(f"❌ 크레탑 요청 {self.failures}회 연속 실패, {self.cooldown:g}초 동안 요청 차단")
+                self.opened_at = time.monotonic()
 
-def get_chrome_user_data_dir():
-    system = platform.system()
-    base_dir = os.path.expanduser("~")
+    def release(self):
+        """성공/실패를 판단할 수 없는 요청이 끝났을 때 시험 요청 자리를 돌려줍니다."""
+        with self._lock:
+            self._trial = False
 
-    if system == "Windows":
-        return os.path.join(base_dir, "AppData", "Local", "Google", "Chrome", "User Data")
-    elif system == "Darwin":  # macOS
-        return os.path.join(base_dir, "Library", "Application Support", "Google", "Chrome")
-    elif system == "Linux":  # Linux
-        return os.path.join(base_dir, ".config", "google-chrome")
-    else:
-        raise NotImplementedError("이 운영 체제에서는 지원되지 않습니다.")
 
-def get_copied_user_data_dir():
-    system = platform.system()
-    base_dir = os.path.expanduser("~")
+cretop_breaker = CircuitBreaker()
 
-    if system == "Windows":
-        return os.path.join(base_dir, "AppData", "Local", "Google", "Chrome_Selenium")
-    elif system == "Darwin":  # macOS
-        return os.path.join(base_dir, "Library", "Application Support", "Google", "Chrome_Selenium")
-    elif system == "Linux":  # Linux
-        return os.path.join(base_dir, ".config", "google-chrome-selenium")
-    else:
-        raise NotImplementedError("이 운영 체제에서는 지원되지 않습니다.")
 
-USER_DATA_DIR = get_chrome_user_data_dir()
-COPIED_USER_DATA_DIR = get_copied_user_data_dir()
-UPDATE_TRACKER_FILE = "last_update.txt"
+class CretopClient(requests.Session):
+    """
+    request.json 전용 HTTP 클라이언트.
 
-def setup_user_data():
-    today = datetime.today().strftime("%Y-%m-%d")
-    if os.path.exists(UPDATE_TRACKER_FILE):
-        with open(UPDATE_TRACKER_FILE, "r") as file:
-            last_update = file.read().strip()  #  마지막 업데이트 날짜 읽기
-    else:
-        last_update = None  # 업데이트 기록이 없으면 None 처리
-
-    # 디렉토리 존재 여부 확인 + 날짜 비교 후 업데이트 여부 결정
-    if not os.path.exists(COPIED_USER_DATA_DIR) or last_update != today: 
-        print("사용자 데이터 디렉토리 업데이트 중...")
-        os.system("taskkill /IM chrome.exe /F") # 윈도우 크롬 강제종료 코드 (하루에 한 번만 실행됨)
-        if os.path.exists(COPIED_USER_DATA_DIR):
-            shutil.rmtree(COPIED_USER_DATA_DIR)
-        shutil.copytree(USER_DATA_DIR, COPIED_USER_DATA_DIR)
-        print("디렉토리 복사 완료:", COPIED_USER_DATA_DIR)
-        
-        with open(UPDATE_TRACKER_FILE, "w") as file:
-            file.write(today)
-    else: 
-        print(" 기존 디렉토리 사용.")
-
-search_text =""
-selenium_running = False
-kedcd = ""
-value_2023 = []
-value_2022 = []
-machine = []
-sonik =[]
-jejo = []
-pogwal = []
-before_loss = []
-taxes = []
-
-def run_selenium(username, password, search_key):
-    driver = None
-    global search_text, kedcd, value_2022, value_2023, machine, sonik, jejo, pogwal,before_loss, taxes
+    크기를 정한 커넥션 풀(풀이 차면 새 연결 대신 대기), 연결/응답 제한 시간, 일시적 오류의
+    지터 백오프 재시도, gzip 응답, 프로세스 공용 회로 차단기를 사용합니다. 로그인 쿠키는
+    requests 세션과 같은 방식으로 설정합니다.
+    """
 
-    try:
-        with app.test_request_context():
-
-            setup_user_data()
-
-            options = webdriver.ChromeOptions()
-            options.add_experimental_option("excludeSwitches", ["enable-logging"])
-            options.add_experimental_option("detach", True) # 화면 창 닫기 방지
-            options.add_argument(f"user-data-dir={COPIED_USER_DATA_DIR}")  # 복사된 프로파일 경로 지정
-            options.add_argument("--profile-directory=Default")  # 특정 프로파일 중 default 사용
-            options.add_argument("--headless")  # Headless 모드 활성화
-            options.add_argument("--disable-autofill")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--disable-dev-shm-usage")
-            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})  # DevTools 네트워크 로깅 활성화
-
-            #driver 실행
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
-
-            # 사이트 이동 및 기업의 재무 페이지로 이동
-            driver.get("https://www.cretop.com")
-            driver.maximize_window()
-            driver.execute_script("document.body.style.zoom='100%'")
-            print("사이트 접속 완료")
-            time.sleep(1)
+    def __init__(self, pool_maxsize=FETCH_WORKERS, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+                 retries=HTTP_RETRIES, breaker=None):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=True)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.headers["Accept-Encoding"] = "gzip, deflate"
+        self.timeout = timeout
+        self.retries = retries
+        self.breaker = breaker or cretop_breaker
 
-            # 팝업 처리 
-            if handle_popup(driver, popup_class="check-close__footer", button_text="[닫기]"):
-                print("팝업 처리가 완료되었습니다.")
-            else:
-                print("팝업 처리가 실패했습니다.")
+    def post_json(self, data, headers):
+        """
+        request.json 거래를 호출하고 응답 본문을 반환합니다.
 
-            if driver.find_elements(By.CSS_SELECTOR, ".login-after"):
-                print("로그인 중입니다.")
-            else:
-                if login_to_site(driver, username, password):
-                    print("로그인이 성공적으로 완료되었습니다!")
-                else:
-                    print("로그인에 실패했습니다.")
-                    driver.quit()
-                    os._exit(0)
+        Raises:
+            CretopUnavailableError: 회로 차단기가 열려 있는 경우.
+            requests.RequestException: 재시도 후에도 일시적 오류(HTTP_TRANSIENT_ERRORS, 429·5xx)인 경우,
+                또는 다시 보내도 소용없는 요청 오류인 경우 (재시도 없음).
+        """
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise CretopUnavailableError("크레탑 응답이 불안정해 잠시 요청을 멈췄습니다. 잠시 후 다시 시도하세요.")
+            try:
+                response = self.post(REQUEST_JSON_URL, json=data, headers=headers, timeout=self.timeout)
+                if response.status_code in HTTP_RETRY_STATUSES:
+                    raise requests.HTTPError(f"{response.status_code} 응답", response=response)
+            except HTTP_TRANSIENT_ERRORS as e:
+                self.breaker.failure()
+                if attempt == self.retries:
+                    raise
+                delay = random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF * 2 ** attempt))  # full jitter
+                print(f"❌ request.json 요청 실패 ({e}), {delay:.2f}초 후 재시도 ({attempt + 1}/{self.retries})")
+                traced_sleep(delay, "retry_backoff")
+                continue
+            except BaseException:
+                # 잘못된 요청 등: 크레탑 상태와 무관하므로 세지 않되, half-open 시험 자리는 돌려줌
+                self.breaker.release()
+                raise
+            self.breaker.success()
+            return response.text
 
-                # 로그인 확인 버튼 닫기 _ 팝업 처리 함수 
-                if handle_popup(driver):
-                    print("팝업 처리가 완료되었습니다.")
-                else:
-                    print("팝업 처리가 실패했습니다.")
 
-                time.sleep(1)
-           
-            session = requests.Session()
+def create_http_session(pool_maxsize=FETCH_WORKERS):
+    """재무제표 병렬 요청용 커넥션 풀을 갖춘 CretopClient를 생성합니다."""
+    return CretopClient(pool_maxsize=pool_maxsize)
 
-            for cookie in driver.get_cookies():
-                c = {cookie['name'] : cookie['value']}
-                session.cookies.update(c)    
 
-            if navigate_to_financial_page(driver, search_key):
-                print(f"🚀 '{search_key}'의 재무 페이지로 성공적으로 이동했습니다.")
-                time.sleep(1)
+HTTP_FAST_PATH = os.environ.get("HTTP_FAST_PATH", "0") == "1"  # 검색/kedcd 조회를 브라우저 없이 수행 (검색 거래 확인 후 켬)
 
-                strong_element = driver.find_element(By.XPATH, '//*[@id="etfi110m1"]/div/div[2]/div/div/div/div[2]/div/strong')
-                search_text = strong_element.text.strip()
-                print(search_text)              
-            else:
-                print(f"❌ '{search_key}'의 재무 페이지로 이동 실패.")
-                driver.quit()
-                os._exit(0)
+# 검색 화면이 사용하는 request.json 거래 (사업자번호 → kedcd/기업명).
+# 기본값은 실제 사이트에서 확인되지 않은 추정값입니다. 브라우저 검색 때 출력되는 거래
+# (CAPTURE_DEBUG=1일 때 report_captured_transactions가 출력)로 CRETOP_SEARCH_* 환경 변수를 맞춘 뒤
+# HTTP_FAST_PATH=1로 켭니다.
+COMPANY_SEARCH_TRX = {
+    "trxCd": os.environ.get("CRETOP_SEARCH_TRX_CD", "ETSR1011R"),
+    "screenId": os.environ.get("CRETOP_SEARCH_SCREEN_ID", "ETSR101S1"),
+    "menuId": os.environ.get("CRETOP_SEARCH_MENU_ID", "01W0000100"),
+}
+COMPANY_SEARCH_KEYWORD = os.environ.get("CRETOP_SEARCH_KEYWORD_FIELD", "srchKwd")  # 검색어 필드 이름 (추정값)
 
-            driver.execute_cdp_cmd("Network.enable", {})
-            kedcd = get_kedcd(driver)
 
-            value_2023 = get_tabs_values(driver, username, kedcd, session, 2023)
-            value_2022 = get_tabs_values(driver, username, kedcd, session, 2022)
-            
-            for row, row_2022 in zip(value_2023, value_2022): # value_2023에 2018 값 삽입
-                row[1] = row_2022[2]
-            
-            for tab in value_2023:
-                print(tab)
-
-            for row in value_2023:
-                if row[0] == "포괄손익계산서":
-                    pogwal = row[1:7] 
-                elif row[0] == "손익계산서":
-                    sonik = row[1:7] 
-                elif row[0] == "제조원가명세서":
-                    jejo = row[1:7] 
-                elif row[0] == "재무상태표":
-                    machine = row[1:7]
-                elif row[0] == "법인세비용차감전순손익" and not None:
-                    before_loss = row[1:7]
-                elif row[0] == "포괄_법인세비용차감전순이익" and not None:
-                    before_loss = row[1:7]
-                elif row[0] == "법인세비용" and not None:
-                    taxes = row[1:7]
-                elif row[0] == "포괄_법인세비용" and not None:
-                    taxes = row[1:7]
+def make_request_headers(referer=CRETOP_URL):
+    """request.json 호출에 사용할 HTTP 헤더를 생성합니다."""
+    return {
+        'User-Agent' : 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36',
+        'Referer': referer,
+        'Origin': CRETOP_URL,
+        'Content-Type': 'application/json'
+    }
 
 
-    finally:
-        # 드라이버 종료가 확실히 호출되도록 함
-        if driver:
-            driver.execute_script("document.body.style.zoom='100%'")
-            driver.quit()
-        # session.get('selenium_running', False)    # 작업 완료 상태로 설정
-        # session.modified = True  # 변경 내용 저장
+def build_request_header(username, trxCd, screenId, menuId, kedcd="", bzno=""):
+    """request.json 공통 header 블록을 생성합니다."""
+    return {
+        "trxCd": trxCd,
+        "sysCd": "",
+        "chlType": "02",
+        "userId": username.upper(),
+        "screenId": screenId,
+        "menuId": menuId,
+        "langCd": "ko",
+        "bzno": bzno,
+        "conoPid": "",
+        "kedcd": kedcd,
+        "indCd": "",
+        "franMngNo": "",
+        "ctrNo": "",
+        "bzcCd": "",
+        "infoOfrStpgeYn": "",
+        "pageNum": 0,
+        "pageCount": 0,
+        "pndNo": ""
+    }
 
-@app.route("/", methods=["GET", "POST"])
-def login():
-    if request.method == "POST":
-        username = session.get("username", request.form["username"])
-        password = session.get("password", request.form["password"])
-        search_key = request.form["search_key"]
 
-        session["username"] = username
-        session["password"] = password
-        
-        run_selenium(username, password, search_key)
-        session['selenium_running'] = True  # 세션 유지 설정
+def build_statement_request(username, kedcd, acctDt, fsCcd, fsCls):
+    """ETFI1122R(재무제표 조회) 요청 데이터를 생성합니다."""
+    return {
+        "header": build_request_header(username, "ETFI1122R", "ETFI112S2", "01W0000777", kedcd=kedcd),
+        "ETFI1122R": {
+            "kedcd": kedcd,
+            "acctCcd": "Y",
+            "acctDt": acctDt,
+            "fsCcd": fsCcd,  
+            "fsCls": fsCls,  
+            "chk": "1",
+            "smryYn": "N",
+            "srchCls": "5"
+        }
+    }
 
-        return jsonify({"redirect": url_for('calculate')})
-    
-    return render_template("index.html")
 
-@app.route('/selenium_status', methods=['GET'])
-def selenium_status():
-    status = session.get('selenium_running', False)  # 기본값은 False
-    return jsonify({"running": status})
+def post_request_json(session, data, headers):
+    """
+    request.json 거래를 호출하고 응답 본문을 반환합니다.
 
-def calculate_yearly_cost(year, machine_costs, pogwal_salary=None, sonik_salary=None, jejo_salary=None, num=7700, avg_rate=0.03, avg_rate_after_2023=0.1):
-    if pogwal_salary is None and sonik_salary is None:
-        raise ValueError("pogwal_salary와 sonik_salary 중 하나는 반드시 필요합니다.")
-    
-    prev_year = year - 1
-    if machine_costs is None:
-        years_available = []
+    재생 모드(CRETOP_TRANSPORT=replay)에서는 요청을 보내지 않고 보관소에 기록된 응답을,
+    기록 모드(record)에서는 실제 응답을 돌려주면서 보관소에 함께 기록합니다.
+    """
+    archive = traffic_archive
+    if archive is not None and archive.replaying:
+        return archive.replay(data)
+    if isinstance(session, CretopClient):
+        text = session.post_json(data, headers)
     else:
-        years_available = [year - i for i in range(1, 4) if (year - i) in machine_costs]
-    prev_3_year_avg = sum((machine_costs.get(year, 0) or 0) for y in years_available) / len(years_available) if years_available else 0
+        text = session.post(REQUEST_JSON_URL, json=data, headers=headers, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)).text
+    if archive is not None:
+        archive.record(data, text)
+    return text
 
-    # 인원 계산
-    if pogwal_salary is not None:
-        salary_increase = max(0, (pogwal_salary.get(year, 0) or 0) - (pogwal_salary.get(prev_year, 0) or 0))
-    elif sonik_salary is not None or jejo_salary is not None:
-        sonik_increase = (sonik_salary.get(year, 0) or 0) - (sonik_salary.get(prev_year, 0) or 0) if sonik_salary else 0
-        jejo_increase = (jejo_salary.get(year, 0) or 0) - (jejo_salary.get(prev_year, 0) or 0) if jejo_salary else 0
-        salary_increase = max(0, sonik_increase + jejo_increase)
-    else:
-        salary_increase = 0
 
-    salary_adjustment = math.floor(salary_increase / 40000) * num
+CRETOP_TRANSPORT = os.environ.get("CRETOP_TRANSPORT", "live")  # live(실제 요청) / record(기록) / replay(재생)
+CRETOP_ARCHIVE = os.environ.get("CRETOP_ARCHIVE", "cretop_traffic.rra")  # 기록/재생 보관소 경로
 
-    # 기계장치 계산
-    machine_cost_current = machine_costs.get(year, 0) or 0
-    machine_cost_prev = machine_costs.get(prev_year, 0) or 0
-    
-    if year == 2019:
-        machine_cost_total = (machine_cost_current - machine_cost_prev) * 0.07
-    elif year == 2020:
-        machine_cost_total = (machine_cost_current - machine_cost_prev) * 0.1
-    elif year in [2021, 2022]:
-        machine_cost_total = (machine_cost_current - machine_cost_prev) * 0.1 + (machine_cost_current - prev_3_year_avg) * avg_rate
-    else:  # year >= 2023
-        prev_year_cost = (machine_cost_current - machine_cost_prev) * 0.12
-        adjusted_cost = (machine_cost_current - prev_3_year_avg) * avg_rate_after_2023
-        machine_cost_total = prev_year_cost + min(adjusted_cost, prev_year_cost * 2)
 
-    machine_cost_total = max(machine_cost_total, 0)
+class TrafficArchive:
+    """
+    request.json 교환(요청 → 응답 본문)을 기록하고 재생하는 파일 보관소.
 
-    total = machine_cost_total + salary_adjustment
-    return machine_cost_total, salary_adjustment, total
+    파일은 MAGIC 뒤에 레코드를 이어 붙인 형식입니다. 레코드는 헤더(요청 키 SHA-1, 요청 길이,
+    응답 길이), 정규화된 요청 JSON, zlib으로 압축한 응답 본문으로 이루어집니다.
+    재생 모드에서는 파일을 mmap으로 열어 레코드 헤더만 훑어 색인을 만들고, 응답은 요청될 때만
+    압축을 풉니다. 수천 개 기업의 기록도 메모리에 모두 올리지 않고 재생할 수 있습니다.
+    """
 
-def convert_to_numeric(value):
-    """문자열을 숫자로 변환하고, '-' 같은 특수문자는 NaN으로 처리"""
-    if isinstance(value, str):
-        if value.strip() == '-' or value.strip() == '':
-            return float('nan')  # ✅ NaN을 float으로 유지
-        try:
-            return int(value.replace(',', '').strip())
-        except ValueError:
-            return float('nan') 
-    return value  # 이미 숫자면 그대로 반환
+    MAGIC = b"SOKHAMRR1\n"
+    RECORD = struct.Struct("<20sII")
+    VOLATILE_HEADER_KEYS = ("userId",)  # 계정마다 달라지는 값은 요청 키에서 제외
 
+    def __init__(self, path=CRETOP_ARCHIVE, mode="replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"알 수 없는 전송 모드: {mode}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = {}  # 요청 키 → (요청 위치, 요청 길이, 응답 길이). 이번 실행에서 기록한 요청은 None
+        self._map = None
+        if mode == "replay" or (os.path.exists(path) and os.path.getsize(path) > 0):
+            self._load()
 
-@app.route('/calculate', methods=['GET'])
-def calculate():
-   
-    start_year = 2019
-    years = list(range(2018, 2024))
-    # machine_costs = dict(zip(years, machine))
-    # pogwal_salary = dict(zip(years, pogwal))
-    # sonik_salary = dict(zip(years, sonik))
-    # jejo_salary = dict(zip(years, jejo))
-
-    machine_costs = {year: convert_to_numeric(x) for year, x in zip(years, machine)}
-    pogwal_salary = {year: convert_to_numeric(x) for year, x in zip(years, pogwal)}
-    sonik_salary = {year: convert_to_numeric(x) for year, x in zip(years, sonik)}
-    jejo_salary = {year: convert_to_numeric(x) for year, x in zip(years, jejo)}
-    
-    if all(value is None for value in pogwal_salary.values()):
-        pogwal_salary = None
-    if all(value is None for value in sonik_salary.values()):
-        sonik_salary = None
-    if all(value is None for value in jejo_salary.values()):
-        jejo_salary = None
+    @property
+    def replaying(self):
+        return self.mode == "replay"
 
-    if not pogwal_salary and not sonik_salary and not jejo_salary:
-        return "포괄 급여나 손익/제조 급여가 필요합니다.", 400
-    elif not pogwal_salary:
-        pogwal_salary = None  # 명시적으로 설정
+    @classmethod
+    def request_key(cls, data):
+        """요청의 (SHA-1 키, 정규화된 요청 JSON 바이트)를 반환합니다."""
+        data = dict(data)
+        if isinstance(data.get("header"), dict):
+            data["header"] = {key: value for key, value in data["header"].items() if key not in cls.VOLATILE_HEADER_KEYS}
+        canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        return hashlib.sha1(canonical).digest(), canonical
 
-    results, total_machine_cost, total_salary_adjustment, total_cost = {}, 0, 0, 0
+    def _load(self):
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(self.MAGIC)] != self.MAGIC:
+            raise ValueError(f"기록 보관소 형식이 아닙니다: {self.path}")
+        offset, size = len(self.MAGIC), len(self._map)
+        while offset + self.RECORD.size <= size:
+            key, request_len, response_len = self.RECORD.unpack_from(self._map, offset)
+            start = offset + self.RECORD.size
+            offset = start + request_len + response_len
+            if offset > size:
+                break  # 기록 도중 끊긴 마지막 레코드
+            self._index[key] = (start, request_len, response_len)
+        print(f"✅ 기록 보관소 {self.path}: 교환 {len(self._index)}건")
 
-    # 연도별 비용 계산
-    for year in range(start_year, start_year + 5):
-        try:
-            machine_cost_total, salary_adjustment, total = calculate_yearly_cost(
-                year, machine_costs, pogwal_salary, sonik_salary, jejo_salary
-            )
-            results[year] = {"machine_cost_total": round(machine_cost_total),
-                             "salary_adjustment": round(salary_adjustment),
-                             "total": round(total)}
+    def record(self, data, text):
+        """로그인 상태의 응답만 기록합니다. 이미 기록된 요청은 건너뜁니다."""
+        if not is_logged_in_response(text):
+            return
+        key, canonical = self.request_key(data)
+        body = zlib.compress(text.encode("utf-8"))
+        with self._lock:
+            if key in self._index:
+                return
+            with open(self.path, "ab") as f:
+                if f.tell() == 0:
+                    f.write(self.MAGIC)
+                f.write(self.RECORD.pack(key, len(canonical), len(body)) + canonical + body)
+            self._index[key] = None
 
-            total_machine_cost += machine_cost_total
-            total_salary_adjustment += salary_adjustment
-            total_cost += total
+    def replay(self, data):
+        """
+        기록된 응답 본문을 반환합니다.
 
-        except KeyError as e:
-            results[year] = {"error": f"데이터가 없습니다: {e}"}
-        except ValueError as e:
-            results[year] = {"error": f"계산 오류: {e}"}
+        기록에 없는 요청은 값이 없는 로그인 상태 응답(header만)으로 처리하므로,
+        조회 결과에서는 '데이터를 찾을 수 없음'으로 나타납니다.
+        """
+        key, _ = self.request_key(data)
+        entry = self._index.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is None:
+            print(f"❌ 기록에 없는 요청: {json.dumps(data, ensure_ascii=False)[:200]}")
+            return json.dumps({"header": data.get("header", {})}, ensure_ascii=False)
+        start, request_len, response_len = entry
+        return zlib.decompress(self._map[start + request_len:start + request_len + response_len]).decode("utf-8")
 
-    totals = {"machine_cost_total": round(total_machine_cost),
-              "salary_adjustment": round(total_salary_adjustment),
-              "total": round(total_cost)}
+    def requests(self):
+        """보관소에 기록된 요청 본문을 기록 순서대로 반환합니다."""
+        for entry in self._index.values():
+            if entry is not None:
+                start, request_len, _ = entry
+                yield json.loads(self._map[start:start + request_len])
 
-    company_name = search_text
-    return render_template('result.html', results=results, totals=totals, company_name=company_name, start_year=start_year, before_loss=before_loss, taxes=taxes)
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
 
 
-@app.route('/rerun', methods=['POST'])
-def rerun():
-    """검색어만 초기화하고 로그인 페이지로 이동"""
-    global driver  # 전역 변수로 관리되는 경우
-    
-    if 'driver' in globals() and driver is not None:
-        try:
-            driver.quit()  # Selenium 드라이버 종료
-        except Exception as e:
-            print(f"드라이버 종료 중 오류 발생: {e}")
-        finally:
-            driver = None  # 드라이버 객체 초기화
-            
-    session.pop("search_key", None)  # 기존 검색어만 삭제
-    return redirect(url_for('login'))
+def use_traffic_archive(path=CRETOP_ARCHIVE, mode="replay"):
+    """request.json 전송 모드를 바꿉니다. mode가 'live'이면 보관소를 사용하지 않습니다."""
+    global traffic_archive
+    previous, traffic_archive = traffic_archive, (None if mode == "live" else TrafficArchive(path, mode))
+    if previous is not None:
+        previous.close()
+    return traffic_archive
 
 
-  # 웹 브라우저 자동 실행 함수
-def open_browser():
-    webbrowser.open("http://127.0.0.1:5000")  # 기본 페이지 자동 오픈
-    
-if __name__ == '__main__':
+traffic_archive = None  # init_state()에서 CRETOP_TRANSPORT에 맞춰 설정
+
+
+STATEMENT_YEARS = 5  # 응답 하나의 val1..val5 = 기준연도-4 .. 기준연도
+DATA_FIRST_YEAR = int(os.environ.get("DATA_FIRST_YEAR", "2018"))  # 기본 조회 시작 연도 (전년 대비 계산용)
+DATA_LAST_YEAR = int(os.environ.get("DATA_LAST_YEAR", "2023"))  # 기본 조회 마지막 연도
+MAX_DATA_YEARS = 20  # 한 번에 조회할 수 있는 최대 연도 수
+DATA_YEARS = list(range(DATA_FIRST_YEAR, DATA_LAST_YEAR + 1))
+
+
+def year_window(first_year=None, last_year=None):
+    """
+    조회 연도 범위를 검사해 연도 목록으로 반환합니다. 빈 값은 기본 범위를 씁니다.
+
+    Raises:
+        ValueError: 숫자가 아니거나, 두 해 미만이거나, MAX_DATA_YEARS를 넘는 경우.
+    """
+    try:
+        first = int(first_year) if first_year not in (None, "") else DATA_FIRST_YEAR
+        last = int(last_year) if last_year not in (None, "") else DATA_LAST_YEAR
+    except (TypeError, ValueError):
+        raise ValueError(f"조회 연도는 숫자여야 합니다: {first_year} ~ {last_year}")
+    if last <= first:
+        raise ValueError(f"조회 연도 범위는 두 해 이상이어야 합니다: {first} ~ {last}")
+    if last - first + 1 > MAX_DATA_YEARS:
+        raise ValueError(f"조회 연도 범위가 너무 깁니다 (최대 {MAX_DATA_YEARS}년): {first} ~ {last}")
+    return list(range(first, last + 1))
+
+
+def plan_statement_years(years):
+    """
+    연도 범위를 덮는 가장 적은 기준연도(acctDt) 목록을 고릅니다.
+
+    응답 하나가 기준연도 포함 5개년을 담으므로 마지막 연도부터 5년씩 내려갑니다. 남은 연도가
+    5개 이하이면 그 연도를 모두 덮는 가장 최근 기준연도를 써서, 겹치는 연도는 더 최근 응답의
+    값을 씁니다. (2018~2023 → 2023년 기준 2019~2023, 2022년 기준 2018)
+
+    Returns:
+        dict: {기준연도: [이 응답에서 가져올 연도, ...]} (최근 기준연도부터)
+    """
+    first, last = min(years), max(years)
+    plan = {}
+    upper, limit = last, last
+    while upper >= first:
+        anchor = max(upper, min(limit, first + STATEMENT_YEARS - 1))
+        plan[anchor] = list(range(max(first, anchor - STATEMENT_YEARS + 1), upper + 1))
+        upper, limit = anchor - STATEMENT_YEARS, anchor - 1
+    return plan
+
+
+def plan_statement_requests(tab_names, anchor_years):
+    """
+    탭 목록을 중복 없는 (acctDt, fsCcd, fsCls) 요청 단위로 묶습니다.
+
+    Args:
+        tab_names (list): 조회할 탭 이름 목록.
+        anchor_years (iterable): 조회 기준연도 목록 (plan_statement_years 결과).
+
+    Returns:
+        dict: {(acctDt, fsCcd, fsCls): [(year, tab_name), ...]}
+    """
+    plan = {}
+    for year in anchor_years:
+        for tab_name in tab_names:
+            tab_data = target_tabs[tab_name]
+            key = (f"{year}1231", tab_data["fsCcd"], tab_data["fsCls"])
+            plan.setdefault(key, []).append((year, tab_name))
+    return plan
+
+
+CACHE_DB_FILE = os.environ.get("CRETOP_CACHE_DB", "cretop_cache.db")
+STATEMENT_CACHE_TTL = int(os.environ.get("STATEMENT_CACHE_TTL", str(24 * 60 * 60)))  # 마감 전 회계연도 응답 유효시간 (초)
+EMPTY_STATEMENT_CACHE_TTL = int(os.environ.get("EMPTY_STATEMENT_CACHE_TTL", str(10 * 60)))  # 계정 행이 없는 응답 유효시간 (초)
+CLOSED_FISCAL_YEAR_MONTHS = int(os.environ.get("CLOSED_FISCAL_YEAR_MONTHS", "6"))  # 결산일 이후 확정으로 보는 개월 수
+
+
+class StatementCache:
+    """
+    ETFI1122R 응답을 (kedcd, acctDt, fsCcd, fsCls) 기준으로 저장하는 SQLite 캐시.
+
+    결산일로부터 `closed_months`개월이 지난 회계연도의 응답은 `closed_ttl`(기본 영구) 동안,
+    그 외 응답은 `ttl`초 동안 유효합니다. 계정 행이 없는 응답은 일시적인 빈 응답일 수 있으므로
+    회계연도와 관계없이 `empty_ttl`초만 보관합니다.
+    """
+
+    def __init__(self, path=CACHE_DB_FILE, ttl=STATEMENT_CACHE_TTL, closed_ttl=None, closed_months=CLOSED_FISCAL_YEAR_MONTHS,
+                 empty_ttl=EMPTY_STATEMENT_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.closed_ttl = closed_ttl
+        self.empty_ttl = empty_ttl
+        self.closed_months = closed_months
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS statement_cache (
+                    kedcd TEXT NOT NULL,
+                    acct_dt TEXT NOT NULL,
+                    fs_ccd TEXT NOT NULL,
+                    fs_cls TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL,
+                    PRIMARY KEY (kedcd, acct_dt, fs_ccd, fs_cls)
+                )"""
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def is_closed(self, acctDt):
+        """결산일 이후 `closed_months`개월이 지나 값이 확정된 회계연도인지 확인합니다."""
+        closed = datetime.strptime(acctDt, "%Y%m%d")
+        month = closed.month + self.closed_months
+        closed = closed.replace(year=closed.year + (month - 1) // 12, month=(month - 1) % 12 + 1, day=1)
+        return datetime.today() >= closed
+
+    def ttl_for(self, acctDt, table):
+        """파싱한 응답(StatementTable)의 유효시간(초)을 반환합니다. None이면 만료되지 않습니다."""
+        if not len(table):
+            return min(self.empty_ttl, self.ttl)
+        if self.is_closed(acctDt):
+            return self.closed_ttl
+        return self.ttl
+
+    def get(self, kedcd, acctDt, fsCcd, fsCls):
+        """캐시된 응답 본문을 반환합니다. 없거나 만료되었으면 None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT body FROM statement_cache WHERE kedcd = ? AND acct_dt = ? AND fs_ccd = ? AND fs_cls = ?"
+                " AND (expires_at IS NULL OR expires_at > ?)",
+                (kedcd, acctDt, fsCcd, fsCls, time.time()),
+            ).fetchone()
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def put(self, kedcd, acctDt, fsCcd, fsCls, body):
+        """응답 본문을 저장합니다. JSON이 아닌 응답(오류 페이지 등)은 저장하지 않습니다."""
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            return
+        now = time.time()
+        ttl = self.ttl_for(acctDt, StatementTable.from_payload(payload))
+        expires_at = None if ttl is None else now + ttl
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO statement_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kedcd, acctDt, fsCcd, fsCls, body, now, expires_at),
+            )
+
+    def invalidate(self, kedcd=None, acctDt=None):
+        """
+        조건에 맞는 캐시 항목을 삭제합니다. 조건이 없으면 전체를 삭제합니다.
+
+        Returns:
+            int: 삭제된 항목 수.
+        """
+        conditions, params = [], []
+        if kedcd:
+            conditions.append("kedcd = ?")
+            params.append(kedcd)
+        if acctDt:
+            conditions.append("acct_dt = ?")
+            params.append(acctDt)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(f"DELETE FROM statement_cache{where}", params).rowcount
+
+    def stats(self):
+        """적중/실패 횟수와 저장된 항목 수를 반환합니다."""
+        with closing(self._connect()) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM statement_cache").fetchone()[0]
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / lookups if lookups else 0.0, "entries": entries}
+
+
+statement_cache = None  # init_state()에서 생성
+
+
+def fetch_statements(session, headers, username, kedcd, keys, before_fetch=None, progress=None):
+    """
+    계획된 재무제표 요청을 캐시에서 먼저 찾고, 없는 것만 병렬로 보내 응답 본문을 반환합니다.
+
+    Args:
+        session: 로그인 쿠키가 설정된 requests 세션.
+        headers (dict): 요청 헤더.
+        username (str): 사용자 아이디.
+        kedcd (str): 기업 코드.
+        keys (iterable): (acctDt, fsCcd, fsCls) 요청 목록.
+        before_fetch (callable): 캐시에 없는 요청을 보내기 전에 한 번 호출됩니다 (로그인 쿠키 준비 등).
+        progress (callable): 재무제표를 하나 받을 때마다 "statement" 이벤트를 알립니다.
+
+    Returns:
+        dict: {(acctDt, fsCcd, fsCls): 응답 본문}
+    """
+    archive = traffic_archive
+    if archive is not None and archive.replaying:
+        # 재생은 보관소의 응답만 사용 (캐시 조회/저장 없음)
+        return {key: post_request_json(session, build_statement_request(username, kedcd, *key), headers) for key in keys}
+
+    responses = {}
+    missing = []
+    for key in keys:
+        body = statement_cache.get(kedcd, *key)
+        if body is None:
+            missing.append(key)
+        else:
+            responses[key] = body
+            report_progress(progress, "statement", acctDt=key[0], fsCcd=key[1], fsCls=key[2], cached=True)
+            if archive is not None:
+                # 캐시에서 가져온 응답도 기록해 두어야 재생할 수 있음
+                archive.record(build_statement_request(username, kedcd, *key), body)
+    if responses:
+        print(f"✅ 캐시에서 재무제표 {len(responses)}건 사용")
+    if not missing:
+        return responses
+    if before_fetch is not None:
+        before_fetch()
+
+    def fetch(key):
+        acctDt, fsCcd, fsCls = key
+        data = build_statement_request(username, kedcd, acctDt, fsCcd, fsCls)
+        with span("statement_request"):
+            return post_request_json(session, data, headers)
+
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(missing))) as executor:
+        for key, body in zip(missing, executor.map(fetch, missing)):
+            statement_cache.put(kedcd, *key, body)
+            responses[key] = body
+            report_progress(progress, "statement", acctDt=key[0], fsCcd=key[1], fsCls=key[2], cached=False)
+    return responses
+
+
+def normalize_account_name(name):
+    """계정 영문명의 들여쓰기/공백 차이를 없앤 비교용 키를 만듭니다."""
+    return " ".join(str(name).split()).casefold()
+
+
+class StatementTable:
+    """
+    ETFI1122R 응답 하나를 파싱한 계정 표.
+
+    응답은 한 번만 파싱하고, 계정 행을 정규화된 accNmEng로 색인합니다.
+    같은 응답에서 여러 계정을 찾을 때 추가 요청이나 파싱이 필요 없습니다.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.by_name = {}
+        for row in rows:
+            self.by_name.setdefault(normalize_account_name(row["accNmEng"]), []).append(row)
+
+    @classmethod
+    def parse(cls, response_text):
+        """응답 본문에서 accNmEng를 가진 모든 행을 찾아 표를 만듭니다. JSON이 아니면 빈 표."""
+        try:
+            payload = json.loads(response_text)
+        except (TypeError, json.JSONDecodeError):
+            return cls([])
+        return cls.from_payload(payload)
+
+    @classmethod
+    def from_payload(cls, payload):
+        """파싱된 응답 JSON에서 accNmEng를 가진 모든 행을 찾아 표를 만듭니다."""
+        rows = []
+        nodes = [payload]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, dict):
+                if isinstance(node.get("accNmEng"), str):
+                    rows.append(node)
+                nodes.extend(reversed(list(node.values())))
+            elif isinstance(node, list):
+                nodes.extend(reversed(node))
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def find(self, accNmEng):
+        """
+        계정 영문명으로 행을 찾습니다.
+
+        정규화된 이름이 같은 행 중 원래 이름(들여쓰기 포함)을 포함하는 행을 우선하고,
+        정규화된 이름이 같은 행이 없으면 이름에 포함되는 행을 찾습니다.
+        """
+        candidates = self.by_name.get(normalize_account_name(accNmEng))
+        if candidates:
+            return [row for row in candidates if accNmEng in row["accNmEng"]] or candidates
+        return [row for row in self.rows if accNmEng in row["accNmEng"]]
+
+    @staticmethod
+    def values(row):
+        """행의 val1..val5 값을 반환합니다."""
+        return [row.get(f'val{i}') for i in range(1, 6)]
+
+
+def load_statement_tables(session, headers, username, kedcd, keys, before_fetch=None, progress=None):
+    """
+    재무제표를 (캐시 또는 요청으로) 가져와 StatementTable로 파싱합니다.
+
+    Returns:
+        dict: {(acctDt, fsCcd, fsCls): StatementTable}
+    """
+    responses = fetch_statements(session, headers, username, kedcd, keys, before_fetch, progress)
+    with span("statement_parse"):
+        return {key: StatementTable.parse(body) for key, body in responses.items()}
+
+
+def extract_tab_values(tab_name, year, table):
+    """계정 표에서 탭의 계정 값을 찾아 [탭, 연도, val1..val5] 행 목록으로 반환합니다."""
+    return [[tab_name] + [year] + table.values(row) for row in table.find(target_tabs[tab_name]["accNmEng"])]
+
+
+def skipped_tabs_for(has_pogwal):
+    """'포괄손익계산서' 유무에 따라 조회하지 않을 탭 목록을 반환합니다."""
+    if not has_pogwal:
+        return ["포괄손익계산서", "포괄_법인세비용차감전순이익", "포괄_법인세비용"]
+    return ["손익계산서", "제조원가명세서", "법인세비용차감순손익", "법인세비용"]
+
+
+def pick_tab_row(rows):
+    """같은 계정으로 찾아진 행 중 값이 있는 마지막 행을 고릅니다. 모두 비어 있으면 첫 행."""
+    with_values = [row for row in rows if any(value is not None for value in row[2:])]
+    return with_values[-1] if with_values else rows[0]
+
+
+def collect_tabs_values(session, headers, username, kedcd, years, existing_tabs=None, before_fetch=None, progress=None):
+    """
+    연도 범위의 탭 값을 request.json으로만 조회합니다.
+
+    plan_statement_years로 고른 기준연도만 요청하고, 같은 재무제표를 쓰는 탭은 하나의 요청으로
+    묶어 병렬로 보낸 뒤, 응답의 val1..val5를 연도별로 나눠 담습니다.
+
+    Args:
+        session: 로그인 쿠키가 설정된 requests 세션.
+        headers (dict): 요청 헤더.
+        username (str): 사용자 아이디.
+        kedcd (str): 기업 코드.
+        years (list): 조회할 연도 목록 (연속된 범위).
+        existing_tabs (set): 재무 페이지에 보이는 탭 이름. None이면 응답으로 '포괄손익계산서' 유무를 판단합니다.
+        before_fetch (callable): 캐시에 없는 재무제표를 요청하기 전에 한 번 호출됩니다.
+        progress (callable): 재무제표 수신("statement")과 탭 값("values") 이벤트를 알립니다.
+
+    Returns:
+        dict: {탭: {연도: 값}}. 조회하지 않았거나 찾지 못한 탭의 값은 None.
+    """
+    if existing_tabs is None:
+        fetch_tabs = list(target_tabs)
+    else:
+        skipped_tabs = skipped_tabs_for("포괄손익계산서" in existing_tabs)
+        fetch_tabs = [tab_name for tab_name in target_tabs if tab_name not in skipped_tabs]
+
+    year_plan = plan_statement_years(years)
+    plan = plan_statement_requests(fetch_tabs, year_plan)
+    print(f"✅ 재무제표 요청 {len(plan)}건 (기준연도 {list(year_plan)}, 탭 {len(fetch_tabs)}개, {years[0]}~{years[-1]})")
+    tables = load_statement_tables(session, headers, username, kedcd, plan.keys(), before_fetch, progress)
+
+    def tab_rows(tab_name, anchor):
+        tab_data = target_tabs[tab_name]
+        return extract_tab_values(tab_name, anchor, tables[(f"{anchor}1231", tab_data["fsCcd"], tab_data["fsCls"])])
+
+    if existing_tabs is None:
+        # 탭 목록을 볼 수 없으면 포괄손익계산서 응답에 값이 있는지로 판단
+        has_pogwal = any(tab_rows("포괄손익계산서", anchor) for anchor in year_plan)
+        skipped_tabs = skipped_tabs_for(has_pogwal)
+        fetch_tabs = [tab_name for tab_name in fetch_tabs if tab_name not in skipped_tabs]
+
+    results = {tab_name: dict.fromkeys(years) for tab_name in target_tabs}
+    for tab_name in fetch_tabs:
+        normalized_accNmEng = " ".join(target_tabs[tab_name]["accNmEng"].split())
+        for anchor, anchor_years in year_plan.items():
+            rows = tab_rows(tab_name, anchor)
+            if not rows:
+                print(f"❌ {tab_name} ({anchor}) 데이터를 찾을 수 없습니다.")
+                continue
+            row = pick_tab_row(rows)
+            for year in anchor_years:
+                results[tab_name][year] = row[2 + year - (anchor - STATEMENT_YEARS + 1)]
+            print(f"✅ {tab_name} ({normalized_accNmEng}, {anchor}): {row}")
+            report_progress(progress, "values", tab=tab_name, values={year: results[tab_name][year] for year in anchor_years})
+    return results
+
+
+def get_all_tabs_values(driver, username, kedcd, session, years, progress=None):
+    """재무 페이지가 열린 드라이버의 쿠키와 탭 목록을 사용해 collect_tabs_values를 호출합니다."""
+    cookies = driver.get_cookies()
+    for cookie in cookies:
+        session.cookies.set(cookie['name'], cookie['value'])
+
+    # ✅ 탭 리스트 가져오기
+    tabs = driver.find_elements(By.CSS_SELECTOR, "ul.tab-group-ul > li > a")
+    existing_tabs = {tab.text.strip() for tab in tabs}
+
+    headers = make_request_headers(driver.current_url)
+    return collect_tabs_values(session, headers, username, kedcd, years, existing_tabs, progress=progress)
+
+
+COMPANY_NAME_KEYS = ("korEnpNm", "enpNm", "enpNmKor", "kedEnpNm", "cmpNm")
+
+
+def find_company_records(payload):
+    """응답 JSON에서 kedcd와 사업자번호를 가진 레코드를 순서대로 찾습니다."""
+    records = []
+    nodes = [payload]
+    while nodes:
+        node = nodes.pop(0)
+        if isinstance(node, dict):
+            if node.get("kedcd") and "bzno" in node:
+                records.append(node)
+            nodes.extend(node.values())
+        elif isinstance(node, list):
+            nodes.extend(node)
+    return records
+
+
+def build_company_search_request(username, bzno, page_count=20):
+    """검색 화면의 request.json 거래 본문을 만듭니다."""
+    trxCd = COMPANY_SEARCH_TRX["trxCd"]
+    return {
+        "header": build_request_header(username, trxCd, COMPANY_SEARCH_TRX["screenId"], COMPANY_SEARCH_TRX["menuId"], bzno=bzno),
+        trxCd: {
+            COMPANY_SEARCH_KEYWORD: bzno,
+            "srchCls": "1",
+            "pageNum": 1,
+            "pageCount": page_count
+        }
+    }
+
+
+@span("resolve_http")
+def resolve_company_http(session, username, search_key, progress=None):
+    """
+    검색 화면의 request.json 거래로 사업자번호에 해당하는 기업을 찾습니다.
+
+    Args:
+        session: 로그인 쿠키가 설정된 requests 세션.
+        username (str): 사용자 아이디.
+        search_key (str): 사업자번호 (하이픈 포함 여부 무관).
+
+    Returns:
+        tuple: (kedcd, 기업명). 찾지 못하면 None.
+    """
+    bzno = re.sub(r"\D", "", search_key)
+    data = build_company_search_request(username, bzno)
+
+    try:
+        payload = json.loads(post_request_json(session, data, make_request_headers()))
+    except (requests.RequestException, json.JSONDecodeError) as e:
+        print(f"❌ 검색 요청 실패: {e}")
+        return None
+
+    for record in find_company_records(payload):
+        if re.sub(r"\D", "", str(record["bzno"])) == bzno:
+            company_name = next((record[key].strip() for key in COMPANY_NAME_KEYS if record.get(key)), "")
+            print(f"✅ `kedcd` 값 찾음: {record['kedcd']} ({company_name})")
+            report_progress(progress, "search_match", company_name=company_name, bzno=bzno)
+            return record["kedcd"], company_name
+
+    print(f"❌ '{search_key}' 검색 결과에서 기업을 찾지 못했습니다.")
+    return None
+
+
+views = Blueprint("views", __name__)
+
+def get_chrome_user_data_dir():
+    system = platform.system()
+    base_dir = os.path.expanduser("~")
+
+    if system == "Windows":
+        return os.path.join(base_dir, "AppData", "Local", "Google", "Chrome", "User Data")
+    elif system == "Darwin":  # macOS
+        return os.path.join(base_dir, "Library", "Application Support", "Google", "Chrome")
+    elif system == "Linux":  # Linux
+        return os.path.join(base_dir, ".config", "google-chrome")
+    else:
+        raise NotImplementedError("이 운영 체제에서는 지원되지 않습니다.")
+
+def get_copied_user_data_dir():
+    system = platform.system()
+    base_dir = os.path.expanduser("~")
+
+    if system == "Windows":
+        return os.path.join(base_dir, "AppData", "Local", "Google", "Chrome_Selenium")
+    elif system == "Darwin":  # macOS
+        return os.path.join(base_dir, "Library", "Application Support", "Google", "Chrome_Selenium")
+    elif system == "Linux":  # Linux
+        return os.path.join(base_dir, ".config", "google-chrome-selenium")
+    else:
+        raise NotImplementedError("이 운영 체제에서는 지원되지 않습니다.")
+
+USER_DATA_DIR = get_chrome_user_data_dir()
+COPIED_USER_DATA_DIR = get_copied_user_data_dir()
+
+# 자동화에 필요한 파일만 복사 (로그인 쿠키, 암호화 키, 기기 인증 정보). 캐시/기록은 제외.
+PROFILE_SYNC_FILES = (
+    "Local State",
+    os.path.join("Default", "Cookies"),
+    os.path.join("Default", "Cookies-journal"),
+    os.path.join("Default", "Network", "Cookies"),
+    os.path.join("Default", "Network", "Cookies-journal"),
+    os.path.join("Default", "Login Data"),
+    os.path.join("Default", "Login Data-journal"),
+    os.path.join("Default", "Preferences"),
+    os.path.join("Default", "Secure Preferences"),
+    os.path.join("Default", "Web Data"),
+    os.path.join("Default", "Web Data-journal"),
+)
+PROFILE_SYNC_DIRS = (
+    os.path.join("Default", "Local Storage"),
+    os.path.join("Default", "Session Storage"),
+)
+FICLONE = 0x40049409  # Linux reflink ioctl
+
+
+def iter_profile_files(root):
+    """동기화 대상 파일의 상대 경로를 반환합니다."""
+    for relative_path in PROFILE_SYNC_FILES:
+        if os.path.isfile(os.path.join(root, relative_path)):
+            yield relative_path
+    for relative_dir in PROFILE_SYNC_DIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(root, relative_dir)):
+            for filename in filenames:
+                yield os.path.relpath(os.path.join(dirpath, filename), root)
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_synced(source, target):
+    """
+    두 파일이 같은지 크기/수정시각으로 먼저 비교하고, 시각만 다르면 해시로 확인합니다.
+    내용이 같으면 대상 파일의 수정시각을 맞춰 다음 비교를 빠르게 합니다.
+    """
+    if not os.path.exists(target):
+        return False
+    source_stat, target_stat = os.stat(source), os.stat(target)
+    if source_stat.st_size != target_stat.st_size:
+        return False
+    if source_stat.st_mtime_ns == target_stat.st_mtime_ns:
+        return True
+    if file_digest(source) != file_digest(target):
+        return False
+    os.utime(target, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+    return True
+
+
+def clone_file(source, target):
+    """
+    파일을 복제합니다. 지원되는 파일 시스템에서는 reflink(copy-on-write)를 사용합니다.
+
+    하드링크는 복사본에서 크롬이 쓰는 내용이 원본 프로파일에 그대로 반영되므로 사용하지 않습니다.
+    """
+    temp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        cloned = False
+        if fcntl is not None:
+            try:
+                with open(source, "rb") as src, open(temp_path, "wb") as dst:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                cloned = True
+            except OSError:
+                pass
+        if not cloned:
+            shutil.copyfile(source, temp_path)
+        shutil.copystat(source, temp_path)
+        os.chmod(temp_path, os.stat(temp_path).st_mode | stat.S_IWUSR)
+        os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def sync_profile(source_dir, target_dir, allow_kill=True):
+    """
+    원본 크롬 프로파일에서 자동화에 필요한 파일만 증분 동기화합니다.
+
+    Args:
+        source_dir (str): 원본 user-data-dir.
+        target_dir (str): 복사본 user-data-dir.
+        allow_kill (bool): 크롬이 잠근 파일이 있을 때 크롬을 강제종료하고 다시 시도할지 여부 (윈도우).
+
+    Returns:
+        dict: copied / skipped / removed / locked 파일 수.
+    """
+    stats = {"copied": 0, "skipped": 0, "removed": 0, "locked": 0}
+    if not os.path.isdir(source_dir):
+        print(f"❌ 크롬 프로파일이 없습니다: {source_dir}")
+        return stats
+
+    def copy(relative_paths):
+        locked = []
+        for relative_path in relative_paths:
+            source = os.path.join(source_dir, relative_path)
+            target = os.path.join(target_dir, relative_path)
+            try:
+                if is_synced(source, target):
+                    stats["skipped"] += 1
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                clone_file(source, target)
+                stats["copied"] += 1
+            except PermissionError:
+                locked.append(relative_path)
+            except FileNotFoundError:
+                pass  # 복사 중 크롬이 지운 파일
+        return locked
+
+    source_files = set(iter_profile_files(source_dir))
+    locked = copy(sorted(source_files))
+    if locked and allow_kill and platform.system() == "Windows":
+        os.system("taskkill /IM chrome.exe /F") # 윈도우 크롬 강제종료 코드 (잠긴 파일이 있을 때만 실행됨)
+        locked = copy(locked)
+    stats["locked"] = len(locked)
+    if locked:
+        print(f"❌ 크롬이 사용 중이라 복사하지 못한 파일: {locked}")
+
+    # 원본에서 지워진 파일 정리 (Local Storage 등 leveldb 디렉토리)
+    for relative_path in set(iter_profile_files(target_dir)) - source_files:
+        if relative_path.startswith(PROFILE_SYNC_DIRS):
+            os.remove(os.path.join(target_dir, relative_path))
+            stats["removed"] += 1
+    return stats
+
+
+@span("profile_sync")
+def setup_user_data(user_data_dir=COPIED_USER_DATA_DIR, allow_kill=True):
+    """원본 크롬 프로파일을 드라이버용 프로파일 경로로 증분 동기화합니다."""
+    started = time.monotonic()
+    stats = sync_profile(USER_DATA_DIR, user_data_dir, allow_kill=allow_kill)
+    print(f"사용자 데이터 동기화 완료 ({time.monotonic() - started:.2f}초): {user_data_dir} {stats}")
+
+
+_profile_sync_thread = None
+
+
+_process_profile_index = None
+_process_profile_lock = None
+
+
+def process_profile_index():
+    """
+    이 프로세스가 쓸 크롬 프로파일 번호. gunicorn 작업 프로세스마다 다른 번호를 받습니다.
+
+    같은 프로파일 폴더를 두 크롬이 동시에 열 수 없으므로, 비어 있는 가장 작은 번호의 잠금 파일을
+    flock으로 잡고 프로세스가 끝날 때까지 유지합니다 (프로세스가 죽으면 잠금도 풀림).
+    flock이 없는 환경(윈도우)은 한 프로세스만 띄운다고 보고 0을 사용합니다.
+    """
+    global _process_profile_index, _process_profile_lock
+    if _process_profile_index is not None:
+        return _process_profile_index
+    if fcntl is None:
+        _process_profile_index = 0
+        return 0
+    os.makedirs(os.path.dirname(COPIED_USER_DATA_DIR), exist_ok=True)
+    index = 0
+    while True:
+        handle = open(f"{COPIED_USER_DATA_DIR}.worker{index}.lock", "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            index += 1
+            continue
+        _process_profile_lock, _process_profile_index = handle, index
+        return index
+
+
+def process_user_data_dir():
+    """이 프로세스의 기본 프로파일 복사본 경로. 첫 프로세스는 기존 복사본을 그대로 사용합니다."""
+    index = process_profile_index()
+    return COPIED_USER_DATA_DIR if index == 0 else f"{COPIED_USER_DATA_DIR}_w{index}"
+
+
+def start_profile_sync():
+    """서버 시작 시 프로파일 동기화를 백그라운드에서 시작합니다."""
+    global _profile_sync_thread
+    if _profile_sync_thread is None:
+        _profile_sync_thread = threading.Thread(target=setup_user_data, args=(process_user_data_dir(),), daemon=True)
+        _profile_sync_thread.start()
+
+
+def wait_for_profile_sync():
+    """시작 시 동기화가 진행 중이면 끝날 때까지 기다립니다."""
+    if _profile_sync_thread is not None:
+        _profile_sync_thread.join()
+
+
+def wait_for_profile_sync_with_progress(progress=None):
+    """브라우저를 쓰기 전에 프로파일 동기화를 기다리며 진행 상황("profile_sync")을 알립니다."""
+    if _profile_sync_thread is not None and _profile_sync_thread.is_alive():
+        report_progress(progress, "profile_sync", done=False)
+        wait_for_profile_sync()
+    report_progress(progress, "profile_sync", done=True)
+
+BROWSER_POOL_SIZE = int(os.environ.get("BROWSER_POOL_SIZE", "1"))  # 동시에 유지할 크롬 드라이버 수
+BROWSER_MAX_USES = int(os.environ.get("BROWSER_MAX_USES", "20"))  # 드라이버 재생성 전 최대 사용 횟수
+BROWSER_CHECKOUT_TIMEOUT = 300  # 드라이버 대여 대기 시간 (초)
+
+
+CHROMEDRIVER_CACHE_FILE = os.environ.get("CHROMEDRIVER_CACHE_FILE", os.path.join(os.path.expanduser("~"), ".sokham_chromedriver.json"))
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+
+
+def installed_chrome_version():
+    """설치된 크롬 버전 (예: '133.0.6943.98'). 찾지 못하면 None. 네트워크를 쓰지 않습니다."""
+    try:
+        from webdriver_manager.core.os_manager import OperationSystemManager
+        return OperationSystemManager().get_browser_version_from_os("google-chrome")
+    except Exception as e:
+        print(f"❌ 크롬 버전 확인 실패: {e}")
+        return None
+
+
+def load_chromedriver_cache(path=CHROMEDRIVER_CACHE_FILE):
+    """{"versions": {크롬 버전: 드라이버 경로}, "last": 마지막 드라이버 경로}"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"versions": {}, "last": None}
+
+
+def resolve_chromedriver():
+    """
+    설치된 크롬 버전에 맞는 chromedriver 경로를 반환합니다.
+
+    크롬 버전별로 드라이버 경로를 CHROMEDRIVER_CACHE_FILE에 기록해 두고, 같은 버전이면
+    ChromeDriverManager의 네트워크 버전 확인 없이 재사용합니다. 프로세스 안에서는 한 번만 확인합니다.
+    설치(다운로드)에 실패하면 마지막으로 사용한 드라이버로 대신합니다 (오프라인).
+
+    Returns:
+        str: 드라이버 경로. 설치도 대신할 드라이버도 없으면 None (selenium 기본 드라이버 탐색 사용).
+    """
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path and os.path.exists(_chromedriver_path):
+            return _chromedriver_path
+
+        version = installed_chrome_version()
+        cache = load_chromedriver_cache()
+        path = cache.get("versions", {}).get(version) if version else None
+        if path and os.path.exists(path):
+            _chromedriver_path = path
+            return path
+
+        try:
+            with span("driver_install"):
+                path = ChromeDriverManager().install()
+        except Exception as e:
+            path = cache.get("last")
+            if not (path and os.path.exists(path)):
+                print(f"❌ chromedriver 설치 실패, 기본 드라이버 사용: {e}")
+                return None
+            print(f"❌ chromedriver 설치 실패, 마지막 드라이버 사용: {path} ({e})")
+            _chromedriver_path = path
+            return path
+
+        if version:
+            cache.setdefault("versions", {})[version] = path
+        cache["last"] = path
+        try:
+            with open(CHROMEDRIVER_CACHE_FILE, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            print(f"❌ chromedriver 경로 저장 실패: {e}")
+        print(f"✅ chromedriver 준비 완료 (크롬 {version or '버전 미확인'}): {path}")
+        _chromedriver_path = path
+        return path
+
+
+def create_driver(user_data_dir):
+    """
+    지정한 프로파일 경로로 headless 크롬 드라이버를 생성합니다.
+
+    Args:
+        user_data_dir (str): 크롬 user-data-dir 경로.
+
+    Returns:
+        WebDriver: 생성된 크롬 드라이버.
+    """
+    options = webdriver.ChromeOptions()
+    options.add_experimental_option("excludeSwitches", ["enable-logging"])
+    options.add_experimental_option("detach", True) # 화면 창 닫기 방지
+    options.add_argument(f"user-data-dir={user_data_dir}")  # 복사된 프로파일 경로 지정
+    options.add_argument("--profile-directory=Default")  # 특정 프로파일 중 default 사용
+    options.add_argument("--headless")  # Headless 모드 활성화
+    options.add_argument("--disable-autofill")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-dev-shm-usage")
+
+    #driver 실행
+    service = Service(resolve_chromedriver())
+    with span("driver_start"):
+        driver = webdriver.Chrome(service=service, options=options)
+        NetworkCapture(driver).install()  # request.json 응답 수집 (kedcd 확인용)
+    return driver
+
+
+def ensure_logged_in(driver, username, password, fresh=True):
+    """
+    크레탑 첫 화면으로 이동한 뒤 로그인 상태를 보장합니다.
+
+    Args:
+        driver: Selenium WebDriver 객체.
+        username (str): 사용자 아이디.
+        password (str): 사용자 비밀번호.
+        fresh (bool): 새로 띄운 드라이버 여부. 재사용 드라이버는 팝업 대기를 생략합니다.
+
+    Returns:
+        bool: 로그인 화면에서 새로 로그인했으면 True, 이미 로그인 상태였으면 False.
+    """
+    with span("site_load"):
+        driver.get(CRETOP_URL)
+    if fresh:
+        driver.maximize_window()
+        driver.execute_script("document.body.style.zoom='100%'")
+        print("사이트 접속 완료")
+        traced_sleep(1, "sleep_after_site_load")
+
+    # 팝업 처리 (재사용 드라이버는 팝업이 떠 있을 때만 처리)
+    if fresh or driver.find_elements(By.CLASS_NAME, "check-close__footer"):
+        if handle_popup(driver, popup_class="check-close__footer", button_text="[닫기]"):
+            print("팝업 처리가 완료되었습니다.")
+        else:
+            print("팝업 처리가 실패했습니다.")
+
+    if driver.find_elements(By.CSS_SELECTOR, ".login-after"):
+        print("로그인 중입니다.")
+        return False
+    else:
+        if login_to_site(driver, username, password):
+            print("로그인이 성공적으로 완료되었습니다!")
+        else:
+            print("로그인에 실패했습니다.")
+            raise LoginFailedError("로그인에 실패했습니다.")
+
+        # 로그인 확인 버튼 닫기 _ 팝업 처리 함수 
+        if handle_popup(driver):
+            print("팝업 처리가 완료되었습니다.")
+        else:
+            print("팝업 처리가 실패했습니다.")
+
+        traced_sleep(1, "sleep_after_login_popup")
+        return True
+
+
+SESSION_CHECK_INTERVAL = int(os.environ.get("SESSION_CHECK_INTERVAL", "300"))  # 저장된 로그인 쿠키를 다시 확인하는 주기 (초)
+SESSION_KEEPALIVE = int(os.environ.get("SESSION_KEEPALIVE", "600"))  # 로그인 세션 유지/갱신 확인 주기 (초), 0이면 사용 안 함
+SESSION_MAX_AGE = int(os.environ.get("SESSION_MAX_AGE", str(12 * 60 * 60)))  # 로그인 후 이 시간이 지나면 미리 갱신 (초)
+SESSION_REFRESH_MARGIN = 5 * 60  # 쿠키 만료 이 시간 전에 미리 갱신 (초)
+SESSION_COOKIE_KEYS = ("name", "value", "domain", "path", "expiry", "secure", "httpOnly")
+
+
+class SessionStore:
+    """
+    사용자별 로그인 쿠키를 저장하는 SQLite 저장소.
+
+    브라우저 풀과 requests 세션이 같은 쿠키를 쓰므로, 프로세스를 다시 시작해도
+    저장된 세션이 유효하면 로그인 화면을 거치지 않습니다.
+    """
+
+    def __init__(self, path=CACHE_DB_FILE):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS sessions (
+                    username TEXT PRIMARY KEY,
+                    cookies TEXT NOT NULL,
+                    logged_in_at REAL NOT NULL,
+                    checked_at REAL NOT NULL
+                )"""
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def load(self, username):
+        """저장된 쿠키 기록 {"cookies", "logged_in_at", "checked_at"}. 없으면 None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT cookies, logged_in_at, checked_at FROM sessions WHERE username = ?", (username,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"cookies": json.loads(row[0]), "logged_in_at": row[1], "checked_at": row[2]}
+
+    def save(self, username, record):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                (username, json.dumps(record["cookies"]), record["logged_in_at"], record["checked_at"]),
+            )
+
+    def clear(self, username):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM sessions WHERE username = ?", (username,))
+
+
+session_store = None  # init_state()에서 생성
+
+
+def driver_cookies(driver):
+    """드라이버의 쿠키를 저장 가능한 형태로 반환합니다."""
+    return [{key: cookie[key] for key in SESSION_COOKIE_KEYS if key in cookie} for cookie in driver.get_cookies()]
+
+
+def restore_driver_cookies(driver, cookies):
+    """저장된 쿠키를 드라이버에 넣습니다. 크레탑 페이지가 열린 상태여야 합니다."""
+    restored = 0
+    for cookie in cookies:
+        try:
+            driver.add_cookie(cookie)
+            restored += 1
+        except Exception as e:
+            print(f"쿠키 복원 실패 ({cookie.get('name')}): {e}")
+    return restored
+
+
+def is_logged_in_response(text):
+    """request.json 응답이 로그인 상태의 JSON 응답인지 확인합니다. 세션이 끊기면 로그인 화면(HTML)이 옵니다."""
+    try:
+        payload = json.loads(text)
+    except (TypeError, ValueError):
+        return False
+    return isinstance(payload, dict) and "header" in payload
+
+
+def session_expiring(record, now=None, max_age=SESSION_MAX_AGE, margin=SESSION_REFRESH_MARGIN):
+    """로그인 후 max_age가 지났거나 쿠키 만료가 margin 안으로 다가왔는지 확인합니다."""
+    now = now or time.time()
+    if now - record["logged_in_at"] > max_age - margin:
+        return True
+    expiries = [cookie["expiry"] for cookie in record["cookies"] if cookie.get("expiry")]
+    return bool(expiries) and min(expiries) - margin < now
+
+
+class SessionManager:
+    """
+    브라우저 풀의 로그인 세션을 저장하고 requests 세션에 나눠 줍니다.
+
+    requests 세션에 쿠키를 넣기 전에 SESSION_CHECK_INTERVAL마다 가벼운 request.json 요청으로
+    확인하고, 만료가 다가오거나 확인에 실패했을 때만 브라우저로 로그인 상태를 다시 잡습니다.
+    """
+
+    def __init__(self, pool, store=None, check_interval=SESSION_CHECK_INTERVAL):
+        self.pool = pool
+        self.store = store if store is not None else session_store
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._record = None
+        self._version = 0
+        self._applied = weakref.WeakKeyDictionary()  # requests 세션 → 넣어 둔 쿠키 버전
+        self._keepalive_thread = None
+
+    def stored(self):
+        """메모리 또는 저장소의 쿠키 기록을 반환합니다."""
+        with self._lock:
+            if self._record is None:
+                self._record = self.store.load(self.pool.username)
+            return self._record
+
+    def remember(self, cookies, logged_in=False):
+        """브라우저에서 확인한 로그인 쿠키를 저장합니다. 새로 로그인했으면 로그인 시각도 갱신합니다."""
+        now = time.time()
+        with self._lock:
+            previous = self._record or self.store.load(self.pool.username)
+            logged_in_at = now if logged_in or previous is None else previous["logged_in_at"]
+            self._record = {"cookies": cookies, "logged_in_at": logged_in_at, "checked_at": now}
+            self._version += 1
+            self.store.save(self.pool.username, self._record)
+
+    def invalidate(self):
+        """저장된 쿠키를 버립니다. 다음 ensure에서 브라우저로 다시 확인합니다."""
+        with self._lock:
+            self._record = None
+            self._version += 1
+            self.store.clear(self.pool.username)
+
+    def apply(self, session):
+        """저장된 쿠키를 requests 세션에 넣습니다."""
+        with self._lock:
+            record, version = self._record, self._version
+        if record is None or self._applied.get(session) == version:
+            return
+        for cookie in record["cookies"]:
+            session.cookies.set(cookie["name"], cookie["value"])
+        self._applied[session] = version
+
+    def validate(self, session):
+        """
+        가벼운 request.json 요청으로 세션의 로그인 상태를 확인합니다.
+
+        거래 이름이 확인된 ETFI1122R을 기업 코드 없이 보냅니다. 로그인 상태면 값이 없는 JSON이,
+        세션이 끊겼으면 로그인 화면(HTML)이 옵니다.
+        """
+        data = build_statement_request(self.pool.username, "", f"{DATA_LAST_YEAR}1231", "1", "2")
+        try:
+            with span("session_check"):
+                text = post_request_json(session, data, make_request_headers())
+        except requests.RequestException as e:
+            print(f"❌ 세션 확인 요청 실패: {e}")
+            return False
+        return is_logged_in_response(text)
+
+    def refresh(self, progress=None, relogin=False):
+        """
+        브라우저로 로그인 상태를 확인(필요하면 로그인)하고 쿠키를 새로 저장합니다.
+
+        Args:
+            relogin (bool): 만료가 다가온 세션을 버리고 새로 로그인합니다.
+        """
+        version = self._version
+        with self._refresh_lock:
+            if self._version != version and self._record is not None:
+                return  # 기다리는 동안 다른 작업이 이미 갱신함
+            report_progress(progress, "login")
+            wait_for_profile_sync_with_progress(progress)
+            # 대여 시 로그인 상태를 확인하고 쿠키를 remember로 저장함
+            with span("session_refresh"), self.pool.checkout() as driver:
+                if relogin:
+                    print("로그인 세션 만료 전 다시 로그인합니다.")
+                    driver.delete_all_cookies()
+                    logged_in = ensure_logged_in(driver, self.pool.username, self.pool.password, fresh=False)
+                    self.remember(driver_cookies(driver), logged_in)
+
+    def ensure(self, session, progress=None, check=False):
+        """
+        requests 세션에 유효한 로그인 쿠키를 넣습니다. 필요할 때만 브라우저를 씁니다.
+
+        Args:
+            session: requests 세션.
+            progress (callable): 브라우저 로그인이 필요할 때 "login" 단계를 알릴 콜백.
+            check (bool): 확인 주기와 관계없이 request.json으로 확인합니다.
+        """
+        record = self.stored()
+        expiring = record is not None and session_expiring(record)
+        if record is not None and not expiring:
+            self.apply(session)
+            if not check and time.time() - record["checked_at"] < self.check_interval:
+                return
+            if self.validate(session):
+                self._mark_checked(record)
+                return
+            print("❌ 저장된 로그인 세션이 만료되었습니다. 다시 로그인합니다.")
+            self.invalidate()
+        self.refresh(progress, relogin=expiring)
+        self.apply(session)
+
+    def _mark_checked(self, record):
+        with self._lock:
+            if self._record is record:
+                record["checked_at"] = time.time()
+                self.store.save(self.pool.username, record)
+
+    def keepalive(self, interval=SESSION_KEEPALIVE):
+        """interval마다 세션을 확인해 서버 세션을 유지하고, 만료 전에 미리 갱신합니다."""
+        session = create_http_session(pool_maxsize=1)
+        while not self.pool._closed:
+            time.sleep(interval)
+            if self.pool._closed or self.stored() is None:
+                continue
+            try:
+                self.ensure(session, check=True)
+            except Exception as e:
+                print(f"❌ 로그인 세션 갱신 실패: {e}")
+
+    def start_keepalive(self, interval=SESSION_KEEPALIVE):
+        if interval > 0 and self._keepalive_thread is None:
+            self._keepalive_thread = threading.Thread(target=self.keepalive, args=(interval,), daemon=True)
+            self._keepalive_thread.start()
+
+
+# 페이지 상태 때문에 나는 WebDriver 오류. 드라이버 자체는 정상이므로 풀로 돌려보냅니다.
+DRIVER_PAGE_ERRORS = ("TimeoutException", "NoSuchElementException", "StaleElementReferenceException",
+                      "ElementNotInteractableException", "ElementClickInterceptedException", "JavascriptException")
+
+
+def is_driver_failure(error):
+    """
+    드라이버를 버려야 하는 오류인지 확인합니다.
+
+    로그인 실패와 WebDriver/세션 오류(원인으로 감싼 경우 포함)만 해당하며, '검색 결과 없음' 같은
+    조회 오류나 요소를 찾지 못한 오류는 드라이버를 계속 씁니다.
+    """
+    if isinstance(error, LoginFailedError):
+        return True
+    page_errors = tuple(getattr(selenium_exceptions, name) for name in DRIVER_PAGE_ERRORS)
+    while error is not None:
+        if isinstance(error, selenium_exceptions.WebDriverException) and not isinstance(error, page_errors):
+            return True
+        error = error.__cause__
+    return False
+
+
+class PooledDriver:
+    """풀에서 관리되는 드라이버와 사용 정보."""
+
+    def __init__(self, driver, slot):
+        self.driver = driver
+        self.slot = slot
+        self.uses = 0
+
+
+class BrowserPool:
+    """
+    로그인된 크롬 드라이버를 미리 띄워 두고 작업마다 빌려주는 풀.
+
+    드라이버는 슬롯마다 별도의 프로파일 디렉토리를 사용하며, 대여 시 상태 확인 후
+    첫 화면으로 초기화됩니다. `max_uses`회 사용했거나 작업 중 드라이버/로그인 오류가 나면
+    종료 후 새로 띄웁니다.
+    `profile`을 주면 계정마다 다른 프로파일 디렉토리를 사용합니다 (여러 계정을 동시에 띄울 때).
+    """
+
+    def __init__(self, username, password, size=BROWSER_POOL_SIZE, max_uses=BROWSER_MAX_USES, profile=None):
+        self.username = username
+        self.password = password
+        self.profile = profile
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        self._cond = threading.Condition()
+        self._idle = []
+        self._free_slots = list(range(self.size))
+        self._live = 0
+        self._closed = False
+        self.sessions = SessionManager(self)
+
+    def slot_user_data_dir(self, slot):
+        """슬롯별 프로파일 경로. 기본 프로파일의 0번 슬롯은 이 프로세스의 복사본을 그대로 사용합니다."""
+        base = process_user_data_dir()
+        if self.profile is not None:
+            base = f"{base}_acct-{re.sub(r'[^0-9A-Za-z_-]', '_', self.profile)}"
+        if slot == 0:
+            return base
+        return f"{base}_{slot}"
+
+    def _launch(self, slot):
+        with self._cond:
+            first = self._live == 0
+            self._live += 1
+        # 다른 계정의 풀에 떠 있는 드라이버가 있을 때도 크롬을 강제종료하지 않음
+        first = first and live_driver_count(exclude=self) == 0
+        try:
+            # 다른 드라이버가 떠 있을 때는 크롬을 강제종료하지 않음
+            wait_for_profile_sync()
+            user_data_dir = self.slot_user_data_dir(slot)
+            setup_user_data(user_data_dir, allow_kill=first)
+
+            driver = create_driver(user_data_dir)
+            try:
+                self._restore_session(driver)
+                logged_in = ensure_logged_in(driver, self.username, self.password, fresh=True)
+                self.sessions.remember(driver_cookies(driver), logged_in)
+            except Exception:
+                driver.quit()
+                raise
+            print(f"✅ 브라우저 풀 드라이버 생성 (슬롯 {slot})")
+            return PooledDriver(driver, slot)
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._free_slots.append(slot)
+                self._cond.notify()
+            raise
+
+    def _restore_session(self, driver):
+        """저장된 로그인 쿠키가 있으면 새 드라이버에 넣어 로그인 화면을 건너뜁니다."""
+        record = self.sessions.stored()
+        if record is None or session_expiring(record):
+            return
+        with span("site_load"):
+            driver.get(CRETOP_URL)
+        restored = restore_driver_cookies(driver, record["cookies"])
+        print(f"저장된 로그인 쿠키 {restored}개 복원")
+
+    def _discard(self, entry):
+        try:
+            entry.driver.quit()
+        except Exception as e:
+            print(f"드라이버 종료 중 오류 발생: {e}")
+        with self._cond:
+            self._live -= 1
+            self._free_slots.append(entry.slot)
+            self._cond.notify()
+
+    @staticmethod
+    def _is_healthy(entry):
+        try:
+            entry.driver.execute_script("return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    def _acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            slot = None
+            with self._cond:
+                while not self._idle and not self._free_slots:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closed:
+                        raise TimeoutError("사용 가능한 브라우저가 없습니다.")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    slot = self._free_slots.pop(0)
+
+            if slot is not None:
+                return self._launch(slot), True
+            if self._is_healthy(entry):
+                return entry, False
+            print(f"❌ 응답 없는 드라이버 폐기 (슬롯 {entry.slot})")
+            self._discard(entry)
+
+    def warm(self):
+        """비어 있는 슬롯의 드라이버를 백그라운드에서 미리 띄웁니다."""
+        def fill(slot):
+            try:
+                entry = self._launch(slot)
+            except Exception as e:
+                print(f"❌ 브라우저 예열 실패 (슬롯 {slot}): {e}")
+                return
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+
+        with self._cond:
+            slots, self._free_slots = self._free_slots, []
+        for slot in slots:
+            threading.Thread(target=fill, args=(slot,), daemon=True).start()
+
+    @contextmanager
+    def checkout(self, timeout=BROWSER_CHECKOUT_TIMEOUT):
+        """
+        로그인된 드라이버를 빌려줍니다. with 블록이 끝나면 풀로 반납됩니다.
+
+        Args:
+            timeout (int): 드라이버 대여 대기 시간 (초).
+
+        Yields:
+            WebDriver: 첫 화면으로 초기화된 로그인 상태의 드라이버.
+
+        with 블록의 조회 오류(검색 결과 없음 등)는 드라이버를 풀로 돌려보내고,
+        is_driver_failure에 해당하는 오류일 때만 드라이버를 버립니다.
+        """
+        with span("browser_checkout"):
+            entry, fresh = self._acquire(timeout)
+        ok = False
+        try:
+            if not fresh:
+                logged_in = ensure_logged_in(entry.driver, self.username, self.password, fresh=False)
+                self.sessions.remember(driver_cookies(entry.driver), logged_in)
+            yield entry.driver
+            ok = True
+        except Exception as e:
+            ok = not is_driver_failure(e)
+            raise
+        finally:
+            entry.uses += 1
+            if ok and entry.uses < self.max_uses and not self._closed:
+                with self._cond:
+                    self._idle.append(entry)
+                    self._cond.notify()
+            else:
+                print(f"드라이버 재생성 예정 (슬롯 {entry.slot}, 사용 {entry.uses}회)")
+                self._discard(entry)
+
+    def close(self):
+        """대기 중인 모든 드라이버를 종료합니다."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+
+_browser_pools = {}
+_browser_pools_lock = threading.Lock()
+
+
+def get_browser_pool(username, password, profile=None):
+    """사용자별 브라우저 풀을 반환합니다. 처음 요청 시 생성 후 예열합니다."""
+    with _browser_pools_lock:
+        pool = _browser_pools.get(username)
+        if pool is None:
+            pool = BrowserPool(username, password, profile=profile)
+            _browser_pools[username] = pool
+            pool.warm()
+            pool.sessions.start_keepalive()
+        else:
+            pool.password = password
+        return pool
+
+
+def live_driver_count(exclude=None):
+    """모든 계정의 풀에 떠 있는(띄우는 중 포함) 드라이버 수. exclude 풀은 세지 않습니다."""
+    with _browser_pools_lock:
+        pools = [pool for pool in _browser_pools.values() if pool is not exclude]
+    return sum(pool._live for pool in pools)
+
+
+def discard_browser_pool(username):
+    """
+    계정의 브라우저 풀을 목록에서 빼고 닫은 뒤 저장된 로그인 세션을 버립니다.
+    다음 조회는 새 풀에서 다시 로그인합니다.
+    """
+    with _browser_pools_lock:
+        pool = _browser_pools.pop(username, None)
+    if pool is not None:
+        pool.close()
+        pool.sessions.invalidate()
+    else:
+        session_store.clear(username)
+
+
+@atexit.register
+def shutdown_browser_pools():
+    with _browser_pools_lock:
+        pools = list(_browser_pools.values())
+        _browser_pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+CRETOP_ACCOUNTS_FILE = os.environ.get("CRETOP_ACCOUNTS_FILE", "cretop_accounts.json")  # 여러 계정 목록 (JSON)
+ACCOUNT_CONCURRENCY = int(os.environ.get("ACCOUNT_CONCURRENCY", "4"))  # 계정별 동시 조회 수
+ACCOUNT_RATE_PER_MINUTE = float(os.environ.get("ACCOUNT_RATE_PER_MINUTE", "0"))  # 계정별 분당 조회 수 (0이면 제한 없음)
+ACCOUNT_LOCKOUT_COOLDOWN = int(os.environ.get("ACCOUNT_LOCKOUT_COOLDOWN", "600"))  # 로그인이 막히거나 실패한 공용 계정을 쉬게 할 시간 (초)
+ACCOUNT_WAIT_TIMEOUT = BROWSER_CHECKOUT_TIMEOUT  # 한가한 계정을 기다리는 시간 (초)
+
+
+class Account:
+    """
+    AccountScheduler가 관리하는 크레탑 계정 하나의 자격 증명, 제한, 상태.
+
+    owner가 None이면 운영자가 계정 목록 파일로 등록한 공용 계정이고, 그 외에는 화면이나
+    명령행에서 자격 증명을 입력한 사용자(아이디)의 계정으로 그 사용자의 조회에만 쓰입니다.
+    """
+
+    def __init__(self, username, password, concurrency=ACCOUNT_CONCURRENCY, rate_per_minute=ACCOUNT_RATE_PER_MINUTE, profile=None, owner=None):
+        self.username = username
+        self.password = password
+        self.concurrency = max(1, int(concurrency))
+        self.rate_per_minute = float(rate_per_minute or 0)
+        self.profile = profile
+        self.owner = owner
+        self.active = 0
+        self.lookups = 0
+        self.lockouts = 0
+        self.next_at = 0.0  # 분당 제한에 따른 다음 조회 가능 시각 (monotonic)
+        self.locked_until = 0.0
+        self._session = None
+
+    @property
+    def pool(self):
+        """계정의 브라우저 풀 (처음 사용할 때 생성)."""
+        return get_browser_pool(self.username, self.password, self.profile)
+
+    @property
+    def session(self):
+        """계정의 로그인 쿠키를 쓰는 공용 CretopClient. 같은 계정의 조회끼리 연결을 재사용합니다."""
+        if self._session is None:
+            self._session = create_http_session(pool_maxsize=FETCH_WORKERS * self.concurrency)
+        return self._session
+
+    def available(self, now):
+        return self.locked_until <= now and self.active < self.concurrency and self.next_at <= now
+
+    def wake_at(self, now):
+        """다시 사용할 수 있게 되는 시각. 다른 조회가 끝나야 하면 None."""
+        if self.locked_until > now:
+            return self.locked_until
+        if self.active >= self.concurrency:
+            return None
+        return self.next_at
+
+    def to_dict(self, now):
+        return {
+            "username": self.username,
+            "active": self.active,
+            "concurrency": self.concurrency,
+            "rate_per_minute": self.rate_per_minute,
+            "lookups": self.lookups,
+            "lockouts": self.lockouts,
+            "locked_for": max(0, round(self.locked_until - now)),
+        }
+
+
+class AccountScheduler:
+    """
+    여러 크레탑 계정에 조회를 나눠 맡기는 스케줄러.
+
+    같은 아이디는 한 곳에서만 로그인할 수 있으므로(PLIL140P5) 계정마다 별도의 브라우저 풀,
+    프로파일, 로그인 세션을 둡니다. 조회는 소유자가 같은 계정 묶음 안에서만 나눠 맡깁니다:
+    계정 목록 파일의 공용 계정끼리, 사용자가 입력한 계정은 그 사용자의 조회에만 씁니다.
+    묶음 안에서는 동시 조회 수와 분당 제한 안에서 가장 한가한 계정을 고르고, 로그인이 막히거나
+    실패한 공용 계정은 ACCOUNT_LOCKOUT_COOLDOWN 동안 빼고 다른 계정으로 다시 조회합니다.
+    """
+
+    def __init__(self, lockout_cooldown=ACCOUNT_LOCKOUT_COOLDOWN):
+        self.lockout_cooldown = lockout_cooldown
+        self._accounts = {}
+        self._cond = threading.Condition()
+
+    def add(self, username, password, owner=None, **options):
+        """
+        계정을 등록합니다. 이미 있으면 주어진 옵션만 갱신합니다.
+
+        같은 아이디가 다른 비밀번호로 들어오면 기존 계정에 덮어쓰지 않고, 기존 계정의 브라우저와
+        로그인 세션을 버린 새 계정으로 바꿉니다. 새 비밀번호는 다음 조회에서 로그인으로 확인됩니다.
+        """
+        retired = None
+        with self._cond:
+            account = self._accounts.get(username)
+            if account is not None and (account.password != password or account.owner != owner):
+                retired, account = account, None
+            if account is None:
+                account = self._accounts[username] = Account(username, password, owner=owner, **options)
+                self._cond.notify_all()
+            else:
+                if options.get("concurrency"):
+                    account.concurrency = max(1, int(options["concurrency"]))
+                if "rate_per_minute" in options:
+                    account.rate_per_minute = float(options["rate_per_minute"] or 0)
+        if retired is not None:
+            print(f"계정 {username}의 비밀번호가 바뀌어 기존 로그인 세션을 버립니다.")
+            discard_browser_pool(username)
+        return account
+
+    def load(self, path=CRETOP_ACCOUNTS_FILE):
+        """
+        계정 목록 파일을 읽어 공용 계정으로 등록합니다. 파일이 없으면 아무것도 하지 않습니다.
+
+        파일 형식: [{"username", "password", "concurrency"(선택), "rate_per_minute"(선택), "profile"(선택)}]
+        profile을 주지 않으면 아이디를 프로파일 이름으로 씁니다.
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        for entry in entries:
+            self.add(entry["username"], entry["password"],
+                     concurrency=entry.get("concurrency", ACCOUNT_CONCURRENCY),
+                     rate_per_minute=entry.get("rate_per_minute", ACCOUNT_RATE_PER_MINUTE),
+                     profile=entry.get("profile", entry["username"]))
+        print(f"✅ 크레탑 계정 {len(entries)}개 등록: {path}")
+        return len(entries)
+
+    def owner_for(self, username, password):
+        """
+        입력한 자격 증명으로 조회를 맡길 계정 묶음(소유자)을 정합니다.
+
+        공용 계정의 아이디와 비밀번호를 입력하면 공용 계정 전체(None)를 씁니다. 그 외에는
+        입력한 계정을 그 사용자만 쓰는 계정으로 등록하고 아이디를 소유자로 반환합니다.
+        입력한 자격 증명은 공용 계정 묶음에 넣지 않습니다.
+
+        Raises:
+            LoginFailedError: 공용 계정의 아이디인데 비밀번호가 다른 경우.
+        """
+        with self._cond:
+            account = self._accounts.get(username)
+        if account is not None and account.owner is None:
+            if not hmac.compare_digest(account.password.encode("utf-8"), password.encode("utf-8")):
+                raise LoginFailedError(f"'{username}' 계정의 비밀번호가 일치하지 않습니다.")
+            return None
+        self.add(username, password, owner=username, profile=username)
+        return username
+
+    def _members(self, owner):
+        return [account for account in self._accounts.values() if account.owner == owner]
+
+    def count(self, owner=None):
+        """소유자 묶음의 계정 수."""
+        with self._cond:
+            return len(self._members(owner))
+
+    def __len__(self):
+        with self._cond:
+            return len(self._accounts)
+
+    def capacity(self):
+        """공용 계정의 동시 조회 수 합계."""
+        with self._cond:
+            return sum(account.concurrency for account in self._members(None))
+
+    @contextmanager
+    def acquire(self, owner=None, timeout=ACCOUNT_WAIT_TIMEOUT):
+        """
+        소유자 묶음에서 한가한 계정 하나를 빌려줍니다. with 블록이 끝나면 반납됩니다.
+
+        Raises:
+            CretopError: timeout 안에 사용할 수 있는 계정이 없는 경우.
+        """
+        deadline = time.monotonic() + timeout
+        with span("account_wait", idle=True), self._cond:
+            while True:
+                now = time.monotonic()
+                members = self._members(owner)
+                ready = [account for account in members if account.available(now)]
+                if ready:
+                    account = min(ready, key=lambda a: (a.active / a.concurrency, a.lookups))
+                    account.active += 1
+                    account.lookups += 1
+                    if account.rate_per_minute:
+                        account.next_at = max(now, account.next_at) + 60 / account.rate_per_minute
+                    break
+                remaining = deadline - now
+                # 모든 계정이 대기 시간 뒤까지 제외되어 있으면 기다리지 않음
+                if not members or remaining <= 0 or all(account.locked_until > deadline for account in members):
+                    raise CretopError("사용할 수 있는 크레탑 계정이 없습니다 (모두 사용 중이거나 잠시 제외됨).")
+                wakes = [wake for wake in (a.wake_at(now) for a in members) if wake is not None]
+                self._cond.wait(min([remaining] + [max(0.01, wake - now) for wake in wakes]))
+        try:
+            yield account
+        finally:
+            with self._cond:
+                account.active -= 1
+                self._cond.notify_all()
+
+    def lock_out(self, account, error):
+        """로그인이 막히거나 실패한 계정을 잠시 빼고 저장된 로그인 쿠키를 버립니다."""
+        with self._cond:
+            account.locked_until = time.monotonic() + self.lockout_cooldown
+            account.lockouts += 1
+            self._cond.notify_all()
+        account.pool.sessions.invalidate()
+        print(f"🚫 계정 {account.username}을(를) {self.lockout_cooldown}초 동안 제외합니다: {error}")
+
+    def remove(self, account, error):
+        """로그인에 실패한 사용자 계정을 빼고 브라우저와 로그인 세션을 버립니다. 다시 입력하면 새로 로그인합니다."""
+        with self._cond:
+            if self._accounts.get(account.username) is account:
+                del self._accounts[account.username]
+            self._cond.notify_all()
+        discard_browser_pool(account.username)
+        print(f"🚫 로그인에 실패한 계정 {account.username}을(를) 뺍니다: {error}")
+
+    def run(self, lookup, owner=None, timeout=ACCOUNT_WAIT_TIMEOUT):
+        """
+        lookup(account)를 소유자 묶음의 한가한 계정으로 실행합니다.
+
+        로그인에 실패하면 공용 계정은 잠시 빼고(lock_out) 다른 공용 계정으로 다시 실행하고,
+        사용자 계정은 중복 로그인(LoginLockedError)이면 잠시 빼고, 그 외 실패면 등록을 지운 뒤
+        오류를 올립니다. 묶음의 모든 계정이 실패했으면 마지막 오류를 그대로 올립니다.
+        """
+        attempts = 0
+        while True:
+            with self.acquire(owner, timeout) as account:
+                try:
+                    return lookup(account)
+                except LoginFailedError as e:
+                    if account.owner is None or isinstance(e, LoginLockedError):
+                        self.lock_out(account, e)
+                    else:
+                        self.remove(account, e)
+                    attempts += 1
+                    if account.owner is not None or attempts >= self.count(owner):
+                        raise
+
+    def status(self, owner=None):
+        """소유자 묶음(기본값은 공용 계정)의 계정별 사용 현황."""
+        now = time.monotonic()
+        with self._cond:
+            return [account.to_dict(now) for account in self._members(owner)]
+
+
+account_scheduler = None  # init_state()에서 생성 후 계정 목록 파일을 읽음
+
+
+def normalize_bzno(search_key):
+    """사업자번호에서 숫자만 남깁니다."""
+    return re.sub(r"\D", "", str(search_key))
+
+
+class CompanyCache:
+    """사업자번호 → (kedcd, 기업명, 확인 시각) 매핑을 저장하는 SQLite 캐시."""
+
+    def __init__(self, path=CACHE_DB_FILE):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS company_cache (
+                    bzno TEXT PRIMARY KEY,
+                    kedcd TEXT NOT NULL,
+                    company_name TEXT NOT NULL,
+                    resolved_at REAL NOT NULL
+                )"""
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, search_key):
+        """
+        Returns:
+            tuple: (kedcd, 기업명). 없으면 None.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT kedcd, company_name FROM company_cache WHERE bzno = ?", (normalize_bzno(search_key),)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def put(self, search_key, kedcd, company_name):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO company_cache VALUES (?, ?, ?, ?)",
+                (normalize_bzno(search_key), kedcd, company_name, time.time()),
+            )
+
+    def invalidate(self, search_key=None):
+        """사업자번호의 항목을 삭제합니다. 없으면 전체를 삭제합니다."""
+        with closing(self._connect()) as conn, conn:
+            if search_key:
+                return conn.execute("DELETE FROM company_cache WHERE bzno = ?", (normalize_bzno(search_key),)).rowcount
+            return conn.execute("DELETE FROM company_cache").rowcount
+
+
+company_cache = None  # init_state()에서 생성
+
+
+def copy_driver_cookies(driver, session):
+    """드라이버의 로그인 쿠키를 requests 세션에 복사합니다."""
+    for cookie in driver.get_cookies():
+        c = {cookie['name'] : cookie['value']}
+        session.cookies.update(c)    
+
+
+def report_progress(progress, stage, **info):
+    """
+    진행 상황 콜백이 있으면 현재 단계를 알립니다.
+
+    JOB_STAGES에 있는 이름은 단계 전환이고, 그 외(profile_sync, search_match, statement, values)는
+    단계를 바꾸지 않는 세부 이벤트입니다.
+    """
+    if progress is not None:
+        progress(stage, **info)
+
+
+def resolve_company_browser(driver, search_key, progress=None):
+    """
+    검색 화면에서 기업을 찾아 재무 페이지로 이동한 뒤 DevTools 로그에서 kedcd를 확인합니다.
+
+    Returns:
+        tuple: (kedcd, 기업명)
+    """
+    report_progress(progress, "search")
+    NetworkCapture(driver).clear()  # 이전 검색의 응답 제외
+    if navigate_to_financial_page(driver, search_key):
+        print(f"🚀 '{search_key}'의 재무 페이지로 성공적으로 이동했습니다.")
+        traced_sleep(1, "sleep_after_search")
+
+        strong_element = driver.find_element(By.XPATH, '//*[@id="etfi110m1"]/div/div[2]/div/div/div/div[2]/div/strong')
+        company_name = strong_element.text.strip()
+        print(company_name)              
+    else:
+        print(f"❌ '{search_key}'의 재무 페이지로 이동 실패.")
+        raise CretopError(f"'{search_key}'의 재무 페이지로 이동 실패.")
+
+    report_progress(progress, "search_match", company_name=company_name, bzno=normalize_bzno(search_key))
+    report_progress(progress, "kedcd", company_name=company_name)
+    return get_kedcd(driver), company_name
+
+
+def lookup_with_browser(driver, username, session, search_key, progress=None, years=DATA_YEARS):
+    """
+    검색 화면과 DevTools 로그로 기업을 찾고 재무제표 값을 조회합니다.
+
+    Returns:
+        tuple: (기업명, kedcd, {탭: {연도: 값}})
+    """
+    kedcd, company_name = resolve_company_browser(driver, search_key, progress)
+
+    report_progress(progress, "fetch", kedcd=kedcd)
+    tabs_values = get_all_tabs_values(driver, username, kedcd, session, years, progress)
+    return company_name, kedcd, tabs_values
+
+
+def lookup_with_http(session, username, search_key, progress=None, years=DATA_YEARS):
+    """
+    브라우저 없이 request.json 거래만으로 기업을 찾고 재무제표 값을 조회합니다.
+
+    Returns:
+        tuple: (기업명, kedcd, {탭: {연도: 값}}). 기업을 찾지 못하면 None.
+    """
+    report_progress(progress, "search")
+    resolved = resolve_company_http(session, username, search_key, progress)
+    if resolved is None:
+        return None
+    kedcd, company_name = resolved
+    report_progress(progress, "kedcd", company_name=company_name, kedcd=kedcd)
+
+    report_progress(progress, "fetch", kedcd=kedcd)
+    tabs_values = collect_tabs_values(session, make_request_headers(), username, kedcd, years, progress=progress)
+    return company_name, kedcd, tabs_values
+
+# 탭 이름 → 계산에 쓰는 계열 이름
+SERIES_TABS = {
+    "포괄손익계산서": "pogwal",
+    "손익계산서": "sonik",
+    "제조원가명세서": "jejo",
+    "재무상태표": "machine",
+    "법인세비용차감전순손익": "before_loss",
+    "포괄_법인세비용차감전순이익": "before_loss",
+    "법인세비용": "taxes",
+    "포괄_법인세비용": "taxes",
+}
+
+
+def build_company_data(search_key, company_name, kedcd, tabs_values, years=DATA_YEARS):
+    """
+    탭별 연도 값을 연도 목록에 맞춘 계열로 정리합니다.
+
+    Returns:
+        dict: search_key, company_name, kedcd, years 와 years 순서의 계열별 값 목록
+              (machine, pogwal, sonik, jejo, before_loss, taxes).
+    """
+    data = {"search_key": search_key, "company_name": company_name, "kedcd": kedcd, "years": list(years)}
+    for series in set(SERIES_TABS.values()):
+        data[series] = [None] * len(years)
+
+    for tab_name in target_tabs:
+        series = SERIES_TABS.get(tab_name)
+        values = [tabs_values.get(tab_name, {}).get(year) for year in years]
+        print([tab_name] + values)
+        # 같은 계열을 쓰는 탭 중 값이 없는 탭이 앞선 값을 덮어쓰지 않도록 함
+        if series and any(value is not None for value in values):
+            data[series] = values
+    return data
+
+
+@span("lookup")
+def lookup_company(pool, session, username, search_key, progress=None, years=DATA_YEARS):
+    """
+    사업자번호로 기업을 찾아 연도별 재무 계열을 반환합니다.
+
+    기업 캐시에 있으면 검색과 kedcd 확인을 건너뜁니다. 없으면 빠른 경로(request.json)를
+    먼저 시도하고, 실패하면 브라우저로 검색합니다. 로그인 쿠키는 풀의 SessionManager가
+    저장/확인하며, 저장된 세션이 없거나 만료됐을 때만 브라우저로 로그인합니다.
+
+    Args:
+        pool (BrowserPool): 로그인된 드라이버 풀.
+        session: requests 세션. 여러 조회가 같은 세션을 공유할 수 있습니다.
+        username (str): 사용자 아이디.
+        search_key (str): 사업자번호.
+        progress (callable): progress(stage, **info) 형태의 진행 상황 콜백.
+        years (list): 조회할 연도 범위 (year_window 결과).
+
+    Returns:
+        dict: build_company_data 결과.
+    """
+    def login():
+        pool.sessions.ensure(session, progress)
+
+    cached = company_cache.get(search_key)
+    if cached:
+        kedcd, company_name = cached
+        print(f"✅ 기업 캐시 사용: {search_key} → {kedcd} ({company_name})")
+        report_progress(progress, "search")
+        report_progress(progress, "kedcd", company_name=company_name, kedcd=kedcd)
+        report_progress(progress, "fetch", kedcd=kedcd)
+        tabs_values = collect_tabs_values(session, make_request_headers(), username, kedcd, years, before_fetch=login, progress=progress)
+        return build_company_data(search_key, company_name, kedcd, tabs_values, years)
+
+    result = None
+
+    if HTTP_FAST_PATH:
+        login()
+        result = lookup_with_http(session, username, search_key, progress, years)
+
+    if result is None:
+        report_progress(progress, "login")
+        wait_for_profile_sync_with_progress(progress)
+        with pool.checkout() as driver:
+            copy_driver_cookies(driver, session)
+            result = lookup_with_browser(driver, username, session, search_key, progress, years)
+            driver.execute_script("document.body.style.zoom='100%'")
+
+    company_name, kedcd, _ = result
+    company_cache.put(search_key, kedcd, company_name)
+    return build_company_data(search_key, *result, years)
+
+
+def run_selenium(username, password, search_key, progress=None, years=DATA_YEARS):
+    """
+    사업자번호 하나를 조회해 연도별 재무 계열을 반환합니다.
+
+    입력한 계정으로만 조회합니다. 공용 계정(계정 목록 파일)의 자격 증명이면 공용 계정 중 가장 한가한 계정으로 조회합니다.
+    """
+    owner = account_scheduler.owner_for(username, password)
+    return account_scheduler.run(
+        lambda account: lookup_company(account.pool, account.session, account.username, search_key, progress, years), owner)
+
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "0"))  # 동시에 실행할 조회 작업 수 (0이면 공용 계정의 동시 조회 수 합계, 최소 4)
+JOB_RETENTION = 60 * 60  # 완료된 작업 보관 시간 (초)
+JOB_STAGES = ("login", "search", "kedcd", "fetch", "calculate")
+STAGE_LABELS = {
+    "queued": "대기 중",
+    "login": "로그인",
+    "search": "기업 검색",
+    "kedcd": "기업 코드 확인",
+    "fetch": "재무제표 조회",
+    "calculate": "계산",
+}
+
+
+class Job:
+    """조회 작업 하나의 단계별 진행 상황과 결과. 상태가 바뀔 때마다 JobStore에 저장됩니다."""
+
+    def __init__(self, job_id, search_key, store=None):
+        self.id = job_id
+        self.search_key = search_key
+        self.status = "queued"  # queued / running / done / failed
+        self.stage = "queued"
+        self.stages = {}  # 단계 이름 → {"started_at", "finished_at"}
+        self.info = {}
+        self.data = None
+        self.results = None
+        self.totals = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.store = store
+        self._lock = threading.Lock()
+
+    def _save(self, event=None):
+        if self.store is not None:
+            self.store.save(self, event)
+
+    def start(self):
+        with self._lock:
+            self.status = "running"
+        self._save()
+
+    def advance(self, stage, **info):
+        """다음 단계로 진행합니다. 이전 단계는 완료 처리됩니다."""
+        now = time.time()
+        with self._lock:
+            if self.stage in self.stages:
+                self.stages[self.stage]["finished_at"] = now
+            self.stage = stage
+            self.stages.setdefault(stage, {"started_at": now, "finished_at": None})
+            self.info.update(info)
+        self._save()
+        self.emit("stage", stage=stage, label=STAGE_LABELS.get(stage, stage), **info)
+
+    def emit(self, event, **data):
+        """진행 이벤트를 저장소에 남깁니다. /progress_stream이 순서대로 내보냅니다."""
+        if self.store is not None:
+            self.store.add_event(self.id, event, data)
+
+    def progress(self, stage, **info):
+        """조회 함수에 넘기는 진행 상황 콜백. JOB_STAGES의 단계면 진행하고, 그 외는 이벤트로만 남깁니다."""
+        if stage in JOB_STAGES:
+            self.advance(stage, **info)
+        else:
+            self.emit(stage, **info)
+
+    def finish(self, error=None):
+        now = time.time()
+        with self._lock:
+            if self.stage in self.stages:
+                self.stages[self.stage]["finished_at"] = now
+            self.status = "failed" if error else "done"
+            self.error = error
+            self.finished_at = now
+        # end 이벤트를 상태와 같은 트랜잭션에서 먼저 기록: 끝난 상태를 본 스트림은 end 이벤트도 찾음
+        self._save(("end", {"status": self.status, "error": error}))
+
+    def to_dict(self):
+        with self._lock:
+            stages = []
+            for name in JOB_STAGES:
+                timing = self.stages.get(name)
+                if timing is None:
+                    status, elapsed = "pending", None
+                elif timing["finished_at"] is None:
+                    status, elapsed = ("failed" if self.status == "failed" else "running"), None
+                else:
+                    status, elapsed = "done", round(timing["finished_at"] - timing["started_at"], 3)
+                stages.append({"name": name, "label": STAGE_LABELS[name], "status": status, "elapsed": elapsed})
+            return {
+                "job_id": self.id,
+                "search_key": self.search_key,
+                "status": self.status,
+                "running": self.status in ("queued", "running"),
+                "stage": self.stage,
+                "label": STAGE_LABELS.get(self.stage, self.stage),
+                "stages": stages,
+                "info": dict(self.info),
+                "error": self.error,
+            }
+
+
+class JobStore:
+    """
+    작업 상태와 결과를 저장하는 SQLite 저장소.
+
+    여러 gunicorn 워커(프로세스)가 같은 파일을 공유하므로, 작업을 실행하지 않은 워커도
+    진행 상황과 결과를 조회할 수 있습니다.
+    """
+
+    def __init__(self, path=CACHE_DB_FILE):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    search_key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    stages TEXT NOT NULL,
+                    info TEXT NOT NULL,
+                    data TEXT,
+                    results TEXT,
+                    totals TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS job_events (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, seq)
+                )"""
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(self, job, event=None):
+        """작업 상태를 저장합니다. event=(이름, 데이터)가 있으면 같은 트랜잭션에서 상태보다 먼저 기록합니다."""
+        with job._lock:
+            row = (job.id, job.search_key, job.status, job.stage,
+                   json.dumps(job.stages), json.dumps(job.info, ensure_ascii=False),
+                   json.dumps(job.data, ensure_ascii=False) if job.data is not None else None,
+                   json.dumps(job.results) if job.results is not None else None,
+                   json.dumps(job.totals) if job.totals is not None else None,
+                   job.error, job.created_at, job.finished_at)
+        with closing(self._connect()) as conn, conn:
+            if event is not None:
+                self._insert_event(conn, job.id, *event)
+            conn.execute("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def load(self, job_id):
+        """저장된 작업을 Job으로 복원합니다. 없으면 None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT search_key, status, stage, stages, info, data, results, totals, error, created_at, finished_at"
+                " FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        search_key, status, stage, stages, info, data, results, totals, error, created_at, finished_at = row
+        job = Job(job_id, search_key)
+        job.status, job.stage, job.error = status, stage, error
+        job.stages = json.loads(stages)
+        job.info = json.loads(info)
+        job.data = json.loads(data) if data else None
+        job.results = {int(year): result for year, result in json.loads(results).items()} if results else None
+        job.totals = json.loads(totals) if totals else None
+        job.created_at, job.finished_at = created_at, finished_at
+        return job
+
+    def status(self, job_id):
+        """작업 상태만 읽습니다. 없으면(삭제됨) None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def data_version(self, job_id):
+        """
+        작업의 (상태, 데이터 버전)을 JSON 파싱 없이 반환합니다. 없으면 None.
+
+        데이터 버전은 저장된 데이터 JSON의 SHA-1이므로, 같은 기업을 같은 값으로 다시 조회한
+        작업끼리는 버전이 같습니다. 데이터가 없으면(진행 중/실패) 버전은 None.
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT status, data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        status, data = row
+        return status, hashlib.sha1(data.encode("utf-8")).hexdigest() if data else None
+
+    def add_event(self, job_id, event, data):
+        """작업의 진행 이벤트를 다음 순번으로 저장합니다."""
+        with closing(self._connect()) as conn, conn:
+            self._insert_event(conn, job_id, event, data)
+
+    @staticmethod
+    def _insert_event(conn, job_id, event, data):
+        conn.execute(
+            "INSERT INTO job_events (job_id, seq, event, data, created_at)"
+            " VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?), ?, ?, ?)",
+            (job_id, job_id, event, json.dumps(data, ensure_ascii=False), time.time()),
+        )
+
+    def events(self, job_id, after=0):
+        """순번이 after보다 큰 이벤트를 [(순번, 이벤트, 데이터 JSON 문자열)]로 반환합니다."""
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+
+    def prune(self, before):
+        """`before` 이전에 끝난 작업과 그 이벤트를 삭제합니다."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (before,))
+            conn.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+
+
+class JobManager:
+    """조회 작업을 백그라운드 스레드 풀에서 실행하고, 상태는 JobStore를 통해 공유합니다."""
+
+    def __init__(self, store, workers=None):
+        self.store = store
+        workers = workers or JOB_WORKERS or max(4, account_scheduler.capacity())
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+
+    def submit(self, username, password, search_key, years=DATA_YEARS):
+        """작업을 등록하고 바로 반환합니다."""
+        self.store.prune(time.time() - JOB_RETENTION)
+        job = Job(os.urandom(8).hex(), search_key, store=self.store)
+        self.store.save(job)
+        self._executor.submit(self._run, job, username, password, years)
+        return job
+
+    def get(self, job_id):
+        """작업 상태를 저장소에서 읽습니다. 다른 워커가 실행 중인 작업도 조회됩니다."""
+        if not job_id:
+            return None
+        return self.store.load(job_id)
+
+    def _run(self, job, username, password, years=DATA_YEARS):
+        job.start()
+        try:
+            data = run_selenium(username, password, job.search_key, progress=job.progress, years=years)
+            job.data = data
+            job.advance("calculate")
+            job.results, job.totals = compute_results(data)
+            job.emit("result", company_name=data["company_name"], totals=job.totals)
+            job.finish()
+            print(f"✅ 작업 {job.id} 완료: {data['company_name']}")
+        except (CretopError, ValueError) as e:
+            job.finish(str(e))
+            print(f"❌ 작업 {job.id} 실패: {e}")
+        except Exception as e:
+            job.finish(f"알 수 없는 오류: {e}")
+            print(f"❌ 작업 {job.id} 실패: {e}")
+
+
+job_store = None  # init_state()에서 생성
+jobs = None
+
+
+@views.route("/", methods=["GET", "POST"])
+def login():
+    if request.method == "POST":
+        username = session.get("username", request.form["username"])
+        password = session.get("password", request.form["password"])
+        search_key = request.form["search_key"]
+        try:
+            years = year_window(request.form.get("first_year"), request.form.get("last_year"))
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        session["username"] = username
+        session["password"] = password
+        
+        job = jobs.submit(username, password, search_key, years)
+        session["job_id"] = job.id
+
+        return jsonify({"job_id": job.id,
+                        "status": url_for('views.selenium_status', job_id=job.id),
+                        "events": url_for('views.progress_stream', job_id=job.id),
+                        "redirect": url_for('views.calculate', job_id=job.id)})
+    
+    return render_template("index.html", first_year=DATA_FIRST_YEAR, last_year=DATA_LAST_YEAR)
+
+@views.route('/selenium_status', methods=['GET'])
+def selenium_status():
+    """작업 ID(없으면 세션의 마지막 작업)의 단계별 진행 상황을 반환합니다."""
+    job = jobs.get(request.args.get("job_id") or session.get("job_id", ""))
+    if job is None:
+        return jsonify({"running": False, "status": "unknown"}), 404
+    return jsonify(job.to_dict())
+
+PROGRESS_POLL_INTERVAL = 0.25  # 이벤트 저장소 확인 간격 (초)
+PROGRESS_HEARTBEAT = 15  # 이벤트가 없을 때 연결 유지용 주석을 보내는 간격 (초)
+PROGRESS_STREAM_MAX = float(os.environ.get("PROGRESS_STREAM_MAX", "25"))  # 연결 하나를 유지하는 최대 시간 (초)
+PROGRESS_RETRY_MS = 1000  # 연결을 닫은 뒤 브라우저가 다시 연결하기까지 기다리는 시간 (밀리초)
+
+
+def sse_end(status, error=None):
+    return f"event: end\ndata: {json.dumps({'status': status, 'error': error}, ensure_ascii=False)}\n\n"
+
+
+def stream_job_events(job_id, after=0):
+    """
+    작업 이벤트를 Server-Sent Events 형식으로 내보냅니다.
+
+    이벤트는 JobStore(SQLite)에서 읽으므로 작업을 실행하지 않는 워커에서도 스트리밍할 수 있습니다.
+    처음에 현재 상태("status")를 보내고, "end" 이벤트를 보내면 끝납니다. 각 이벤트의 id는 순번이라
+    재연결 시 Last-Event-ID 이후부터 이어서 보냅니다.
+
+    연결 하나가 작업 스레드를 오래 붙잡지 않도록 PROGRESS_STREAM_MAX가 지나면 연결을 닫고,
+    브라우저가 Last-Event-ID로 다시 연결해 이어 받습니다.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        yield sse_end("unknown", "작업을 찾을 수 없습니다 (만료되었을 수 있습니다).")
+        return
+    yield f"retry: {PROGRESS_RETRY_MS}\nevent: status\ndata: {json.dumps(job.to_dict(), ensure_ascii=False)}\n\n"
+
+    deadline = time.monotonic() + PROGRESS_STREAM_MAX
+    last_sent = time.monotonic()
+    while True:
+        # 상태를 먼저 읽음: end 이벤트는 끝난 상태보다 먼저 기록되므로, 끝난 상태를 봤다면 아래에서 end도 읽힘
+        status = job_store.status(job_id)
+        rows = job_store.events(job_id, after)
+        for seq, event, data in rows:
+            after = seq
+            yield f"id: {seq}\nevent: {event}\ndata: {data}\n\n"
+            if event == "end":
+                return
+        if status is None:
+            yield sse_end("unknown", "작업을 찾을 수 없습니다 (만료되었을 수 있습니다).")
+            return
+        if status in ("done", "failed"):
+            # 끝난 작업인데 보낼 end 이벤트가 없음 (이미 보냈거나 이벤트만 삭제됨)
+            job = jobs.get(job_id)
+            yield sse_end(status, job.error if job else None)
+            return
+        if rows:
+            last_sent = time.monotonic()
+        if time.monotonic() >= deadline:
+            return
+        if time.monotonic() - last_sent >= PROGRESS_HEARTBEAT:
+            last_sent = time.monotonic()
+            yield ": keep-alive\n\n"
+        time.sleep(PROGRESS_POLL_INTERVAL)
+
+
+@views.route('/progress_stream', methods=['GET'])
+def progress_stream():
+    """작업 ID(없으면 세션의 마지막 작업)의 단계/세부 이벤트를 Server-Sent Events로 보냅니다."""
+    job_id = request.args.get("job_id") or session.get("job_id", "")
+    try:
+        after = int(request.headers.get("Last-Event-ID") or request.args.get("after") or 0)
+    except ValueError:
+        after = 0
+    # 재연결(after > 0)이면 작업이 그새 삭제됐어도 스트림에서 end 이벤트로 알림
+    if not job_id or (after == 0 and job_store.status(job_id) is None):
+        return jsonify({"status": "unknown"}), 404
+    return Response(stream_job_events(job_id, after), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@views.route('/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(statement_cache.stats())
+
+@views.route('/cache/invalidate', methods=['POST'])
+def cache_invalidate():
+    """kedcd / acctDt 조건으로 재무제표 캐시를 삭제합니다."""
+    params = request.get_json(silent=True) or request.form
+    deleted = statement_cache.invalidate(kedcd=params.get("kedcd"), acctDt=params.get("acctDt"))
+    return jsonify({"deleted": deleted})
+
+@views.route('/accounts', methods=['GET'])
+def accounts_status():
+    """공용 계정별 사용 현황 (비밀번호 제외). 사용자가 입력한 계정은 보여주지 않습니다."""
+    return jsonify(account_scheduler.status())
+
+@views.route('/metrics', methods=['GET'])
+def metrics():
+    """단계별 소요 시간 히스토그램 (Prometheus 텍스트 형식, 프로세스별 집계)."""
+    breaker = (
+        "# HELP sokham_circuit_open 크레탑 요청 회로 차단 상태 (1이면 차단 중)\n"
+        "# TYPE sokham_circuit_open gauge\n"
+        f"sokham_circuit_open {0 if cretop_breaker.state == 'closed' else 1}\n"
+    )
+    return span_metrics.render() + breaker, 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+def calculate_yearly_cost(year, machine_costs, pogwal_salary=None, sonik_salary=None, jejo_salary=None, num=7700, avg_rate=0.03, avg_rate_after_2023=0.1):
+    if pogwal_salary is None and sonik_salary is None:
+        raise ValueError("pogwal_salary와 sonik_salary 중 하나는 반드시 필요합니다.")
+    
+    prev_year = year - 1
+    if machine_costs is None:
+        years_available = []
+    else:
+        years_available = [year - i for i in range(1, 4) if (year - i) in machine_costs]
+    prev_3_year_avg = sum((machine_costs.get(year, 0) or 0) for y in years_available) / len(years_available) if years_available else 0
+
+    # 인원 계산
+    if pogwal_salary is not None:
+        salary_increase = max(0, (pogwal_salary.get(year, 0) or 0) - (pogwal_salary.get(prev_year, 0) or 0))
+    elif sonik_salary is not None or jejo_salary is not None:
+        sonik_increase = (sonik_salary.get(year, 0) or 0) - (sonik_salary.get(prev_year, 0) or 0) if sonik_salary else 0
+        jejo_increase = (jejo_salary.get(year, 0) or 0) - (jejo_salary.get(prev_year, 0) or 0) if jejo_salary else 0
+        salary_increase = max(0, sonik_increase + jejo_increase)
+    else:
+        salary_increase = 0
+
+    salary_adjustment = math.floor(salary_increase / 40000) * num
+
+    # 기계장치 계산
+    machine_cost_current = machine_costs.get(year, 0) or 0
+    machine_cost_prev = machine_costs.get(prev_year, 0) or 0
+    
+    if year == 2019:
+        machine_cost_total = (machine_cost_current - machine_cost_prev) * 0.07
+    elif year == 2020:
+        machine_cost_total = (machine_cost_current - machine_cost_prev) * 0.1
+    elif year in [2021, 2022]:
+        machine_cost_total = (machine_cost_current - machine_cost_prev) * 0.1 + (machine_cost_current - prev_3_year_avg) * avg_rate
+    else:  # year >= 2023
+        prev_year_cost = (machine_cost_current - machine_cost_prev) * 0.12
+        adjusted_cost = (machine_cost_current - prev_3_year_avg) * avg_rate_after_2023
+        machine_cost_total = prev_year_cost + min(adjusted_cost, prev_year_cost * 2)
+
+    machine_cost_total = max(machine_cost_total, 0)
+
+    total = machine_cost_total + salary_adjustment
+    return machine_cost_total, salary_adjustment, total
+
+def convert_to_numeric(value):
+    """문자열을 숫자로 변환하고, '-' 같은 특수문자는 NaN으로 처리"""
+    if isinstance(value, str):
+        if value.strip() == '-' or value.strip() == '':
+            return float('nan')  # ✅ NaN을 float으로 유지
+        try:
+            return int(value.replace(',', '').strip())
+        except ValueError:
+            return float('nan') 
+    return value  # 이미 숫자면 그대로 반환
+
+
+def calculation_years(years, start_year=None):
+    """계산 연도: start_year(기본값은 전년 값이 있는 두 번째 연도)부터 마지막 연도까지."""
+    return list(range(start_year or years[0] + 1, years[-1] + 1))
+
+
+@span("calculate")
+def compute_results(data, start_year=None, **params):
+    """
+    조회된 재무 계열로 연도별/기간 합계 환급금을 계산합니다.
+
+    Args:
+        data (dict): build_company_data 결과.
+        start_year (int): 계산 시작 연도. 기본값은 조회 범위의 두 번째 연도.
+        **params: calculate_yearly_cost에 전달할 num, avg_rate, avg_rate_after_2023.
+
+    Returns:
+        tuple: (연도별 결과 dict, 합계 dict)
+
+    Raises:
+        ValueError: 급여 계열이 하나도 없는 경우.
+    """
+    years = data["years"]
+
+    machine_costs = {year: convert_to_numeric(x) for year, x in zip(years, data["machine"])}
+    pogwal_salary = {year: convert_to_numeric(x) for year, x in zip(years, data["pogwal"])}
+    sonik_salary = {year: convert_to_numeric(x) for year, x in zip(years, data["sonik"])}
+    jejo_salary = {year: convert_to_numeric(x) for year, x in zip(years, data["jejo"])}
+    
+    if all(value is None for value in pogwal_salary.values()):
+        pogwal_salary = None
+    if all(value is None for value in sonik_salary.values()):
+        sonik_salary = None
+    if all(value is None for value in jejo_salary.values()):
+        jejo_salary = None
+
+    if not pogwal_salary and not sonik_salary and not jejo_salary:
+        raise ValueError("포괄 급여나 손익/제조 급여가 필요합니다.")
+    elif not pogwal_salary:
+        pogwal_salary = None  # 명시적으로 설정
+
+    results, total_machine_cost, total_salary_adjustment, total_cost = {}, 0, 0, 0
+
+    # 연도별 비용 계산
+    for year in calculation_years(years, start_year):
+        try:
+            machine_cost_total, salary_adjustment, total = calculate_yearly_cost(
+                year, machine_costs, pogwal_salary, sonik_salary, jejo_salary, **params
+            )
+            results[year] = {"machine_cost_total": round(machine_cost_total),
+                             "salary_adjustment": round(salary_adjustment),
+                             "total": round(total)}
+
+            total_machine_cost += machine_cost_total
+            total_salary_adjustment += salary_adjustment
+            total_cost += total
+
+        except KeyError as e:
+            results[year] = {"error": f"데이터가 없습니다: {e}"}
+        except ValueError as e:
+            results[year] = {"error": f"계산 오류: {e}"}
+
+    totals = {"machine_cost_total": round(total_machine_cost),
+              "salary_adjustment": round(total_salary_adjustment),
+              "total": round(total_cost)}
+    return results, totals
+
+
+COST_SERIES = ("machine", "pogwal", "sonik", "jejo")
+COST_ITEMS = ("machine_cost_total", "salary_adjustment", "total")
+COST_PARAMS = {"num": 7700, "avg_rate": 0.03, "avg_rate_after_2023": 0.1}  # calculate_yearly_cost 기본값
+
+
+def build_cost_frame(datas, index=None):
+    """
+    build_company_data 결과 목록을 벡터 계산용 기업 × 연도 프레임으로 만듭니다.
+
+    값은 calculate_yearly_cost와 같이 None/0 → 0, '-' 등 → NaN으로 바뀝니다. 원 단위가 아닌
+    천원 단위 정수이므로 float64로 정확히 표현됩니다 (|값| < 2**53).
+
+    Args:
+        datas (list): build_company_data 결과 목록.
+        index (list): 행 이름. 기본값은 각 data의 search_key.
+
+    Returns:
+        DataFrame: 열은 (계열, 연도) MultiIndex. 계열 값 외에 ("present", 연도) 기계장치 연도 존재 여부,
+                   ("has", 계열) 계열 사용 여부 열이 있습니다.
+    """
+    years = sorted({year for data in datas for year in data["years"]})
+    position = {year: i for i, year in enumerate(years)}
+    values = {series: np.zeros((len(datas), len(years))) for series in COST_SERIES}
+    present = np.zeros((len(datas), len(years)), dtype=bool)
+    has = {series: np.zeros(len(datas), dtype=bool) for series in COST_SERIES}
+
+    for row, data in enumerate(datas):
+        for series in COST_SERIES:
+            converted = dict(zip(data["years"], (convert_to_numeric(x) for x in data[series])))
+            # compute_results와 같이 값이 모두 None인 계열은 없는 것으로 취급
+            has[series][row] = not all(value is None for value in converted.values())
+            for year, value in converted.items():
+                values[series][row, position[year]] = value or 0
+                if series == "machine":
+                    present[row, position[year]] = True
+
+    columns = {}
+    for series in COST_SERIES:
+        for i, year in enumerate(years):
+            columns[(series, year)] = values[series][:, i]
+    for i, year in enumerate(years):
+        columns[("present", year)] = present[:, i]
+    for series in COST_SERIES:
+        columns[("has", series)] = has[series]
+    if index is None:
+        index = [data["search_key"] for data in datas]
+    return pd.DataFrame(columns, index=index)
+
+
+def calculate_cost_frame(frame, years, **params):
+    """
+    calculate_yearly_cost를 프레임의 모든 행 × 연도에 대해 한 번에 계산합니다.
+
+    결과는 스칼라 함수와 비트 단위로 같습니다. 원본의 동작을 그대로 따릅니다:
+    값이 0/None이면 0, 3년 평균은 올해 값을 존재하는 직전 연도 수만큼 더해 나눈 값,
+    max/min은 파이썬과 같은 NaN 처리, 2019~2022 이외 연도는 2023년 이후 규칙.
+
+    Args:
+        frame (DataFrame): build_cost_frame 결과. "num", "avg_rate", "avg_rate_after_2023" 열이 있으면
+                           행별 파라미터로 사용합니다 (시나리오 계산용).
+        years (iterable): 계산할 연도.
+        **params: 열이 없을 때 쓸 파라미터. 기본값은 COST_PARAMS.
+
+    Returns:
+        DataFrame: 열은 (항목, 연도). 항목은 COST_ITEMS와 "error"(오류 메시지 또는 None).
+    """
+    rows = len(frame)
+    zeros = np.zeros(rows)
+
+    def param(name):
+        if (name, "") in frame.columns:  # frame[name] = 값 으로 추가한 열
+            return frame[(name, "")].to_numpy(dtype=float)
+        return np.full(rows, params.get(name, COST_PARAMS[name]), dtype=float)
+
+    def column(series, year):
+        if (series, year) in frame.columns:
+            return frame[(series, year)].to_numpy(dtype=float)
+        return zeros  # dict.get(year, 0)
+
+    def is_present(year):
+        if ("present", year) in frame.columns:
+            return frame[("present", year)].to_numpy(dtype=bool)
+        return np.zeros(rows, dtype=bool)
+
+    num, avg_rate, avg_rate_after_2023 = param("num"), param("avg_rate"), param("avg_rate_after_2023")
+    has_pogwal = frame[("has", "pogwal")].to_numpy(dtype=bool)
+    has_sonik = frame[("has", "sonik")].to_numpy(dtype=bool)
+    has_jejo = frame[("has", "jejo")].to_numpy(dtype=bool)
+    missing_salary = ~has_pogwal & ~has_sonik
+
+    out = {}
+    for year in years:
+        prev_year = year - 1
+
+        # 원본: sum(machine_costs.get(year) for y in years_available) / len(years_available)
+        count = sum(is_present(year - i).astype(int) for i in range(1, 4))
+        current = column("machine", year)
+        twice = current + current
+        prev_3_year_avg = np.select([count == 1, count == 2, count == 3], [current / 1, twice / 2, (twice + current) / 3], 0.0)
+
+        # 인원 계산 (max(0, x): x가 NaN이면 0)
+        pogwal_increase = column("pogwal", year) - column("pogwal", prev_year)
+        sonik_increase = np.where(has_sonik, column("sonik", year) - column("sonik", prev_year), 0.0)
+        jejo_increase = np.where(has_jejo, column("jejo", year) - column("jejo", prev_year), 0.0)
+        salary_increase = np.where(has_pogwal, pogwal_increase, sonik_increase + jejo_increase)
+        salary_increase = np.where(salary_increase > 0, salary_increase, 0.0)
+        salary_adjustment = np.floor(salary_increase / 40000) * num
+
+        # 기계장치 계산
+        change = current - column("machine", prev_year)
+        if year == 2019:
+            machine_cost_total = change * 0.07
+        elif year == 2020:
+            machine_cost_total = change * 0.1
+        elif year in [2021, 2022]:
+            machine_cost_total = change * 0.1 + (current - prev_3_year_avg) * avg_rate
+        else:
+            prev_year_cost = change * 0.12
+            adjusted_cost = (current - prev_3_year_avg) * avg_rate_after_2023
+            # min(adjusted_cost, cap): cap이 더 작을 때만 cap (adjusted_cost가 NaN이면 NaN)
+            machine_cost_total = prev_year_cost + np.where(prev_year_cost * 2 < adjusted_cost, prev_year_cost * 2, adjusted_cost)
+        # max(x, 0): 0이 더 클 때만 0 (NaN은 그대로)
+        machine_cost_total = np.where(0 > machine_cost_total, 0.0, machine_cost_total)
+
+        out[("machine_cost_total", year)] = machine_cost_total
+        out[("salary_adjustment", year)] = salary_adjustment
+        out[("total", year)] = machine_cost_total + salary_adjustment
+        out[("error", year)] = np.where(missing_salary, "pogwal_salary와 sonik_salary 중 하나는 반드시 필요합니다.", None)
+    return pd.DataFrame(out, index=frame.index)
+
+
+def cost_frame_results(frame, costs, years):
+    """
+    calculate_cost_frame 결과를 행마다 compute_results와 같은 (연도별 결과, 합계)로 바꿉니다.
+
+    반올림할 수 없는(NaN) 연도는 compute_results와 같이 오류로 남기고 합계에서 뺍니다.
+    급여 계열이 하나도 없는 행은 compute_results가 ValueError를 내므로 None입니다.
+
+    Returns:
+        list: 행 순서대로 (results, totals) 또는 None.
+    """
+    years = list(years)
+    no_salary = ~(frame[("has", "pogwal")].to_numpy(dtype=bool) | frame[("has", "sonik")].to_numpy(dtype=bool) | frame[("has", "jejo")].to_numpy(dtype=bool))
+
+    rounded, valid, errors = {}, {}, {}
+    sums = {item: np.zeros(len(costs)) for item in COST_ITEMS}
+    for year in years:
+        error = costs[("error", year)].to_numpy(dtype=object)
+        ok = error == None  # noqa: E711 (원소별 비교)
+        for item in COST_ITEMS:
+            ok = ok & ~np.isnan(costs[(item, year)].to_numpy(dtype=float))
+        for item in COST_ITEMS:
+            values = costs[(item, year)].to_numpy(dtype=float)
+            rounded[(item, year)] = np.rint(values)
+            sums[item] = sums[item] + np.where(ok, values, 0.0)  # 연도 순서대로 누적 (compute_results와 같은 순서)
+        valid[year] = ok
+        errors[year] = error
+    totals = {item: np.rint(sums[item]) for item in COST_ITEMS}
+
+    output = []
+    for row in range(len(costs)):
+        if no_salary[row]:
+            output.append(None)
+            continue
+        results = {}
+        for year in years:
+            if valid[year][row]:
+                results[year] = {item: int(rounded[(item, year)][row]) for item in COST_ITEMS}
+            elif errors[year][row] is not None:
+                results[year] = {"error": f"계산 오류: {errors[year][row]}"}
+            else:
+                results[year] = {"error": "계산 오류: cannot convert float NaN to integer"}
+        output.append((results, {item: int(totals[item][row]) for item in COST_ITEMS}))
+    return output
+
+
+@span("calculate_frame")
+def compute_results_frame(datas, start_year=None, **params):
+    """
+    여러 기업의 환급금을 벡터 엔진으로 한 번에 계산합니다. 계산 연도는 전체 조회 범위 기준입니다.
+
+    Returns:
+        list: datas 순서대로 compute_results와 같은 (results, totals). 급여 계열이 없으면 None.
+    """
+    if not datas:
+        return []
+    years = calculation_years(sorted({year for data in datas for year in data["years"]}), start_year)
+    frame = build_cost_frame(datas, index=range(len(datas)))
+    return cost_frame_results(frame, calculate_cost_frame(frame, years, **params), years)
+
+
+WHATIF_MAX_SCENARIOS = int(os.environ.get("WHATIF_MAX_SCENARIOS", "1000"))  # 한 번에 계산할 최대 시나리오 수
+
+
+def scenario_grid(params):
+    """
+    요청 파라미터에서 num / avg_rate / avg_rate_after_2023 조합 목록을 만듭니다.
+
+    각 값은 숫자 하나 또는 숫자 목록이며, 빠진 파라미터는 기본값을 씁니다.
+
+    Returns:
+        list: [{"num", "avg_rate", "avg_rate_after_2023"}] (데카르트 곱)
+
+    Raises:
+        ValueError: 숫자가 아니거나(inf/nan 포함) 조합 수가 WHATIF_MAX_SCENARIOS를 넘는 경우.
+    """
+    axes = []
+    for name, default in COST_PARAMS.items():
+        values = params.get(name, default)
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        if not values:
+            raise ValueError(f"{name} 값이 비어 있습니다.")
+        try:
+            axis = [float(value) for value in values]
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} 값은 숫자여야 합니다: {values}")
+        if not all(math.isfinite(value) for value in axis):
+            raise ValueError(f"{name} 값은 유한한 숫자여야 합니다: {values}")
+        axes.append(axis)
+
+    count = math.prod(len(axis) for axis in axes)
+    if count > WHATIF_MAX_SCENARIOS:
+        raise ValueError(f"시나리오가 너무 많습니다 ({count}개, 최대 {WHATIF_MAX_SCENARIOS}개).")
+    return [dict(zip(COST_PARAMS, combination)) for combination in itertools.product(*axes)]
+
+
+@span("calculate_scenarios")
+def compute_scenarios(data, scenarios, start_year=None):
+    """
+    이미 조회된 기업 데이터 하나로 여러 파라미터 시나리오를 한 번에 계산합니다.
+
+    Returns:
+        list: 시나리오 순서대로 compute_results와 같은 (results, totals).
+    """
+    years = calculation_years(data["years"], start_year)
+    base = build_cost_frame([data], index=[0])
+    frame = base.iloc[[0] * len(scenarios)].reset_index(drop=True)
+    for name in COST_PARAMS:
+        frame[name] = [scenario[name] for scenario in scenarios]
+    return cost_frame_results(frame, calculate_cost_frame(frame, years), years)
+
+
+RESULT_PAGE_CACHE_SIZE = int(os.environ.get("RESULT_PAGE_CACHE_SIZE", "256"))  # 메모리에 둘 결과 페이지 수
+
+
+class RenderedPageCache:
+    """ETag → 렌더링된 결과 페이지를 보관하는 LRU 캐시 (프로세스별)."""
+
+    def __init__(self, size=RESULT_PAGE_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            page = self._pages.get(etag)
+            if page is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._pages.move_to_end(etag)
+            return page
+
+    def put(self, etag, page):
+        with self._lock:
+            self._pages[etag] = page
+            self._pages.move_to_end(etag)
+            while len(self._pages) > self.size:
+                self._pages.popitem(last=False)
+
+
+result_pages = None  # init_state()에서 생성
+
+
+def _result_page_salt():
+    """결과 페이지를 만드는 코드/템플릿이 바뀌면 이전 ETag가 맞지 않도록 수정 시각을 섞습니다."""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = (os.path.abspath(__file__), os.path.join(base_dir, "templates", "result.html"))
+    return ":".join(str(os.path.getmtime(path)) for path in paths if os.path.exists(path))
+
+
+RESULT_PAGE_SALT = _result_page_salt()
+
+
+def calculation_params(args):
+    """
+    /calculate 쿼리의 계산 파라미터(num, avg_rate, avg_rate_after_2023)를 읽습니다.
+
+    Returns:
+        dict: 빈 값은 기본값으로 채운 파라미터. 파라미터를 하나도 주지 않으면 None (작업의 기본 결과 사용).
+
+    Raises:
+        ValueError: 숫자가 아닌 경우.
+    """
+    given = {name: args.get(name) for name in COST_PARAMS if args.get(name) not in (None, "")}
+    if not given:
+        return None
+    return scenario_grid(given)[0]
+
+
+def result_etag(data_version, params):
+    """(기업 데이터 버전, 계산 파라미터, 페이지 코드 버전)으로 결과 페이지의 ETag를 만듭니다."""
+    key = json.dumps([data_version, params, RESULT_PAGE_SALT], sort_keys=True)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def render_result_page(job, params=None):
+    """작업 결과로 result.html을 렌더링합니다. params가 있으면 그 파라미터로 다시 계산합니다."""
+    data = job.data
+    results, totals = job.results, job.totals
+    if params is not None:
+        computed = compute_scenarios(data, [params])[0]
+        if computed is None:
+            raise ValueError("급여 데이터가 없어 계산할 수 없습니다.")
+        results, totals = computed
+    years = sorted(results)
+    series = {name: dict(zip(data["years"], data[name])) for name in ("before_loss", "taxes")}
+    before_loss, taxes = ([convert_to_numeric(series[name].get(year) or 0) for year in years] for name in ("before_loss", "taxes"))
+    return render_template('result.html', results=results, totals=totals, company_name=data["company_name"], years=years,
+                           before_loss=before_loss, taxes=taxes)
+
+
+@views.route('/calculate', methods=['GET'])
+def calculate():
+    """
+    완료된 작업의 결과를 보여줍니다.
+
+    결과 페이지는 (기업 데이터 버전, 계산 파라미터) 기준 ETag로 메모리에 보관하고,
+    브라우저가 같은 ETag를 If-None-Match로 보내면 작업을 읽지 않고 304로 응답합니다.
+    쿼리로 num / avg_rate / avg_rate_after_2023을 주면 그 파라미터로 계산한 결과를 보여줍니다.
+    """
+    job_id = request.args.get("job_id") or session.get("job_id", "")
+    try:
+        params = calculation_params(request.args)
+    except ValueError as e:
+        return str(e), 400
+
+    state = job_store.data_version(job_id) if job_id else None
+    if state is None:
+        return "작업을 찾을 수 없습니다.", 404
+    status, data_version = state
+    if status == "failed":
+        return jobs.get(job_id).error, 400
+    if status != "done":
+        return "작업이 아직 끝나지 않았습니다.", 409
+
+    etag = result_etag(data_version, params)
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+    else:
+        page = result_pages.get(etag)
+        if page is None:
+            try:
+                page = render_result_page(jobs.get(job_id), params)
+            except ValueError as e:
+                return str(e), 400
+            result_pages.put(etag, page)
+        response = make_response(page)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"  # 매번 ETag로 확인
+    return response
+
+
+@views.route('/whatif', methods=['POST'])
+def whatif():
+    """
+    완료된 작업의 데이터로 파라미터 조합별 환급금을 계산합니다 (크레탑 재조회 없음).
+
+    요청 JSON: {"job_id": ..., "num": [...], "avg_rate": [...], "avg_rate_after_2023": [...]}
+    """
+    params = request.get_json(silent=True) or {}
+    job = jobs.get(params.get("job_id") or session.get("job_id", ""))
+    if job is None:
+        return jsonify({"error": "작업을 찾을 수 없습니다."}), 404
+    if job.status == "failed":
+        return jsonify({"error": job.error}), 400
+    if job.status != "done":
+        return jsonify({"error": "작업이 아직 끝나지 않았습니다."}), 409
+
+    try:
+        scenarios = scenario_grid(params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    outcomes = compute_scenarios(job.data, scenarios)
+    return jsonify({
+        "job_id": job.id,
+        "company_name": job.data["company_name"],
+        "scenarios": [dict(scenario, results=results, totals=totals)
+                      for scenario, (results, totals) in zip(scenarios, outcomes)],
+    })
+
+
+@views.route('/rerun', methods=['POST'])
+def rerun():
+    """검색어만 초기화하고 로그인 페이지로 이동 (드라이버는 브라우저 풀에서 재사용)"""
+    session.pop("search_key", None)  # 기존 검색어만 삭제
+    session.pop("job_id", None)
+    return redirect(url_for('views.login'))
+
+
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "0"))  # 배치 동시 처리 기업 수 (0이면 공용 계정의 동시 조회 수 합계, 최소 4)
+BATCH_OUTPUT_DIR = os.environ.get("BATCH_OUTPUT_DIR", "batch_results")
+BZNO_COLUMNS = ("사업자번호", "사업자 번호", "bzno", "search_key")
+
+
+class BatchStore:
+    """배치 작업의 기업별 진행 상태와 결과를 저장하는 SQLite 저장소. 중단된 배치를 이어서 처리할 때 사용합니다."""
+
+    def __init__(self, path=CACHE_DB_FILE):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS batch_items (
+                    batch_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    bzno TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (batch_id, bzno)
+                )"""
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def create(self, batch_id, business_numbers):
+        """배치 항목을 등록합니다. 이미 등록된 항목은 상태를 유지합니다."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO batch_items (batch_id, position, bzno, status, updated_at) VALUES (?, ?, ?, 'pending', ?)",
+                [(batch_id, position, bzno, now) for position, bzno in enumerate(business_numbers)],
+            )
+
+    def pending(self, batch_id):
+        """아직 완료되지 않은 (대기/실패) 사업자번호 목록을 반환합니다."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT bzno FROM batch_items WHERE batch_id = ? AND status != 'done' ORDER BY position", (batch_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def record(self, batch_id, bzno, status, result=None, error=None):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE batch_items SET status = ?, result = ?, error = ?, updated_at = ? WHERE batch_id = ? AND bzno = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error, time.time(), batch_id, bzno),
+            )
+
+    def progress(self, batch_id):
+        """상태별 항목 수를 반환합니다."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM batch_items WHERE batch_id = ? GROUP BY status", (batch_id,)).fetchall()
+        counts = dict(rows)
+        return {"total": sum(counts.values()), "done": counts.get("done", 0), "failed": counts.get("failed", 0), "pending": counts.get("pending", 0)}
+
+    def items(self, batch_id):
+        """등록 순서대로 (사업자번호, 상태, 결과, 오류)를 반환합니다."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT bzno, status, result, error FROM batch_items WHERE batch_id = ? ORDER BY position", (batch_id,)
+            ).fetchall()
+        return [(bzno, status, json.loads(result) if result else None, error) for bzno, status, result, error in rows]
+
+    def iter_items(self, batch_id, chunk_size=500):
+        """items와 같은 항목을 chunk_size개씩 나눠 읽습니다. 큰 배치도 한 번에 메모리에 올리지 않습니다."""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "SELECT bzno, status, result, error FROM batch_items WHERE batch_id = ? ORDER BY position", (batch_id,)
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield [(bzno, status, json.loads(result) if result else None, error) for bzno, status, result, error in rows]
+
+
+batch_store = None  # init_state()에서 생성
+_running_batches = set()
+_running_batches_lock = threading.Lock()
+
+
+def batch_workers():
+    """배치 동시 처리 기업 수. BATCH_WORKERS가 없으면 공용 계정의 동시 조회 수 합계 (최소 4)."""
+    return BATCH_WORKERS or max(4, account_scheduler.capacity())
+
+
+def read_business_numbers(file, filename=None):
+    """
+    CSV/XLSX 파일에서 사업자번호 목록을 읽습니다.
+
+    '사업자번호' 등의 열이 있으면 그 열을, 없으면 첫 번째 열을 사용합니다.
+    머리글 없이 사업자번호만 있는 파일도 처리합니다.
+
+    Args:
+        file: 파일 경로 또는 파일 객체.
+        filename (str): 확장자 판단용 파일 이름. 없으면 file을 경로로 봅니다.
+
+    Returns:
+        list: 중복을 제거한 사업자번호 목록 (입력 순서 유지).
+    """
+    name = (filename or str(file)).lower()
+    if name.endswith((".xlsx", ".xls")):
+        frame = pd.read_excel(file, dtype=str)
+    else:
+        frame = pd.read_csv(file, dtype=str)
+
+    column = next((c for c in frame.columns if str(c).strip() in BZNO_COLUMNS), frame.columns[0])
+    values = list(frame[column].dropna())
+    if len(re.sub(r"\D", "", str(column))) >= 10:  # 머리글 없이 첫 행부터 사업자번호인 경우
+        values.insert(0, column)
+
+    business_numbers = []
+    for value in values:
+        value = str(value).strip()
+        if value and value not in business_numbers:
+            business_numbers.append(value)
+    return business_numbers
+
+
+def make_batch_id(business_numbers, years=DATA_YEARS):
+    """사업자번호 목록(과 기본값이 아닌 조회 연도)으로 배치 ID를 만듭니다. 같은 목록은 같은 ID가 되어 이어서 처리됩니다."""
+    key = "\n".join(business_numbers)
+    if list(years) != DATA_YEARS:
+        key += f"\n{years[0]}-{years[-1]}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def batch_output_path(batch_id):
+    return os.path.join(BATCH_OUTPUT_DIR, f"{batch_id}.xlsx")
+
+
+def write_batch_workbook(batch_id, output_path):
+    """배치 결과를 기업별 한 행의 엑셀 파일로 저장합니다. 금액은 원 단위입니다."""
+    items = batch_store.items(batch_id)
+    # 완료된 기업 전체를 벡터 엔진으로 한 번에 계산
+    datas = [result["data"] for _, _, result, _ in items if result]
+    computed = iter(compute_results_frame(datas))
+
+    rows = []
+    for bzno, status, result, error in items:
+        row = {"사업자번호": bzno, "상태": status, "오류": error or ""}
+        if result:
+            data = result["data"]
+            results, totals = next(computed)
+            row["기업명"] = data["company_name"]
+            row["kedcd"] = data["kedcd"]
+            for year, year_result in results.items():
+                row[f"{year} 기계장치"] = year_result.get("machine_cost_total", 0) * 1000
+                row[f"{year} 인원"] = year_result.get("salary_adjustment", 0) * 1000
+                row[f"{year} 전체 환급금"] = year_result.get("total", 0) * 1000
+            row["합계 기계장치"] = totals["machine_cost_total"] * 1000
+            row["합계 인원"] = totals["salary_adjustment"] * 1000
+            row["합계 전체 환급금"] = totals["total"] * 1000
+            for year, before_loss_value, taxes_value in zip(data["years"][1:], data["before_loss"][1:], data["taxes"][1:]):
+                row[f"{year} 법인세비용차감전순손익"] = convert_to_numeric(before_loss_value or 0) * 1000
+                row[f"{year} 법인세비용"] = convert_to_numeric(taxes_value or 0) * 1000
+        rows.append(row)
+
+    frame = pd.DataFrame(rows)
+    leading = [c for c in ("사업자번호", "기업명", "kedcd", "상태", "오류") if c in frame.columns]
+    frame = frame[leading + [c for c in frame.columns if c not in leading]]
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    frame.to_excel(output_path, index=False, sheet_name="결과", engine="openpyxl")
+    print(f"✅ 배치 결과 저장: {output_path}")
+
+
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "500"))  # 내보내기 때 한 번에 읽고 계산할 기업 수
+EXPORT_COLUMNS = ("사업자번호", "기업명", "kedcd", "상태", "오류", "연도",
+                  "기계장치", "인원", "전체 환급금", "법인세비용차감전순손익", "법인세비용")
+
+
+def iter_export_rows(batch_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    배치 결과를 기업 × 연도 한 행씩 만들어 냅니다 (기업마다 마지막에 '합계' 행). 금액은 원 단위입니다.
+
+    chunk_size개 기업씩 읽어 벡터 엔진으로 계산하므로 기업 수와 관계없이 메모리 사용량이 일정합니다.
+    열 순서는 EXPORT_COLUMNS. 계산하지 못한 연도는 상태를 "error"로 두고 금액 칸을 비워,
+    0원으로 계산된 연도와 구분되게 합니다.
+    """
+    for chunk in batch_store.iter_items(batch_id, chunk_size):
+        computed = iter(compute_results_frame([result["data"] for _, _, result, _ in chunk if result]))
+        for bzno, status, result, error in chunk:
+            if not result:
+                yield [bzno, "", "", status, error or ""] + [""] * 6
+                continue
+            data = result["data"]
+            head = [bzno, data["company_name"], data["kedcd"]]
+            outcome = next(computed)
+            if outcome is None:
+                yield head + ["error", "급여 데이터가 없어 계산할 수 없습니다."] + [""] * 6
+                continue
+            results, totals = outcome
+            series = {name: dict(zip(data["years"], data[name])) for name in ("before_loss", "taxes")}
+            for year, year_result in results.items():
+                raw = [convert_to_numeric(series["before_loss"].get(year) or 0) * 1000,
+                       convert_to_numeric(series["taxes"].get(year) or 0) * 1000]
+                if "error" in year_result:
+                    yield head + ["error", year_result["error"], year, "", "", ""] + raw
+                    continue
+                yield head + [status, "", year,
+                              year_result["machine_cost_total"] * 1000,
+                              year_result["salary_adjustment"] * 1000,
+                              year_result["total"] * 1000] + raw
+            yield head + [status, "", "합계", totals["machine_cost_total"] * 1000, totals["salary_adjustment"] * 1000,
+                          totals["total"] * 1000, "", ""]
+
+
+def stream_export_csv(rows):
+    """행을 CSV 텍스트로 조금씩 만들어 냅니다. 엑셀에서 한글이 깨지지 않도록 BOM을 붙입니다."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % 1000 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_export_xlsx(rows, chunk_size=64 * 1024):
+    """
+    행을 openpyxl write-only 통합문서로 임시 파일에 쓴 뒤 파일을 조금씩 읽어 냅니다.
+
+    write-only 모드는 행을 바로 디스크에 쓰므로 기업 수와 관계없이 메모리 사용량이 일정합니다.
+    xlsx는 zip 형식이라 파일을 다 쓴 뒤에야 보낼 수 있습니다.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("결과")
+    sheet.append(EXPORT_COLUMNS)
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile(suffix=".xlsx") as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            yield block
+
+
+def run_batch(username, password, business_numbers, batch_id=None, workers=None, output_path=None, years=DATA_YEARS):
+    """
+    사업자번호 목록을 조회 → 계산 순서로 일괄 처리하고 결과 엑셀을 저장합니다.
+
+    기업마다 AccountScheduler가 입력한 계정(공용 계정의 자격 증명이면 공용 계정 중 하나)으로
+    조회하며(계정별 로그인 세션 공유), 최대 `workers`개 기업을 동시에 처리합니다.
+    진행 상태는 BatchStore에 기록되므로 같은 배치를 다시 실행하면 완료되지 않은 기업만 처리합니다.
+
+    Returns:
+        tuple: (배치 ID, 결과 파일 경로)
+    """
+    batch_id = batch_id or make_batch_id(business_numbers, years)
+    output_path = output_path or batch_output_path(batch_id)
+    workers = workers or batch_workers()
+    batch_store.create(batch_id, business_numbers)
+    pending = batch_store.pending(batch_id)
+    total = len(business_numbers)
+    print(f"🚀 배치 {batch_id}: 전체 {total}건 중 {len(pending)}건 처리 시작")
+
+    if pending:
+        owner = account_scheduler.owner_for(username, password)
+
+        def process(bzno):
+            try:
+                data = account_scheduler.run(
+                    lambda account: lookup_company(account.pool, account.session, account.username, bzno, years=years), owner)
+                results, totals = compute_results(data)
+                batch_store.record(batch_id, bzno, "done", {"data": data, "results": results, "totals": totals})
+                print(f"✅ [{batch_id}] {bzno} 완료")
+            except Exception as e:
+                batch_store.record(batch_id, bzno, "failed", error=str(e))
+                print(f"❌ [{batch_id}] {bzno} 실패: {e}")
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            list(executor.map(process, pending))
+
+    write_batch_workbook(batch_id, output_path)
+    print(f"배치 {batch_id} 종료: {batch_store.progress(batch_id)}")
+    return batch_id, output_path
+
+
+def start_batch(username, password, business_numbers, years=DATA_YEARS):
+    """배치를 백그라운드 스레드에서 실행합니다. 같은 배치가 실행 중이면 새로 시작하지 않습니다."""
+    batch_id = make_batch_id(business_numbers, years)
+    with _running_batches_lock:
+        if batch_id in _running_batches:
+            return batch_id
+        _running_batches.add(batch_id)
+
+    def run():
+        try:
+            run_batch(username, password, business_numbers, batch_id=batch_id, years=years)
+        except Exception as e:
+            print(f"❌ 배치 {batch_id} 중단: {e}")
+        finally:
+            with _running_batches_lock:
+                _running_batches.discard(batch_id)
+
+    threading.Thread(target=run, daemon=True).start()
+    return batch_id
+
+
+def warm_company_cache(username, password, business_numbers, workers=None):
+    """
+    사업자번호 목록의 kedcd/기업명을 미리 확인해 기업 캐시에 저장합니다.
+
+    조회와 같이 AccountScheduler를 거치므로 계정별 동시 조회 수와 요청 간격 제한을 지킵니다.
+
+    Returns:
+        dict: cached(이미 있음) / resolved(새로 확인) / failed 수.
+    """
+    pending = [bzno for bzno in business_numbers if company_cache.get(bzno) is None]
+    stats = {"cached": len(business_numbers) - len(pending), "resolved": 0, "failed": 0}
+    if not pending:
+        return stats
+    workers = workers or batch_workers()
+
+    owner = account_scheduler.owner_for(username, password)
+    stats_lock = threading.Lock()
+
+    def resolve_with(account, bzno):
+        resolved = None
+        if HTTP_FAST_PATH:
+            account.pool.sessions.ensure(account.session)
+            resolved = resolve_company_http(account.session, account.username, bzno)
+        if resolved is None:
+            with account.pool.checkout() as driver:
+                resolved = resolve_company_browser(driver, bzno)
+        return resolved
+
+    def resolve(bzno):
+        resolved = None
+        try:
+            resolved = account_scheduler.run(lambda account: resolve_with(account, bzno), owner)
+        except Exception as e:
+            print(f"❌ {bzno} 확인 실패: {e}")
+        with stats_lock:
+            if resolved:
+                company_cache.put(bzno, *resolved)
+                stats["resolved"] += 1
+            else:
+                stats["failed"] += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(resolve, pending))
+    print(f"기업 캐시 준비 완료: {stats}")
+    return stats
+
+
+def replay_archive(path, years=DATA_YEARS, output_path=None):
+    """
+    기록 보관소의 모든 기업을 브라우저/네트워크 없이 다시 조회하고 계산합니다.
+
+    파서나 계산을 바꾼 뒤 과거 조회 결과와 비교하는 회귀 확인용입니다. 기업 목록은 기록된
+    ETFI1122R 요청의 kedcd이며, 검색 기록이 있으면 사업자번호와 기업명을 함께 씁니다.
+
+    Returns:
+        list: [{"data", "results", "totals"}] (급여 계열이 없는 기업은 results/totals가 None)
+    """
+    archive = use_traffic_archive(path, "replay")
+    session = create_http_session()
+    searches = {}
+    kedcds = []
+    for data in archive.requests():
+        trxCd = (data.get("header") or {}).get("trxCd")
+        body = data.get(trxCd) or {}
+        if trxCd == "ETFI1122R" and body.get("kedcd") not in kedcds:
+            kedcds.append(body.get("kedcd"))
+        elif body.get(COMPANY_SEARCH_KEYWORD):
+            resolved = resolve_company_http(session, "", body[COMPANY_SEARCH_KEYWORD])
+            if resolved:
+                searches[resolved[0]] = (body[COMPANY_SEARCH_KEYWORD], resolved[1])
+
+    datas = []
+    for kedcd in kedcds:
+        search_key, company_name = searches.get(kedcd, (kedcd, ""))
+        tabs_values = collect_tabs_values(session, make_request_headers(), "", kedcd, years)
+        datas.append(build_company_data(search_key, company_name, kedcd, tabs_values, years))
+
+    replayed = []
+    for data, computed in zip(datas, compute_results_frame(datas)):
+        results, totals = computed or (None, None)
+        replayed.append({"data": data, "results": results, "totals": totals})
+        print(f"✅ {data['company_name'] or data['kedcd']} ({data['search_key']}): {totals or '급여 데이터 없음'}")
+    print(f"재생 완료: 기업 {len(replayed)}곳, 기록 사용 {archive.hits}건, 기록 없음 {archive.misses}건")
+
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(replayed, f, ensure_ascii=False, indent=2)
+        print(f"✅ 재생 결과 저장: {output_path}")
+    return replayed
+
+
+@views.route('/batch', methods=['POST'])
+def batch():
+    """업로드한 CSV/XLSX의 사업자번호 목록을 배치로 처리합니다."""
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"message": "사업자번호 파일이 필요합니다."}), 400
+
+    username = session.get("username", request.form.get("username"))
+    password = session.get("password", request.form.get("password"))
+    if not username or not password:
+        return jsonify({"message": "아이디와 비밀번호가 필요합니다."}), 400
+
+    try:
+        business_numbers = read_business_numbers(upload.stream, upload.filename)
+    except Exception as e:
+        return jsonify({"message": f"파일을 읽을 수 없습니다: {e}"}), 400
+    if not business_numbers:
+        return jsonify({"message": "사업자번호가 없습니다."}), 400
+    try:
+        years = year_window(request.form.get("first_year"), request.form.get("last_year"))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    batch_id = start_batch(username, password, business_numbers, years)
+    return jsonify({"batch_id": batch_id,
+                    "status": url_for('views.batch_status', batch_id=batch_id),
+                    "download": url_for('views.batch_download', batch_id=batch_id)})
+
+@views.route('/batch/<batch_id>', methods=['GET'])
+def batch_status(batch_id):
+    progress = batch_store.progress(batch_id)
+    with _running_batches_lock:
+        progress["running"] = batch_id in _running_batches
+    return jsonify(progress)
+
+@views.route('/batch/<batch_id>/download', methods=['GET'])
+def batch_download(batch_id):
+    path = batch_output_path(batch_id)
+    if not os.path.exists(path):
+        return jsonify({"message": "결과 파일이 아직 없습니다."}), 404
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=f"sokham_{batch_id}.xlsx")
+
+@views.route('/batch/<batch_id>/export', methods=['GET'])
+def batch_export(batch_id):
+    """배치 결과를 기업 × 연도 행으로 스트리밍합니다. ?format=csv(기본) 또는 xlsx."""
+    export_format = request.args.get("format", "csv").lower()
+    if export_format not in ("csv", "xlsx"):
+        return jsonify({"message": f"지원하지 않는 형식입니다: {export_format}"}), 400
+    if batch_store.progress(batch_id)["total"] == 0:
+        return jsonify({"message": "배치를 찾을 수 없습니다."}), 404
+
+    rows = iter_export_rows(batch_id)
+    if export_format == "csv":
+        body, mimetype = stream_export_csv(rows), "text/csv; charset=utf-8"
+    else:
+        body, mimetype = stream_export_xlsx(rows), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return Response(body, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=sokham_{batch_id}.{export_format}"})
+
+
+  # 웹 브라우저 자동 실행 함수
+def open_browser():
+    webbrowser.open("http://127.0.0.1:5000")  # 기본 페이지 자동 오픈
+    
+SECRET_KEY_FILE = ".secret_key"
+
+
+def load_secret_key():
+    """
+    세션 서명 키를 반환합니다.
+
+    워커마다 다른 키를 쓰면 다른 워커로 간 요청의 세션이 풀리므로,
+    SECRET_KEY 환경변수가 없으면 파일에 한 번 만들어 두고 모든 워커가 공유합니다.
+    """
+    if os.environ.get("SECRET_KEY"):
+        return os.environ["SECRET_KEY"]
+    if not os.path.exists(SECRET_KEY_FILE):
+        # 임시 파일을 만든 뒤 이름을 바꿔, 동시에 시작한 워커가 빈 파일을 읽지 않도록 함
+        temp_path = f"{SECRET_KEY_FILE}.{os.getpid()}"
+        with open(temp_path, "w") as file:
+            file.write(os.urandom(24).hex())
+        try:
+            os.link(temp_path, SECRET_KEY_FILE)  # 이미 있으면 실패 → 먼저 만든 키 사용
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+    with open(SECRET_KEY_FILE, "r") as file:
+        return file.read().strip()
+
+
+def init_state(transport=CRETOP_TRANSPORT, archive=CRETOP_ARCHIVE, accounts_file=CRETOP_ACCOUNTS_FILE):
+    """
+    저장소(SQLite), 캐시, 작업 관리자, 계정 스케줄러, 전송 모드를 준비합니다. 이미 준비했으면 그대로 둡니다.
+
+    모듈을 불러오기만 해서는 파일이나 스레드가 생기지 않도록, 웹 서버는 create_app()이,
+    명령행 명령(batch, warm, replay)은 main()이 호출합니다.
+    """
+    global statement_cache, session_store, company_cache, job_store, jobs, batch_store, result_pages, account_scheduler
+    if account_scheduler is not None:
+        return
+    use_traffic_archive(archive, transport)
+    statement_cache = StatementCache()
+    session_store = SessionStore()
+    company_cache = CompanyCache()
+    batch_store = BatchStore()
+    result_pages = RenderedPageCache()
+    scheduler = AccountScheduler()
+    scheduler.load(accounts_file)
+    account_scheduler = scheduler
+    job_store = JobStore()
+    jobs = JobManager(job_store)
+
+
+def create_app():
+    """
+    Flask 앱을 생성합니다. gunicorn에서는 `app:create_app()`으로 실행합니다.
+
+    저장소와 작업 관리자를 준비하고, 서버에서만 필요한 크롬 프로파일 동기화를 백그라운드에서 시작합니다.
+    """
+    init_state()
+    app = Flask(__name__)
+    app.secret_key = load_secret_key()
+    app.register_blueprint(views)
+    start_profile_sync()
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SOKHAM")
+    commands = parser.add_subparsers(dest="command")
+
+    batch_parser = commands.add_parser("batch", help="CSV/XLSX의 사업자번호 목록을 일괄 처리합니다.")
+    batch_parser.add_argument("input", help="사업자번호 CSV/XLSX 파일")
+    batch_parser.add_argument("-u", "--username", required=True, help="크레탑 아이디")
+    batch_parser.add_argument("-p", "--password", help="크레탑 비밀번호 (없으면 CRETOP_PASSWORD 또는 입력)")
+    batch_parser.add_argument("-o", "--output", help="결과 엑셀 경로")
+    batch_parser.add_argument("-w", "--workers", type=int, help="동시 처리 기업 수 (기본값 BATCH_WORKERS)")
+    batch_parser.add_argument("--first-year", type=int, default=DATA_FIRST_YEAR, help="조회 시작 연도 (전년 대비 계산용)")
+    batch_parser.add_argument("--last-year", type=int, default=DATA_LAST_YEAR, help="조회 마지막 연도")
+
+    warm_parser = commands.add_parser("warm", help="CSV/XLSX의 사업자번호를 미리 kedcd/기업명으로 확인해 둡니다.")
+    warm_parser.add_argument("input", help="사업자번호 CSV/XLSX 파일")
+    warm_parser.add_argument("-u", "--username", required=True, help="크레탑 아이디")
+    warm_parser.add_argument("-p", "--password", help="크레탑 비밀번호 (없으면 CRETOP_PASSWORD 또는 입력)")
+    warm_parser.add_argument("-w", "--workers", type=int, help="동시 확인 기업 수 (기본값 BATCH_WORKERS)")
+
+    replay_parser = commands.add_parser("replay", help="기록 보관소(CRETOP_TRANSPORT=record로 기록)의 기업을 네트워크 없이 다시 계산합니다.")
+    replay_parser.add_argument("archive", nargs="?", default=CRETOP_ARCHIVE, help="기록 보관소 경로")
+    replay_parser.add_argument("-o", "--output", help="결과 JSON 경로")
+    replay_parser.add_argument("--first-year", type=int, default=DATA_FIRST_YEAR, help="조회 시작 연도 (기록할 때와 같아야 함)")
+    replay_parser.add_argument("--last-year", type=int, default=DATA_LAST_YEAR, help="조회 마지막 연도 (기록할 때와 같아야 함)")
+
+    args = parser.parse_args(argv)
+    init_state()
+
+    if args.command == "replay":
+        replay_archive(args.archive, year_window(args.first_year, args.last_year), args.output)
+        return
+
+    if args.command in ("batch", "warm"):
+        password = args.password or os.environ.get("CRETOP_PASSWORD") or getpass.getpass("비밀번호: ")
+        business_numbers = read_business_numbers(args.input)
+        if args.command == "batch":
+            years = year_window(args.first_year, args.last_year)
+            run_batch(args.username, password, business_numbers, workers=args.workers, output_path=args.output, years=years)
+        else:
+            warm_company_cache(args.username, password, business_numbers, workers=args.workers)
+        return
+
+    app = create_app()
     # 스레드를 사용하여 웹 브라우저 실행 (서버와 동시에 실행)
     threading.Timer(0.5, open_browser).start()  # 서버 실행 후 1.25초 후 실행
     app.run(debug=True, use_reloader=False)
-    
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+"""
+mock_cretop.py 대역 서버를 상대로 실제 조회 경로(run_selenium, collect_tabs_values)의 성능을 측정합니다.
+
+조회당 지연 시간, 동시 작업 처리량, 메모리 사용량, 단계별(span) 소요 시간과 조회당 request.json
+요청 수를 출력합니다. 성능 변경 전후로 실행해 기준값과 비교합니다.
+
+측정 방식 (--mode):
+    browser  크롬으로 검색 → 재무 페이지 → kedcd 확인 → 재무제표 조회. 운영 기본값(HTTP_FAST_PATH=0)과 같은 경로.
+    stub     크롬 없이(CI용) 같은 브라우저 경로를 측정. 로그인/검색 화면 조작만 대역 서버에 HTTP로 흉내 내고,
+             브라우저 풀, 응답 수집(NetworkCapture), get_kedcd, 재무제표 조회는 실제 코드를 그대로 탑니다.
+    http     실험용. 검색 거래(COMPANY_SEARCH_TRX)가 실제 사이트에서 확인되지 않은 추정값이고 대역 서버도 그 값을
+             따라 하므로, 운영에서 꺼져 있는 경로의 참고용 수치일 뿐입니다.
+
+    python benchmark.py                                  # 대역 서버를 함께 띄워 크롬 경로 측정
+    python benchmark.py --mode stub                      # 크롬 없이 브라우저 경로 측정 (CI)
+    python benchmark.py --lookups 40 --concurrency 8 --latency 0.1
+    python benchmark.py --url http://127.0.0.1:5050      # 이미 떠 있는 대역 서버 사용
+    python benchmark.py --json baseline.json             # 결과를 JSON으로 저장
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import importlib
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import re
+
+import requests
+from werkzeug.serving import make_server
+
+import mock_cretop
+
+
+def start_mock_server(latency, page_latency):
+    """대역 서버를 빈 포트에서 백그라운드로 띄우고 주소를 반환합니다."""
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # 요청 로그가 결과를 가리지 않도록
+    server = make_server("127.0.0.1", 0, mock_cretop.create_mock_app(latency, page_latency), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+MODES = {
+    "browser": "browser",
+    "stub": "browser (stub driver)",
+    "http": "http (experimental: unverified search transaction)",
+}
+
+
+def load_app(url, cache_db, mode):
+    """대역 서버와 임시 캐시 DB를 쓰도록 환경 변수를 설정한 뒤 app을 불러옵니다."""
+    os.environ["CRETOP_URL"] = url
+    os.environ["CRETOP_CACHE_DB"] = cache_db
+    os.environ["HTTP_FAST_PATH"] = "1" if mode == "http" else "0"
+    os.environ["SESSION_KEEPALIVE"] = "0"
+    module = importlib.import_module("app")
+    module.init_state()
+    return module
+
+
+def login_without_browser(app, url, username, password):
+    """대역 서버에 직접 로그인해 세션 저장소를 채웁니다 (HTTP 경로만 측정할 때 크롬 없이 실행)."""
+    response = requests.post(f"{url}/login", data={"username": username, "password": password}, allow_redirects=False)
+    token = response.cookies.get("JSESSIONID")
+    if not token:
+        raise SystemExit("대역 서버 로그인 실패")
+    now = time.time()
+    app.session_store.save(username, {"cookies": [{"name": "JSESSIONID", "value": token}], "logged_in_at": now, "checked_at": now})
+    # 예열(크롬 실행) 없이 풀만 등록
+    app._browser_pools[username] = app.BrowserPool(username, password)
+
+
+class StubDriver:
+    """
+    크롬 대신 대역 서버에 requests로 접속하는 WebDriver 대역.
+
+    window.__cretopCapture 버퍼를 파이썬 리스트로 흉내 내며, 재무 페이지를 열면 페이지 스크립트가 보내는
+    request.json 요청을 대신 보내 응답 header를 버퍼에 기록합니다. 그래서 NetworkCapture.clear,
+    get_kedcd(WAIT_FOR_KEDCD_SCRIPT), 쿠키 복사, 탭 목록 읽기는 실제 코드 그대로 동작합니다.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.http = requests.Session()
+        self.current_url = url
+        self.events = []
+        self.company_name = ""
+        self.tabs = []
+
+    def execute_cdp_cmd(self, command, params):
+        return {}
+
+    def execute_script(self, script, *args):
+        if script.startswith("return window.__cretopCapture"):
+            return [dict(event) for event in self.events]
+        if "events = []" in script:
+            self.events.clear()
+        return None
+
+    def set_script_timeout(self, timeout):
+        pass
+
+    def execute_async_script(self, script, *args):
+        for event in reversed(self.events):
+            if event.get("kedcd"):
+                return event["kedcd"]
+        raise StubDriver.app.selenium_exceptions.TimeoutException("kedcd 응답 없음")
+
+    def get(self, url):
+        response = self.http.get(url)
+        self.current_url = response.url
+        return response.text
+
+    def get_cookies(self):
+        return [{"name": cookie.name, "value": cookie.value} for cookie in self.http.cookies]
+
+    def add_cookie(self, cookie):
+        self.http.cookies.set(cookie["name"], cookie["value"])
+
+    def find_element(self, by, value):
+        return SimpleNamespace(text=self.company_name)
+
+    def find_elements(self, by, value):
+        return [SimpleNamespace(text=tab) for tab in self.tabs]
+
+    def quit(self):
+        self.http.close()
+
+    # 화면 조작 (app.ensure_logged_in / app.navigate_to_financial_page 대신 사용)
+
+    def login(self, username, password):
+        self.http.post(f"{self.url}/login", data={"username": username, "password": password})
+        self.current_url = self.url
+        return True
+
+    def open_financial_page(self, search_key):
+        """검색 결과에서 사업자번호가 같은 기업의 재무 페이지를 열고, 페이지의 request.json 응답을 기록합니다."""
+        html = self.get(f"{self.url}/search?q={search_key}")
+        bzno = re.sub(r"\D", "", search_key)
+        for row_bzno, kedcd in re.findall(r"<span>사업자번호</span><span>([^<]*)</span>.*?href=\"/financial/([^\"]+)\"", html, re.S):
+            if re.sub(r"\D", "", row_bzno) == bzno:
+                break
+        else:
+            raise StubDriver.app.CretopError(f"'{search_key}'에 해당하는 검색 결과가 없습니다.")
+        html = self.get(f"{self.url}/financial/{kedcd}")
+        self.company_name = re.search(r"<strong>([^<]*)</strong>", html).group(1)
+        self.tabs = re.findall(r"<li><a>([^<]*)</a></li>", html.split('class="tab-group-ul"', 1)[1])
+        for trx_cd, page_kedcd in re.findall(r'trxCd: "(\w+)", kedcd: "(\w+)"', html):
+            header = self.http.post(f"{self.url}/httpService/request.json",
+                                    json={"header": {"trxCd": trx_cd, "kedcd": page_kedcd}}).json()["header"]
+            self.events.append({"trxCd": header.get("trxCd", ""), "kedcd": header.get("kedcd", "")})
+        return 1
+
+
+def use_stub_driver(app, url):
+    """크롬 대신 StubDriver를 띄우도록 app의 드라이버 생성과 화면 조작 함수를 바꿉니다."""
+    StubDriver.app = app
+
+    def create_driver(user_data_dir):
+        driver = StubDriver(url)
+        app.NetworkCapture(driver).install()
+        return driver
+
+    app.create_driver = create_driver
+    app.setup_user_data = lambda user_data_dir=None, allow_kill=True: None  # 복사할 크롬 프로파일 없음
+    app.ensure_logged_in = lambda driver, username, password, fresh=True: driver.login(username, password)
+    app.navigate_to_financial_page = lambda driver, search_key, wait_time=10: driver.open_financial_page(search_key)
+
+
+def business_numbers(start, count):
+    return [f"{n:010d}"[:3] + "-" + f"{n:010d}"[3:5] + "-" + f"{n:010d}"[5:] for n in range(start, start + count)]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def describe(latencies):
+    if not latencies:
+        return {}
+    return {
+        "count": len(latencies),
+        "min": min(latencies),
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "max": max(latencies),
+        "mean": statistics.fmean(latencies),
+    }
+
+
+def mock_requests(url):
+    """대역 서버가 지금까지 받은 request.json 요청 수."""
+    try:
+        return sum(requests.get(f"{url}/mock/stats", timeout=5).json()["requests"].values())
+    except requests.RequestException:
+        return None
+
+
+def timed_lookups(app, username, password, keys, concurrency):
+    """keys를 concurrency개 작업으로 조회하고 (조회별 지연 시간, 전체 시간, 실패 수)를 반환합니다."""
+    latencies, failures = [], []
+    lock = threading.Lock()
+
+    def lookup(key):
+        started = time.perf_counter()
+        try:
+            data = app.run_selenium(username, password, key)
+            app.compute_results(data)
+        except Exception as e:
+            with lock:
+                failures.append(f"{key}: {e}")
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        list(executor.map(lookup, keys))
+    return latencies, time.perf_counter() - started, failures
+
+
+def timed_tab_fetches(app, username, keys):
+    """검색을 건너뛰고 재무제표 조회(collect_tabs_values)만 측정합니다."""
+    session = app.create_http_session()
+    app.get_browser_pool(username, None).sessions.ensure(session)
+    latencies = []
+    for key in keys:
+        kedcd = "K" + key.replace("-", "")
+        started = time.perf_counter()
+        app.collect_tabs_values(session, app.make_request_headers(), username, kedcd, app.DATA_YEARS)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run_phase(name, app, url, username, password, keys, concurrency, report):
+    before = mock_requests(url)
+    latencies, elapsed, failures = timed_lookups(app, username, password, keys, concurrency)
+    after = mock_requests(url)
+    result = describe(latencies)
+    result.update({
+        "concurrency": concurrency,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0,
+        "failures": len(failures),
+        "requests_per_lookup": (after - before) / len(keys) if before is not None and after is not None and keys else None,
+    })
+    report["phases"][name] = result
+    for failure in failures[:5]:
+        print(f"  실패 {failure}")
+
+
+def print_report(report):
+    print()
+    print(f"{'단계':<24}{'건수':>6}{'p50(s)':>10}{'p95(s)':>10}{'max(s)':>10}{'건/초':>10}{'요청/건':>10}")
+    for name, result in report["phases"].items():
+        if not result.get("count"):
+            print(f"{name:<24}{'-':>6}")
+            continue
+        per_lookup = result.get("requests_per_lookup")
+        print(f"{name:<24}{result['count']:>6}{result['p50']:>10.3f}{result['p95']:>10.3f}{result['max']:>10.3f}"
+              f"{result.get('throughput', 0):>10.2f}{per_lookup if per_lookup is not None else '-':>10}")
+    memory = report["memory"]
+    print(f"\n메모리: 파이썬 할당 최대 {memory['tracemalloc_peak_mb']:.1f} MB, 프로세스 최대 RSS {memory['max_rss_mb'] or '-'} MB")
+    print("\n단계별 소요 시간 (span)")
+    for stage, span in sorted(report["spans"].items(), key=lambda item: -item[1]["sum"]):
+        print(f"  {stage:<36}{span['count']:>6}회 {span['sum']:>9.3f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="대역 서버 상대 조회 성능 측정")
+    parser.add_argument("--url", help="이미 떠 있는 대역 서버 주소 (없으면 함께 띄움)")
+    parser.add_argument("--latency", type=float, default=0.05, help="대역 서버 request.json 지연 (초)")
+    parser.add_argument("--page-latency", type=float, default=0.0, help="대역 서버 화면 지연 (초)")
+    parser.add_argument("--lookups", type=int, default=10, help="단일 조회 측정 건수")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시 작업 수")
+    parser.add_argument("--mode", choices=MODES, default="browser",
+                        help="browser: 크롬 (기본값), stub: 크롬 없이 브라우저 경로 (CI), http: 실험용 HTTP 빠른 경로")
+    parser.add_argument("-u", "--username", default="bench")
+    parser.add_argument("-p", "--password", default="bench")
+    parser.add_argument("--json", help="결과를 저장할 JSON 경로")
+    args = parser.parse_args(argv)
+
+    tracemalloc.start()
+    url = args.url
+    if url is None:
+        url, _server = start_mock_server(args.latency, args.page_latency)
+    print(f"대역 서버: {url}")
+
+    cache_dir = tempfile.mkdtemp(prefix="sokham-bench-")
+    app = load_app(url, os.path.join(cache_dir, "cache.db"), args.mode)
+    if args.mode == "stub":
+        use_stub_driver(app, url)
+    elif args.mode == "http":
+        print("⚠️ http 모드는 확인되지 않은 검색 거래를 쓰는 실험용 경로입니다 (운영 기본값은 꺼짐).")
+        login_without_browser(app, url, args.username, args.password)
+
+    report = {"url": url, "mode": MODES[args.mode], "latency": args.latency, "phases": {}}
+    cold = business_numbers(1000000000, args.lookups)
+    concurrent = business_numbers(2000000000, args.lookups * max(1, args.concurrency))
+    fetch_only = business_numbers(3000000000, args.lookups)
+
+    run_phase("조회 (캐시 없음)", app, url, args.username, args.password, cold, 1, report)
+    run_phase("조회 (캐시 있음)", app, url, args.username, args.password, cold, 1, report)
+    run_phase(f"동시 조회 x{args.concurrency}", app, url, args.username, args.password, concurrent, args.concurrency, report)
+    report["phases"]["재무제표만 (collect_tabs_values)"] = describe(timed_tab_fetches(app, args.username, fetch_only))
+
+    _, peak = tracemalloc.get_traced_memory()
+    max_rss = None
+    if resource is not None:
+        max_rss = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # 리눅스는 KB 단위
+    report["memory"] = {"tracemalloc_peak_mb": peak / 1024 / 1024, "max_rss_mb": max_rss}
+    report["spans"] = {
+        f"{stage}{' (대기)' if idle else ''}": {"count": count, "sum": total}
+        for (stage, idle), (count, total) in app.span_metrics.summary().items()
+    }
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n결과 저장: {args.json}")
+    app.shutdown_browser_pools()
+
+
+if __name__ == '__main__':
+    main()
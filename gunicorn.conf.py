@@ -0,0 +1,20 @@
+"""
+gunicorn 설정. `gunicorn` 명령을 이 폴더에서 실행하면 자동으로 읽힙니다.
+
+    gunicorn                       # app:create_app()을 gthread 워커로 실행
+    GUNICORN_WORKERS=4 GUNICORN_THREADS=16 gunicorn
+
+/progress_stream(Server-Sent Events)은 작업이 끝날 때까지(최대 PROGRESS_STREAM_MAX초) 연결을 붙잡으므로,
+요청 하나가 워커 전체를 막는 기본 sync 워커 대신 스레드 워커(gthread)를 사용합니다.
+스레드 수는 동시에 열린 진행 스트림 수 + 일반 요청 수보다 넉넉하게 잡습니다.
+"""
+import os
+
+wsgi_app = "app:create_app()"
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+timeout = 120  # 조회 요청 자체는 작업 스레드에서 돌므로 응답은 짧음. 스트림은 주기적으로 데이터를 보냄
+# 워커마다 create_app()을 따로 실행해 저장소 연결, 작업 스레드, 크롬 프로파일 번호를 각자 가짐
+preload_app = False
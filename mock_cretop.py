@@ -0,0 +1,259 @@
+"""
+로컬 크레탑 대역 서버.
+
+app.py가 사용하는 화면 요소(로그인 폼, 팝업, 검색 결과 #et-area, 재무 페이지 etfi110m1)와
+httpService/request.json(ETFI1122R 재무제표, 기업 검색)을 고정된 가짜 데이터로 흉내 냅니다.
+실제 cretop.com 없이 app.py를 실행하거나 benchmark.py로 성능을 측정할 때 사용합니다.
+
+    python mock_cretop.py --port 5050 --latency 0.2
+    CRETOP_URL=http://127.0.0.1:5050 python app.py
+"""
+from flask import Flask, request, redirect, render_template_string, jsonify, make_response
+import argparse
+import hashlib
+import re
+import threading
+import time
+import os
+
+
+MOCK_LATENCY = float(os.environ.get("MOCK_LATENCY", "0"))  # request.json 응답 지연 (초)
+MOCK_PAGE_LATENCY = float(os.environ.get("MOCK_PAGE_LATENCY", "0"))  # 화면 응답 지연 (초)
+MOCK_LAST_YEAR = 2024  # 이 연도 이후의 재무제표는 없음
+# 기업 검색 거래. 실제 크레탑의 값이 아니라 app.py의 (확인되지 않은) 기본값을 따릅니다.
+# 대역 서버는 이 거래 이름과 검색어 필드로 온 요청에만 검색 결과를 돌려줍니다.
+MOCK_SEARCH_TRX_CD = os.environ.get("CRETOP_SEARCH_TRX_CD", "ETSR1011R")
+MOCK_SEARCH_KEYWORD = os.environ.get("CRETOP_SEARCH_KEYWORD_FIELD", "srchKwd")
+
+# (fsCcd, fsCls) → 계정 영문명 목록. app.target_tabs의 계정과 같은 이름(들여쓰기 포함)을 씁니다.
+STATEMENT_ACCOUNTS = {
+    ("1", "2"): ["Total Assets", "   Tangible Assets", "      Land", "      Buildings", "         Machinery and Equipment", "         Vehicles"],
+    ("2", "1"): ["Revenue", "   Employee benefits Expenses", "   Depreciation", "Profits(Losses) before Tax", "(Income Tax Expenses)", "Net Income"],
+    ("2", "2"): ["Sales", "   Selling and Administrative Expenses", "      Employee Salaries and Wages", "      Retirement Benefits",
+                 "(Ongoing Business) Income or Loss Before Income Taxes Expenses", "Income Taxes Expenses (For Ongoing Business Income or Loss)", "Net Income"],
+    ("5", "2"): ["Material Costs", "   Labor Costs", "      Salaries and Wages", "   Manufacturing Overhead"],
+}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ko"><head><meta charset="UTF-8"><title>CRETOP (mock)</title></head>
+<body>
+<div class="check-close__footer" id="notice">공지<button onclick="this.parentNode.style.display='none'"><span>[닫기]</span></button></div>
+{% if user %}
+  <div class="login-after"><span class="user-nm">{{ user }}</span></div>
+  {% if welcome %}<div class="pop-alert" id="welcome">로그인되었습니다<button onclick="this.parentNode.style.display='none'"><span>확인</span></button></div>{% endif %}
+  <input type="text" id="q" placeholder="검색어를 입력해주세요." value="{{ query }}">
+  <button title="검색하기" onclick="location.href='/search?q=' + encodeURIComponent(document.getElementById('q').value)">검색</button>
+{% else %}
+  <a class="header-login-idcr" href="#">로그인</a>
+  {% if error %}<div class="pop-area {{ error }}">로그인 오류</div>{% endif %}
+  <form method="post" action="/login">
+    <input type="text" id="idModel" name="username">
+    <input type="password" id="pwModel" name="password">
+    <button type="submit" class="btn-login">로그인</button>
+  </form>
+{% endif %}
+{{ body|safe }}
+</body></html>"""
+
+SEARCH_TEMPLATE = """<div id="et-area"><div><div>검색 결과 {{ companies|length }}건</div><div><ul>
+{% for company in companies %}
+  <li><div>
+    <ul><li>{{ company.name }}</li><li>대표자</li><li>주소</li><li><span>사업자번호</span><span>{{ company.bzno }}</span></li></ul>
+    <strong>{{ company.name }}</strong>
+    <ul class="btn__list"><li><a>개요</a></li><li><a>신용</a></li><li><a>관심</a></li><li><a href="/financial/{{ company.kedcd }}">재무</a></li></ul>
+  </div></li>
+{% endfor %}
+</ul></div></div></div>
+<script>
+const xhr = new XMLHttpRequest();
+xhr.open("POST", "/httpService/request.json");
+xhr.setRequestHeader("Content-Type", "application/json");
+xhr.send(JSON.stringify({header: {trxCd: "{{ trx_cd }}", screenId: "{{ trx_cd[:6] }}S1"}, "{{ trx_cd }}": {"{{ keyword }}": "{{ query }}"}}));
+</script>"""
+
+FINANCIAL_TEMPLATE = """<div id="etfi110m1"><div><div>재무</div><div><div><div><div><div>요약</div><div><div><strong>{{ company.name }}</strong></div></div></div></div></div></div></div></div>
+<ul class="tab-group-ul">{% for tab in tabs %}<li><a>{{ tab }}</a></li>{% endfor %}</ul>
+<script>
+const xhr = new XMLHttpRequest();
+xhr.open("POST", "/httpService/request.json");
+xhr.setRequestHeader("Content-Type", "application/json");
+xhr.send(JSON.stringify({header: {trxCd: "ETFI1101R", kedcd: "{{ company.kedcd }}"}}));
+</script>"""
+
+
+def format_bzno(digits):
+    return f"{digits[:3]}-{digits[3:5]}-{digits[5:]}"
+
+
+def mock_company(bzno):
+    """사업자번호로 고정된 가짜 기업을 만듭니다. kedcd는 "K" + 사업자번호 숫자."""
+    digits = re.sub(r"\D", "", bzno)
+    seed = int(hashlib.sha1(digits.encode()).hexdigest()[:8], 16)
+    return {
+        "bzno": format_bzno(digits),
+        "kedcd": f"K{digits}",
+        "name": f"목업기업{digits[-4:]}",
+        "has_pogwal": seed % 2 == 0,  # 짝수면 K-IFRS(포괄손익계산서) 기업
+        "seed": seed,
+    }
+
+
+def company_by_kedcd(kedcd):
+    return mock_company(kedcd[1:]) if kedcd and kedcd.startswith("K") else None
+
+
+def account_value(company, account, year):
+    """기업/계정/연도별 고정 값 (천원 단위, 매년 증가)."""
+    base = (company["seed"] + int(hashlib.sha1(account.encode()).hexdigest()[:6], 16)) % 900000 + 100000
+    return base + (year - 2010) * (base // 20) + (company["seed"] % 7) * 1000 * (year % 3)
+
+
+def statement_rows(company, acctDt, fsCcd, fsCls):
+    """ETFI1122R 응답의 계정 행 목록. val1..val5는 기준연도-4 .. 기준연도."""
+    year = int(acctDt[:4])
+    if year > MOCK_LAST_YEAR:
+        return []
+    if (fsCcd, fsCls) == ("2", "1") and not company["has_pogwal"]:
+        return []
+    if (fsCcd, fsCls) in (("2", "2"), ("5", "2")) and company["has_pogwal"]:
+        return []
+    rows = []
+    for code, account in enumerate(STATEMENT_ACCOUNTS.get((fsCcd, fsCls), []), start=1):
+        row = {"accCd": f"{fsCcd}{fsCls}{code:03d}", "accNmEng": account, "accNm": account.strip()}
+        for i in range(1, 6):
+            row[f"val{i}"] = str(account_value(company, account, year - 5 + i))
+        rows.append(row)
+    return rows
+
+
+def create_mock_app(latency=MOCK_LATENCY, page_latency=MOCK_PAGE_LATENCY, single_session=False):
+    """
+    가짜 크레탑 Flask 앱을 만듭니다.
+
+    Args:
+        latency (float): request.json 응답 지연 (초).
+        page_latency (float): 화면 응답 지연 (초).
+        single_session (bool): 같은 아이디로 이미 로그인된 세션이 있으면 PLIL140P5 팝업으로 거부.
+    """
+    app = Flask(__name__)
+    sessions = {}  # 세션 토큰 → 아이디
+    active = {}  # 아이디 → 세션 토큰
+    stats = {"pages": 0, "logins": 0, "requests": {}}
+    lock = threading.Lock()
+
+    def current_user():
+        return sessions.get(request.cookies.get("JSESSIONID", ""))
+
+    def page(body="", **context):
+        if page_latency:
+            time.sleep(page_latency)
+        with lock:
+            stats["pages"] += 1
+        context.setdefault("query", "")
+        return render_template_string(PAGE_TEMPLATE, user=current_user(), body=body, **context)
+
+    @app.route("/")
+    def home():
+        return page(welcome=request.args.get("welcome"), error=request.args.get("error"))
+
+    @app.route("/login", methods=["POST"])
+    def login():
+        username = request.form.get("username", "")
+        if not username or not request.form.get("password"):
+            return redirect("/?error=PLIL140P1")
+        with lock:
+            if single_session and username in active:
+                return redirect("/?error=PLIL140P5")
+            token = os.urandom(16).hex()
+            sessions[token] = username
+            active[username] = token
+            stats["logins"] += 1
+        response = make_response(redirect("/?welcome=1"))
+        response.set_cookie("JSESSIONID", token, httponly=True)
+        return response
+
+    @app.route("/logout")
+    def logout():
+        with lock:
+            username = sessions.pop(request.cookies.get("JSESSIONID", ""), None)
+            active.pop(username, None)
+        return redirect("/")
+
+    @app.route("/search")
+    def search():
+        if current_user() is None:
+            return redirect("/")
+        query = request.args.get("q", "")
+        digits = re.sub(r"\D", "", query)
+        companies = []
+        if len(digits) == 10:
+            # 비슷한 번호의 다른 기업도 함께 보여 줌
+            companies = [mock_company(f"{int(digits) + 1:010d}"), mock_company(digits)]
+        body = render_template_string(SEARCH_TEMPLATE, companies=companies, trx_cd=MOCK_SEARCH_TRX_CD,
+                                      keyword=MOCK_SEARCH_KEYWORD, query=digits)
+        return page(body, query=query)
+
+    @app.route("/financial/<kedcd>")
+    def financial(kedcd):
+        company = company_by_kedcd(kedcd)
+        if current_user() is None or company is None:
+            return redirect("/")
+        tabs = ["재무상태표", "포괄손익계산서"] if company["has_pogwal"] else ["재무상태표", "손익계산서", "제조원가명세서"]
+        return page(render_template_string(FINANCIAL_TEMPLATE, company=company, tabs=tabs))
+
+    @app.route("/httpService/request.json", methods=["POST"])
+    def request_json():
+        if latency:
+            time.sleep(latency)
+        if current_user() is None:
+            # 실제 서버처럼 세션이 없으면 로그인 화면(HTML)을 돌려줌
+            return page()
+        payload = request.get_json(silent=True) or {}
+        header = dict(payload.get("header") or {})
+        trxCd = header.get("trxCd", "")
+        with lock:
+            stats["requests"][trxCd] = stats["requests"].get(trxCd, 0) + 1
+
+        if trxCd == "ETFI1122R":
+            body = payload.get(trxCd) or {}
+            company = company_by_kedcd(body.get("kedcd", ""))
+            rows = statement_rows(company, body.get("acctDt", ""), body.get("fsCcd"), body.get("fsCls")) if company else []
+            return jsonify({"header": header, trxCd: {"list": rows}})
+
+        body = payload.get(trxCd) or {}
+        if trxCd == MOCK_SEARCH_TRX_CD and MOCK_SEARCH_KEYWORD in body:
+            digits = re.sub(r"\D", "", body[MOCK_SEARCH_KEYWORD])
+            found = []
+            if len(digits) == 10:
+                company = mock_company(digits)
+                found = [{"bzno": digits, "kedcd": company["kedcd"], "korEnpNm": company["name"]}]
+            return jsonify({"header": header, trxCd: {"list": found}})
+
+        # 재무 페이지의 기타 거래: header에 kedcd만 돌려줌 (kedcd 확인용)
+        return jsonify({"header": header, trxCd: {}})
+
+    @app.route("/mock/stats")
+    def mock_stats():
+        with lock:
+            return jsonify({"pages": stats["pages"], "logins": stats["logins"], "requests": dict(stats["requests"]),
+                            "sessions": len(sessions)})
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="로컬 크레탑 대역 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--latency", type=float, default=MOCK_LATENCY, help="request.json 응답 지연 (초)")
+    parser.add_argument("--page-latency", type=float, default=MOCK_PAGE_LATENCY, help="화면 응답 지연 (초)")
+    parser.add_argument("--single-session", action="store_true", help="동시 로그인을 PLIL140P5로 거부")
+    args = parser.parse_args(argv)
+
+    app = create_mock_app(args.latency, args.page_latency, args.single_session)
+    print(f"mock CRETOP: http://{args.host}:{args.port} (latency {args.latency}s)")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""벡터 계산 엔진(compute_results_frame, compute_scenarios)이 스칼라 compute_results와 같은 결과를 내는지 확인합니다."""
+import random
+
+import pytest
+
+import app
+
+SERIES = ("machine", "pogwal", "sonik", "jejo", "before_loss", "taxes")
+
+
+def scalar_results(data, start_year=None, **params):
+    """compute_results 결과. 급여 계열이 없어 ValueError가 나면 벡터 엔진과 같이 None."""
+    try:
+        return app.compute_results(data, start_year, **params)
+    except ValueError:
+        return None
+
+
+def make_data(years, search_key="000-00-00000", **series):
+    data = {"search_key": search_key, "company_name": search_key, "kedcd": "K" + search_key, "years": list(years)}
+    for name in SERIES:
+        data[name] = list(series.get(name, [None] * len(years)))
+    return data
+
+
+def random_value(rng):
+    kind = rng.random()
+    if kind < 0.1:
+        return None
+    if kind < 0.15:
+        return "-"
+    if kind < 0.2:
+        return ""
+    if kind < 0.25:
+        return "0"
+    value = rng.randint(-50000, 500000)
+    return f"{value:,}" if rng.random() < 0.8 else value
+
+
+def random_years(rng):
+    first = rng.randint(2016, 2022)
+    return range(first, rng.randint(first + 1, 2026) + 1)
+
+
+def random_data(rng, index, years):
+    series = {}
+    for name in SERIES:
+        if rng.random() < 0.2:
+            series[name] = [None] * len(years)  # 계열 전체가 없음
+        else:
+            series[name] = [random_value(rng) for _ in years]
+    return make_data(years, f"{index:03d}-00-00000", **series)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_frame_matches_scalar_random(seed):
+    rng = random.Random(seed)
+    years = random_years(rng)  # 배치 하나는 같은 조회 기간을 씀
+    datas = [random_data(rng, i, years) for i in range(30)]
+    assert app.compute_results_frame(datas) == [scalar_results(data) for data in datas]
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"num": 0, "avg_rate": 0, "avg_rate_after_2023": 0},
+    {"num": -7700, "avg_rate": -0.5, "avg_rate_after_2023": 2.5},
+    {"num": 12345.5, "avg_rate": 0.07, "avg_rate_after_2023": 0.15},
+])
+def test_frame_matches_scalar_params(params):
+    rng = random.Random(1234)
+    datas = [random_data(rng, i, range(2017, 2025)) for i in range(30)]
+    assert app.compute_results_frame(datas, **params) == [scalar_results(data, **params) for data in datas]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_scenarios_match_scalar(seed):
+    rng = random.Random(seed)
+    years = random_years(rng)
+    data = random_data(rng, seed, years)
+    while scalar_results(data) is None:
+        data = random_data(rng, seed, years)
+    scenarios = app.scenario_grid({"num": [0, 7700, 20000], "avg_rate": [0.03, -0.1], "avg_rate_after_2023": [0.1, 0]})
+    expected = [app.compute_results(data, **scenario) for scenario in scenarios]
+    assert app.compute_scenarios(data, scenarios) == expected
+
+
+EDGE_CASES = {
+    "zeros": make_data(range(2018, 2024), machine=["0"] * 6, pogwal=["0"] * 6),
+    "negative": make_data(range(2018, 2024), machine=["-1,000", "-500", "300", "-2,000", "10", "-5"],
+                          pogwal=["-40,000", "80,000", "-120,000", "0", "200,000", "-1"]),
+    "missing_years": make_data(range(2018, 2024), machine=[None, "1,000", None, "3,000", None, "6,000"],
+                               pogwal=["40,000", None, "160,000", None, None, "400,000"]),
+    "error_rows": make_data(range(2018, 2024), machine=["1,000", "-", "3,000", "", "5,000", "-"],
+                            pogwal=["40,000", "80,000", "-", "160,000", "-", "240,000"]),
+    "sonik_jejo": make_data(range(2018, 2024), machine=["100", "200", "300", "400", "500", "600"],
+                            sonik=["10,000", "50,000", "-", "130,000", "170,000", "210,000"],
+                            jejo=[None, "40,000", "80,000", None, "-", "200,000"]),
+    "jejo_only": make_data(range(2018, 2024), machine=["100", "200", "300", "400", "500", "600"],
+                           jejo=["40,000", "80,000", "120,000", "160,000", "200,000", "240,000"]),
+    "no_salary": make_data(range(2018, 2024), machine=["100", "200", "300", "400", "500", "600"]),
+    "all_errors": make_data(range(2020, 2024), machine=["-"] * 4, pogwal=["-"] * 4),
+    "two_years": make_data([2022, 2023], machine=["1,000", "2,000"], pogwal=["40,000", "120,000"]),
+}
+
+
+@pytest.mark.parametrize("name", EDGE_CASES)
+def test_frame_matches_scalar_edge_cases(name):
+    data = EDGE_CASES[name]
+    assert app.compute_results_frame([data]) == [scalar_results(data)]
+
+
+def test_frame_matches_scalar_different_first_years():
+    # 조회 시작 연도가 달라도 계산 연도는 전체 범위 기준 (마지막 연도는 모두 2023)
+    datas = list(EDGE_CASES.values())
+    start_year = min(data["years"][0] for data in datas) + 1
+    assert app.compute_results_frame(datas, start_year) == [scalar_results(data, start_year) for data in datas]
+
+
+def test_no_salary_is_value_error_in_scalar_and_none_in_frame():
+    data = EDGE_CASES["no_salary"]
+    with pytest.raises(ValueError):
+        app.compute_results(data)
+    assert app.compute_results_frame([data]) == [None]
+
+
+def test_error_rows_keep_only_the_message():
+    data = EDGE_CASES["error_rows"]
+    results, totals = app.compute_results_frame([data])[0]
+    errors = {year: result for year, result in results.items() if "error" in result}
+    assert errors
+    assert all(list(result) == ["error"] and result["error"].startswith("계산 오류") for result in errors.values())
+    assert totals == app.compute_results(data)[1]
+
+
+def test_cost_frame_results_matches_scalar():
+    datas = list(EDGE_CASES.values())
+    years = app.calculation_years(sorted({year for data in datas for year in data["years"]}))
+    frame = app.build_cost_frame(datas)
+    output = app.cost_frame_results(frame, app.calculate_cost_frame(frame, years), years)
+    assert output == [scalar_results(data, years[0]) for data in datas]
+
+
+def test_empty_input():
+    assert app.compute_results_frame([]) == []
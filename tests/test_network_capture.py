@@ -0,0 +1,92 @@
+"""NetworkCapture / get_kedcd를 브라우저 없이 확인합니다. 드라이버는 수집 스크립트의 동작을 흉내 내는 대역입니다."""
+import pytest
+
+import app
+
+
+class FakeDriver:
+    """window.__cretopCapture.events 버퍼를 파이썬 리스트로 흉내 내는 WebDriver 대역."""
+
+    def __init__(self, events=(), installed=True):
+        self.events = list(events)
+        self.installed = installed
+        self.script_timeout = None
+        self.new_document_scripts = []
+
+    def execute_cdp_cmd(self, command, params):
+        assert command == "Page.addScriptToEvaluateOnNewDocument"
+        self.new_document_scripts.append(params["source"])
+
+    def execute_script(self, script, *args):
+        if script in self.new_document_scripts:
+            self.installed = True
+            return None
+        if script.startswith("return window.__cretopCapture"):
+            return [dict(event) for event in self.events] if self.installed else []
+        if "events = []" in script:
+            self.events.clear()
+            return None
+        raise AssertionError(f"예상하지 못한 스크립트: {script[:60]}")
+
+    def set_script_timeout(self, timeout):
+        self.script_timeout = timeout
+
+    def execute_async_script(self, script, *args):
+        assert script == app.WAIT_FOR_KEDCD_SCRIPT
+        if not self.installed:
+            return None
+        for event in reversed(self.events):
+            if event.get("kedcd"):
+                return event["kedcd"]
+        raise app.selenium_exceptions.TimeoutException("kedcd 응답 없음")
+
+
+def test_get_kedcd_returns_captured_kedcd():
+    driver = FakeDriver([
+        {"trxCd": "ETSR1011R", "kedcd": ""},
+        {"trxCd": "ETFI1122R", "kedcd": "K1234567"},
+    ])
+    assert app.get_kedcd(driver, timeout=3) == "K1234567"
+    assert driver.script_timeout == 3
+
+
+def test_get_kedcd_raises_when_nothing_captured():
+    with pytest.raises(app.CretopError):
+        app.get_kedcd(FakeDriver([{"trxCd": "ETSR1011R", "kedcd": ""}]), timeout=1)
+
+
+def test_install_injects_script_with_limit():
+    driver = FakeDriver(installed=False)
+    app.NetworkCapture(driver, limit=7).install()
+    assert len(driver.new_document_scripts) == 1
+    assert "const LIMIT = 7;" in driver.new_document_scripts[0]
+    assert driver.installed
+
+
+def test_transactions_returns_captured_events():
+    events = [
+        {"trxCd": "ETSR1011R", "screenId": "ETSR101S1", "menuId": "", "fields": ["srchKwd"], "kedcd": ""},
+        {"trxCd": "ETFI1122R", "screenId": "ETFI112S1", "menuId": "", "fields": ["kedcd", "acctDt"], "kedcd": "K1"},
+    ]
+    capture = app.NetworkCapture(FakeDriver(events))
+    assert capture.transactions() == events
+    capture.clear()
+    assert capture.transactions() == []
+
+
+def test_transactions_without_capture_script():
+    assert app.NetworkCapture(FakeDriver([{"trxCd": "X"}], installed=False)).transactions() == []
+
+
+def test_wait_for_kedcd_prefers_latest_response():
+    driver = FakeDriver([{"trxCd": "ETFI1122R", "kedcd": "K1"}, {"trxCd": "ETFI1122R", "kedcd": "K2"}])
+    assert app.NetworkCapture(driver).wait_for_kedcd(timeout=2) == "K2"
+    assert driver.script_timeout == 2
+
+
+def test_wait_for_kedcd_timeout_returns_none():
+    assert app.NetworkCapture(FakeDriver([{"trxCd": "ETSR1011R", "kedcd": ""}])).wait_for_kedcd(timeout=1) is None
+
+
+def test_wait_for_kedcd_without_capture_script_returns_none():
+    assert app.NetworkCapture(FakeDriver(installed=False)).wait_for_kedcd(timeout=1) is None
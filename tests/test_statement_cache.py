@@ -0,0 +1,45 @@
+"""StatementCache의 보관 기간(ttl_for/put)을 확인합니다."""
+import json
+import time
+
+import app
+
+ROWS = {"header": {"trxCd": "ETFI1122R"}, "ETFI1122R": {"list": [{"accNmEng": "Total Assets", "val1": "1"}]}}
+EMPTY = {"header": {"trxCd": "ETFI1122R"}, "ETFI1122R": {"list": []}}
+
+
+def make_cache(tmp_path):
+    return app.StatementCache(path=str(tmp_path / "cache.db"), ttl=3600, closed_ttl=None, empty_ttl=60)
+
+
+def expires_at(cache, acctDt):
+    with app.closing(cache._connect()) as conn:
+        return conn.execute("SELECT expires_at FROM statement_cache WHERE acct_dt = ?", (acctDt,)).fetchone()[0]
+
+
+def test_closed_year_with_rows_never_expires(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("K1", "20181231", "1", "2", json.dumps(ROWS))
+    assert expires_at(cache, "20181231") is None
+    assert cache.get("K1", "20181231", "1", "2") == json.dumps(ROWS)
+
+
+def test_empty_response_gets_short_ttl_even_for_closed_year(tmp_path):
+    cache = make_cache(tmp_path)
+    before = time.time()
+    cache.put("K1", "20181231", "2", "1", json.dumps(EMPTY))
+    assert before + 60 <= expires_at(cache, "20181231") <= time.time() + 60
+
+
+def test_open_year_uses_default_ttl(tmp_path):
+    cache = make_cache(tmp_path)
+    acctDt = f"{time.localtime().tm_year}1231"
+    before = time.time()
+    cache.put("K1", acctDt, "1", "2", json.dumps(ROWS))
+    assert before + 3600 <= expires_at(cache, acctDt) <= time.time() + 3600
+
+
+def test_non_json_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("K1", "20181231", "1", "2", "<html>login</html>")
+    assert cache.get("K1", "20181231", "1", "2") is None